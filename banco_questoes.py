@@ -0,0 +1,561 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from types import MappingProxyType
+
+import numpy as np
+
+from caminhos import resolver_caminho
+from duplicatas import detectar_quase_duplicatas
+from edital import DISCIPLINAS_EQUIVALENTES
+from metricas import cronometrado, marcar_compartilhado
+from pontuacao import BLOCOS, CODIGO_CERTO, CODIGO_ERRADO, codificar_questoes
+
+# --- BANCO DE QUESTÕES COMPARTILHADO (UM POR PROCESSO) ---
+# O banco é carregado e validado uma única vez e compartilhado por todas as sessões.
+# Quando o arquivo muda (mtime/tamanho e, em seguida, hash do conteúdo), um novo banco
+# é montado e trocado atomicamente; sessões em andamento continuam com a versão que já têm.
+
+CAMINHO_PADRAO_BANCO = "questoes_pf_agente.json"
+CAMINHO_BANCO_COMPILADO = "questoes_pf_agente.bqpf"  # Gerado por compilar_banco.py
+CHAVES_OBRIGATORIAS = ('id', 'bloco', 'disciplina', 'enunciado', 'gabarito')
+
+QUESTOES_FALLBACK = (
+    {"id": "FALLBACK_B1_01", "bloco": 1, "disciplina": "Exemplo Fallback", "enunciado": "Questão exemplo fallback Bloco 1. Verifique 'questoes_pf_agente.json'.", "gabarito": "C"},
+    {"id": "FALLBACK_B2_01", "bloco": 2, "disciplina": "Exemplo Fallback", "enunciado": "Questão exemplo fallback Bloco 2. Arquivo na mesma pasta?", "gabarito": "E"},
+    {"id": "FALLBACK_B3_01", "bloco": 3, "disciplina": "Exemplo Fallback", "enunciado": "Questão exemplo fallback Bloco 3. JSON é uma lista de objetos?", "gabarito": "C"},
+)
+
+
+def disciplina_canonica(disciplina):
+    """Nome da disciplina usado nos índices e nas cotas do edital."""
+    return DISCIPLINAS_EQUIVALENTES.get(disciplina, disciplina)
+
+
+# --- FORMATO BINÁRIO COMPILADO (.bqpf) ---
+# Layout do arquivo (inteiros little-endian; cada seção alinhada em 8 bytes):
+#   MAGIC | tamanho do cabeçalho (uint32) | cabeçalho JSON | seções
+# O cabeçalho traz o número de questões, a versão (hash), a tabela de disciplinas e a
+# posição/tamanho de cada seção. Seções de largura fixa: ids (bytes de largura fixa),
+# blocos (uint8), disciplinas (uint16, índice na tabela), gabaritos (uint8, códigos de
+# pontuacao.py), offsets dos enunciados (uint64, n + 1) e, opcionalmente, o grupo de quase
+# duplicatas de cada questão (int32, -1 = nenhum; ver duplicatas.py) e a dificuldade e a
+# discriminação calibradas (float32, NaN = não calibrada; ver calibrar_banco.py). A última
+# seção é o blob UTF-8 dos enunciados, lido sob demanda a partir do arquivo mapeado em memória.
+MAGIC_BANCO_COMPILADO = b"BQPF\x00\x01\x00\x00"
+_LETRAS_GABARITO = {CODIGO_CERTO: "C", CODIGO_ERRADO: "E"}
+_CODIGOS_GABARITO = {"C": CODIGO_CERTO, "E": CODIGO_ERRADO}
+
+
+def _alinhar(f):
+    resto = f.tell() % 8
+    if resto:
+        f.write(b"\x00" * (8 - resto))
+
+
+def escrever_banco_compilado(metadados, caminho_blob, destino, grupos=None, calibracao=None):
+    """Grava o arquivo .bqpf a partir dos metadados e de um arquivo com o blob dos enunciados.
+
+    `metadados` é uma lista de tuplas (id, bloco, disciplina, gabarito, tamanho do enunciado
+    em bytes), na mesma ordem dos enunciados no blob; `grupos`, se informado, traz o grupo de
+    quase duplicatas de cada questão e `calibracao`, o par (dificuldades, discriminações).
+    A escrita é feita num arquivo temporário e trocada atomicamente, para que o servidor
+    nunca leia um arquivo pela metade.
+    """
+    disciplinas = sorted({m[2] for m in metadados})
+    codigo_disciplina = {d: i for i, d in enumerate(disciplinas)}
+    ids_bytes = [m[0].encode('utf-8') for m in metadados]
+    secoes = {
+        "ids": np.array(ids_bytes, dtype=f"S{max((len(i) for i in ids_bytes), default=1)}"),
+        "blocos": np.array([m[1] for m in metadados], dtype=np.uint8),
+        "disciplinas": np.array([codigo_disciplina[m[2]] for m in metadados], dtype=np.uint16),
+        "gabaritos": np.array([_CODIGOS_GABARITO[m[3]] for m in metadados], dtype=np.uint8),
+        "offsets": np.concatenate(([0], np.cumsum([m[4] for m in metadados], dtype=np.uint64))).astype(np.uint64),
+    }
+    if grupos is not None:
+        secoes["grupos"] = np.asarray(grupos, dtype=np.int32)
+    if calibracao is not None:
+        secoes["dificuldades"] = np.asarray(calibracao[0], dtype=np.float32)
+        secoes["discriminacoes"] = np.asarray(calibracao[1], dtype=np.float32)
+
+    hash_conteudo = hashlib.sha256()
+    for array in secoes.values():
+        hash_conteudo.update(array.tobytes())
+    with open(caminho_blob, 'rb') as blob:
+        for bloco_bytes in iter(lambda: blob.read(1 << 20), b""):
+            hash_conteudo.update(bloco_bytes)
+
+    # As posições das seções dependem do tamanho do cabeçalho; recalcula até estabilizar
+    cabecalho = {"n": len(metadados), "versao": hash_conteudo.hexdigest(), "disciplinas": disciplinas,
+                 "largura_id": secoes["ids"].dtype.itemsize, "secoes": {}}
+    while True:
+        cabecalho_bytes = json.dumps(cabecalho, ensure_ascii=False).encode('utf-8')
+        posicao = len(MAGIC_BANCO_COMPILADO) + 4 + len(cabecalho_bytes)
+        novas_secoes = {}
+        for nome, array in secoes.items():
+            posicao += (-posicao) % 8
+            novas_secoes[nome] = [posicao, array.nbytes]
+            posicao += array.nbytes
+        posicao += (-posicao) % 8
+        novas_secoes["enunciados"] = [posicao, int(secoes["offsets"][-1])]
+        if novas_secoes == cabecalho["secoes"]:
+            break
+        cabecalho["secoes"] = novas_secoes
+
+    temporario = f"{destino}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(MAGIC_BANCO_COMPILADO)
+        f.write(len(cabecalho_bytes).to_bytes(4, 'little'))
+        f.write(cabecalho_bytes)
+        for array in secoes.values():
+            _alinhar(f)
+            f.write(array.tobytes())
+        _alinhar(f)
+        with open(caminho_blob, 'rb') as blob:
+            for bloco_bytes in iter(lambda: blob.read(1 << 20), b""):
+                f.write(bloco_bytes)
+    try:
+        os.replace(temporario, destino)
+    except PermissionError as e:
+        # No Windows, um arquivo mapeado em memória (pelo servidor do simulador) não pode ser substituído
+        os.remove(temporario)
+        raise PermissionError(f"Não foi possível substituir '{destino}' ({e}). Se o servidor do simulador estiver usando "
+                              f"esse banco (no Windows ele fica bloqueado enquanto mapeado), pare o servidor e rode de novo.") from e
+    return cabecalho["versao"]
+
+
+class QuestaoCompilada(Mapping):
+    """Questão de um banco compilado; o enunciado só é lido do arquivo quando acessado."""
+
+    __slots__ = ('_banco', '_indice')
+
+    def __init__(self, banco_compilado, indice):
+        self._banco = banco_compilado
+        self._indice = indice
+
+    def __getitem__(self, chave):
+        return self._banco.campo(self._indice, chave)
+
+    def __iter__(self):
+        return iter(CHAVES_OBRIGATORIAS)
+
+    def __len__(self):
+        return len(CHAVES_OBRIGATORIAS)
+
+    def __repr__(self):
+        return f"QuestaoCompilada({self['id']!r})"
+
+
+class BancoCompilado(Sequence):
+    """Leitura de um arquivo .bqpf mapeado em memória: metadados em arrays, enunciados sob demanda."""
+
+    def __init__(self, caminho):
+        with open(caminho, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC_BANCO_COMPILADO)] != MAGIC_BANCO_COMPILADO:
+            raise ValueError(f"'{caminho}' não é um banco compilado (.bqpf) válido.")
+        inicio = len(MAGIC_BANCO_COMPILADO)
+        tamanho_cabecalho = int.from_bytes(self._mmap[inicio:inicio + 4], 'little')
+        cabecalho = json.loads(self._mmap[inicio + 4:inicio + 4 + tamanho_cabecalho].decode('utf-8'))
+
+        n = cabecalho["n"]
+        secoes = cabecalho["secoes"]
+        self.versao = cabecalho["versao"]
+        self.disciplinas = tuple(cabecalho["disciplinas"])
+        self.ids = np.frombuffer(self._mmap, dtype=f"S{cabecalho['largura_id']}", count=n, offset=secoes["ids"][0])
+        self.blocos = np.frombuffer(self._mmap, dtype=np.uint8, count=n, offset=secoes["blocos"][0])
+        self.codigos_disciplina = np.frombuffer(self._mmap, dtype=np.uint16, count=n, offset=secoes["disciplinas"][0])
+        self.gabaritos = np.frombuffer(self._mmap, dtype=np.uint8, count=n, offset=secoes["gabaritos"][0])
+        self._offsets = np.frombuffer(self._mmap, dtype=np.uint64, count=n + 1, offset=secoes["offsets"][0])
+        # Arquivos compilados sem a detecção de duplicatas não têm esta seção
+        self.grupos = np.frombuffer(self._mmap, dtype=np.int32, count=n, offset=secoes["grupos"][0]) if "grupos" in secoes else None
+        # Só existem depois da primeira calibração (calibrar_banco.py)
+        self.dificuldades = np.frombuffer(self._mmap, dtype=np.float32, count=n, offset=secoes["dificuldades"][0]) if "dificuldades" in secoes else None
+        self.discriminacoes = np.frombuffer(self._mmap, dtype=np.float32, count=n, offset=secoes["discriminacoes"][0]) if "discriminacoes" in secoes else None
+        self._inicio_enunciados = secoes["enunciados"][0]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [QuestaoCompilada(self, i) for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError(indice)
+        return QuestaoCompilada(self, indice)
+
+    def copiar_enunciados(self, destino):
+        """Copia o blob dos enunciados para o arquivo (aberto em modo binário) `destino`."""
+        fim = self._inicio_enunciados + int(self._offsets[-1])
+        for inicio in range(self._inicio_enunciados, fim, 1 << 20):
+            destino.write(self._mmap[inicio:min(inicio + (1 << 20), fim)])
+
+    def enunciado(self, indice):
+        inicio = self._inicio_enunciados + int(self._offsets[indice])
+        fim = self._inicio_enunciados + int(self._offsets[indice + 1])
+        return self._mmap[inicio:fim].decode('utf-8')
+
+    def campo(self, indice, chave):
+        if chave == 'id':
+            return self.ids[indice].decode('utf-8')
+        if chave == 'bloco':
+            return int(self.blocos[indice])
+        if chave == 'disciplina':
+            return self.disciplinas[self.codigos_disciplina[indice]]
+        if chave == 'gabarito':
+            return _LETRAS_GABARITO[int(self.gabaritos[indice])]
+        if chave == 'enunciado':
+            return self.enunciado(indice)
+        raise KeyError(chave)
+
+
+def gravar_calibracao_compilado(caminho, parametros_por_id):
+    """Regrava o .bqpf com a calibração de `parametros_por_id` (id -> (dificuldade, discriminação)).
+
+    Questões ausentes do dicionário mantêm os valores que já tinham. Devolve a nova versão.
+    """
+    compilado = BancoCompilado(caminho)
+    n = len(compilado)
+    dificuldades = np.full(n, np.nan, dtype=np.float32) if compilado.dificuldades is None else compilado.dificuldades.copy()
+    discriminacoes = np.full(n, np.nan, dtype=np.float32) if compilado.discriminacoes is None else compilado.discriminacoes.copy()
+    ids = [q_id.decode('utf-8') for q_id in compilado.ids.tolist()]
+    for i, q_id in enumerate(ids):
+        parametros = parametros_por_id.get(q_id)
+        if parametros is not None:
+            dificuldades[i], discriminacoes[i] = parametros
+    tamanhos = np.diff(compilado._offsets).tolist()
+    metadados = [(q_id, bloco, compilado.disciplinas[d], _LETRAS_GABARITO[g], tamanho) for q_id, bloco, d, g, tamanho in
+                 zip(ids, compilado.blocos.tolist(), compilado.codigos_disciplina.tolist(), compilado.gabaritos.tolist(), tamanhos)]
+
+    grupos = None if compilado.grupos is None else compilado.grupos.copy()
+
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(caminho)), suffix=".blob", delete=False) as blob:
+        try:
+            compilado.copiar_enunciados(blob)
+            blob.close()
+            del compilado  # Solta o mapeamento antes de substituir o arquivo (exigido no Windows)
+            return escrever_banco_compilado(metadados, blob.name, caminho, grupos=grupos,
+                                            calibracao=(dificuldades, discriminacoes))
+        finally:
+            blob.close()
+            os.remove(blob.name)
+# --- FIM DO FORMATO BINÁRIO COMPILADO ---
+
+
+# --- ESTRATOS DE DIFICULDADE ---
+# A calibração (calibrar_banco.py) dá a cada questão uma dificuldade na escala TRI. Dentro
+# de cada bloco, as questões calibradas são divididas em estratos de mesmo tamanho (tercis
+# da dificuldade); o sorteio usa os estratos para seguir o perfil de dificuldade do edital.py.
+ESTRATOS_DIFICULDADE = ("fácil", "média", "difícil")
+SEM_ESTRATO = -1  # Questão ainda não calibrada
+
+
+def parametros_calibracao(questao):
+    """(dificuldade, discriminação) gravadas na questão do JSON; NaN quando ausentes ou inválidas."""
+    parametros = []
+    for chave in ('dificuldade', 'discriminacao'):
+        try:
+            parametros.append(float(questao.get(chave, np.nan)))
+        except (TypeError, ValueError):
+            parametros.append(np.nan)
+    return tuple(parametros)
+
+
+def estratos_dificuldade(dificuldades, blocos):
+    """Estrato (int8) de cada questão: quantis da dificuldade entre as calibradas do mesmo bloco."""
+    estratos = np.full(len(dificuldades), SEM_ESTRATO, dtype=np.int8)
+    calibradas = ~np.isnan(dificuldades)
+    for bloco in np.unique(blocos[calibradas]).tolist():
+        neste_bloco = calibradas & (blocos == bloco)
+        cortes = np.quantile(dificuldades[neste_bloco], np.arange(1, len(ESTRATOS_DIFICULDADE)) / len(ESTRATOS_DIFICULDADE))
+        estratos[neste_bloco] = np.searchsorted(cortes, dificuldades[neste_bloco], side='right')
+    return estratos
+# --- FIM DOS ESTRATOS DE DIFICULDADE ---
+
+
+class BancoQuestoes:
+    """Conjunto imutável de questões validadas, identificado pela versão (hash) do arquivo.
+
+    Aceita uma lista de dicionários (vindos do JSON) ou um BancoCompilado, cujas questões
+    já são somente leitura. Na construção são montados índices (posições em `questoes`)
+    por bloco e por (bloco, disciplina canônica), usados pelo sorteio dos simulados, e os
+    vetores `gabaritos`/`blocos` já codificados para a correção (ver pontuacao.py).
+    `grupos` (int32, -1 = nenhum) indica as quase duplicatas, que o sorteio não junta num
+    mesmo simulado; None quando a detecção não foi feita (no banco vindo do JSON, ela roda em
+    segundo plano e o repositório troca o banco por uma cópia com os grupos). `dificuldades`/`discriminacoes`
+    (float32, NaN = não calibrada) vêm da calibração; com elas, `indices_por_estrato` traz,
+    para cada (bloco, disciplina) e (bloco, None), as posições de cada estrato de dificuldade
+    e, por último, as das questões não calibradas. Sem calibração, ambos são None.
+    """
+
+    def __init__(self, questoes, versao, caminho=None, mtime=None, erro_carregamento=False, grupos=None):
+        if isinstance(questoes, BancoCompilado):
+            self.questoes = questoes
+            metadados = zip(questoes.blocos.tolist(), (questoes.disciplinas[d] for d in questoes.codigos_disciplina.tolist()))
+            self.gabaritos = questoes.gabaritos.astype(np.int8)
+            self.blocos = np.where(np.isin(questoes.blocos, BLOCOS), questoes.blocos, 0).astype(np.int8)
+            grupos = questoes.grupos
+            dificuldades, discriminacoes = questoes.dificuldades, questoes.discriminacoes
+        else:
+            self.questoes = tuple(MappingProxyType(dict(q)) for q in questoes)
+            metadados = ((q.get('bloco'), q.get('disciplina')) for q in self.questoes)
+            self.gabaritos, self.blocos = codificar_questoes(self.questoes)
+            calibracao = np.array([parametros_calibracao(q) for q in self.questoes], dtype=np.float32).reshape(-1, 2)
+            dificuldades, discriminacoes = calibracao[:, 0], calibracao[:, 1]
+        self.versao = versao
+        self.caminho = caminho
+        self.mtime = mtime
+        self.erro_carregamento = erro_carregamento
+        self.carregado_em = time.time()
+        self.grupos = grupos if grupos is None or (grupos >= 0).any() else None
+        calibrado = dificuldades is not None and not np.isnan(dificuldades).all()
+        self.dificuldades = dificuldades if calibrado else None
+        self.discriminacoes = discriminacoes if calibrado else None
+
+        por_bloco = {}
+        por_bloco_disciplina = {}
+        for i, (bloco, disciplina) in enumerate(metadados):
+            por_bloco.setdefault(bloco, []).append(i)
+            por_bloco_disciplina.setdefault((bloco, disciplina_canonica(disciplina)), []).append(i)
+        self.indices_por_bloco = {k: tuple(v) for k, v in por_bloco.items()}
+        self.indices_por_bloco_disciplina = {k: tuple(v) for k, v in por_bloco_disciplina.items()}
+        self.indices_por_estrato = self._indices_por_estrato() if calibrado else None
+        self._posicao_por_id = None
+
+    def _indices_por_estrato(self):
+        estratos = estratos_dificuldade(self.dificuldades, self.blocos)
+        conjuntos = [*self.indices_por_bloco_disciplina.items(), *(((bloco, None), v) for bloco, v in self.indices_por_bloco.items())]
+        por_estrato = {}
+        for chave, indices in conjuntos:
+            posicoes = np.array(indices, dtype=np.int64)
+            estratos_conjunto = estratos[posicoes]
+            por_estrato[chave] = tuple(tuple(posicoes[estratos_conjunto == e].tolist()) for e in range(len(ESTRATOS_DIFICULDADE))) \
+                + (tuple(posicoes[estratos_conjunto == SEM_ESTRATO].tolist()),)
+        return por_estrato
+
+    def posicoes_dos_ids(self, ids):
+        """Posições no banco das questões com esses ids (int32), ou None se algum não existir."""
+        if self._posicao_por_id is None:
+            # Montado só na primeira consulta (retomada de tentativas); a corrida entre threads é inofensiva
+            self._posicao_por_id = {q.get('id'): i for i, q in enumerate(self.questoes)} if not isinstance(self.questoes, BancoCompilado) \
+                else {q_id.decode('utf-8'): i for i, q_id in enumerate(self.questoes.ids.tolist())}
+        posicoes = [self._posicao_por_id.get(q_id) for q_id in ids]
+        if None in posicoes:
+            return None
+        return np.array(posicoes, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.questoes)
+
+    def __iter__(self):
+        return iter(self.questoes)
+
+    def __getitem__(self, indice):
+        return self.questoes[indice]
+
+
+def _decodificar_questoes(conteudo, caminho_arquivo):
+    """Decodifica o conteúdo bruto do JSON e valida a estrutura geral da lista."""
+    try:
+        questoes = json.loads(conteudo.decode('utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        print(f"LOG ERRO: Erro ao decodificar o JSON do arquivo '{caminho_arquivo}': {e}")
+        return []
+    if not isinstance(questoes, list):
+        print(f"LOG ERRO: Conteúdo do JSON não é uma lista.")
+        return []
+    if not all(isinstance(q, dict) for q in questoes):
+        print(f"LOG ERRO: Nem todos os elementos da lista no JSON são dicionários (questões).")
+        return []
+    if not questoes:
+        print(f"LOG AVISO: Arquivo JSON '{caminho_arquivo}' está vazio.")
+        return []
+    return questoes
+
+
+def validar_questoes(questoes, ids_vistos=None):
+    """Descarta questões sem as chaves obrigatórias, com ID repetido ou gabarito fora de C/E.
+
+    `ids_vistos` permite validar vários arquivos (fragmentos do banco) em sequência.
+    """
+    validas = []
+    ids_vistos = set() if ids_vistos is None else ids_vistos
+    for i, q in enumerate(questoes):
+        if not all(key in q for key in CHAVES_OBRIGATORIAS):
+            print(f"LOG AVISO: Questão {i} no JSON está com chaves faltando e foi descartada. ID: {q.get('id', 'N/A')}")
+            continue
+        if q['gabarito'] not in ("C", "E"):
+            print(f"LOG AVISO: Questão {q['id']} tem gabarito inválido ('{q['gabarito']}') e foi descartada.")
+            continue
+        if q['id'] in ids_vistos:
+            print(f"LOG AVISO: ID repetido no JSON ({q['id']}); mantida apenas a primeira ocorrência.")
+            continue
+        ids_vistos.add(q['id'])
+        validas.append(q)
+    return validas
+
+
+def carregar_questoes_do_json(caminho_arquivo=CAMINHO_PADRAO_BANCO):
+    """Carrega as questões de um arquivo JSON."""
+    caminho = resolver_caminho(caminho_arquivo)
+    try:
+        with open(caminho, 'rb') as f:
+            conteudo = f.read()
+    except FileNotFoundError:
+        print(f"LOG ERRO: Arquivo JSON '{caminho_arquivo}' não encontrado.")
+        return []
+    return validar_questoes(_decodificar_questoes(conteudo, caminho_arquivo))
+
+
+def _banco_fallback(caminho):
+    return BancoQuestoes(QUESTOES_FALLBACK, versao="fallback", caminho=caminho, erro_carregamento=True)
+
+
+class RepositorioBanco:
+    """Mantém a versão atual do banco de um arquivo e a recarrega quando o arquivo muda."""
+
+    def __init__(self, caminho_arquivo):
+        self.caminho = resolver_caminho(caminho_arquivo)
+        self._lock = threading.Lock()
+        self._assinatura = None  # (mtime_ns, tamanho) do arquivo que originou o banco atual
+        self._banco = None
+
+    def atual(self):
+        """Devolve o banco vigente; só toca no disco além de um stat() quando o arquivo mudou."""
+        try:
+            st_arquivo = os.stat(self.caminho)
+            assinatura = (st_arquivo.st_mtime_ns, st_arquivo.st_size)
+        except OSError:
+            assinatura = None
+
+        banco = self._banco
+        if banco is not None and assinatura == self._assinatura:
+            return banco
+
+        with self._lock:
+            # Outra thread pode ter recarregado enquanto esperávamos o lock
+            if self._banco is not None and assinatura == self._assinatura:
+                return self._banco
+            self._banco = marcar_compartilhado(self._recarregar(assinatura))
+            self._assinatura = assinatura
+            return self._banco
+
+    @cronometrado("carregar_banco")
+    def _recarregar(self, assinatura):
+        anterior = self._banco
+        if assinatura is None:
+            print(f"LOG ERRO: Arquivo do banco '{self.caminho}' não encontrado.")
+            return anterior if anterior is not None else _banco_fallback(self.caminho)
+        if self.caminho.endswith(".bqpf"):
+            return self._recarregar_compilado(anterior, assinatura)
+
+        try:
+            with open(self.caminho, 'rb') as f:
+                conteudo = f.read()
+        except OSError as e:
+            print(f"LOG ERRO: Não foi possível ler '{self.caminho}': {e}")
+            return anterior if anterior is not None else _banco_fallback(self.caminho)
+
+        versao = hashlib.sha256(conteudo).hexdigest()
+        if anterior is not None and anterior.versao == versao:
+            return anterior  # Só o mtime mudou (ex.: 'touch'); conteúdo idêntico
+
+        questoes = validar_questoes(_decodificar_questoes(conteudo, self.caminho))
+        if not questoes:
+            if anterior is not None and not anterior.erro_carregamento:
+                print(f"LOG ERRO: Nova versão de '{self.caminho}' é inválida. Mantendo a versão anterior do banco.")
+                return anterior
+            return _banco_fallback(self.caminho)
+
+        novo = BancoQuestoes(questoes, versao=versao, caminho=self.caminho, mtime=assinatura[0] / 1e9)
+        if anterior is not None:
+            print(f"LOG: Banco de questões recarregado ({len(novo)} questões, versão {versao[:12]}).")
+        threading.Thread(target=self._agrupar_quase_duplicatas, args=(novo,), daemon=True, name="quase-duplicatas").start()
+        return novo
+
+    def _agrupar_quase_duplicatas(self, banco):
+        """Detecta as quase duplicatas de um banco vindo do JSON, fora do lock (leva segundos).
+
+        Se o banco ainda for o vigente, publica uma cópia com os grupos; até lá o sorteio usa
+        o banco sem grupos. O banco compilado já traz os grupos da compilação.
+        """
+        grupos, _ = detectar_quase_duplicatas((q['enunciado'] for q in banco.questoes), [disciplina_canonica(q['disciplina']) for q in banco.questoes])
+        if not (grupos >= 0).any():
+            return
+        agrupado = BancoQuestoes(banco.questoes, versao=banco.versao, caminho=banco.caminho, mtime=banco.mtime, grupos=grupos)
+        with self._lock:
+            if self._banco is not banco:
+                return  # Recarregado enquanto agrupava; a versão nova tem sua própria detecção
+            self._banco = marcar_compartilhado(agrupado)
+        print(f"LOG AVISO: {int((grupos >= 0).sum())} questões de '{self.caminho}' são quase duplicatas; o sorteio não as junta num mesmo simulado (relatório: python duplicatas.py).")
+
+    def _recarregar_compilado(self, anterior, assinatura):
+        """Abre o banco compilado; só o cabeçalho e os metadados são lidos agora."""
+        try:
+            compilado = BancoCompilado(self.caminho)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"LOG ERRO: Não foi possível abrir o banco compilado '{self.caminho}': {e}")
+            return anterior if anterior is not None else _banco_fallback(self.caminho)
+        if anterior is not None and anterior.versao == compilado.versao:
+            return anterior
+        if not len(compilado):
+            print(f"LOG AVISO: Banco compilado '{self.caminho}' está vazio.")
+            return anterior if anterior is not None else _banco_fallback(self.caminho)
+
+        novo = BancoQuestoes(compilado, versao=compilado.versao, caminho=self.caminho, mtime=assinatura[0] / 1e9)
+        if anterior is not None:
+            print(f"LOG: Banco de questões recarregado ({len(novo)} questões, versão {compilado.versao[:12]}).")
+        return novo
+
+
+_repositorios = {}
+_repositorios_lock = threading.Lock()
+
+
+def obter_repositorio(caminho_arquivo=CAMINHO_PADRAO_BANCO):
+    """Devolve o repositório (único no processo) associado ao arquivo."""
+    caminho = resolver_caminho(caminho_arquivo)
+    repositorio = _repositorios.get(caminho)
+    if repositorio is None:
+        with _repositorios_lock:
+            repositorio = _repositorios.setdefault(caminho, RepositorioBanco(caminho))
+    return repositorio
+
+
+_aviso_compilado_desatualizado = None  # (mtime do JSON, mtime do .bqpf) do último aviso
+
+
+def caminho_banco_preferido():
+    """Usa o banco compilado (.bqpf) quando ele existir e for pelo menos tão novo quanto o JSON; senão, o JSON.
+
+    Quem publica editando o JSON continua com a recarga automática: um .bqpf mais antigo
+    que o JSON é ignorado (com um aviso no log) até ser recompilado.
+    """
+    global _aviso_compilado_desatualizado
+    try:
+        mtime_compilado = os.stat(resolver_caminho(CAMINHO_BANCO_COMPILADO)).st_mtime_ns
+    except OSError:
+        return CAMINHO_PADRAO_BANCO
+    try:
+        mtime_json = os.stat(resolver_caminho(CAMINHO_PADRAO_BANCO)).st_mtime_ns
+    except OSError:
+        return CAMINHO_BANCO_COMPILADO
+    if mtime_json <= mtime_compilado:
+        return CAMINHO_BANCO_COMPILADO
+    if _aviso_compilado_desatualizado != (mtime_json, mtime_compilado):
+        _aviso_compilado_desatualizado = (mtime_json, mtime_compilado)
+        print(f"LOG AVISO: '{CAMINHO_PADRAO_BANCO}' é mais novo que '{CAMINHO_BANCO_COMPILADO}'; usando o JSON até o banco ser recompilado (python compilar_banco.py).")
+    return CAMINHO_PADRAO_BANCO
+
+
+def obter_banco(caminho_arquivo=CAMINHO_PADRAO_BANCO):
+    """Atalho para a versão atual do banco compartilhado."""
+    return obter_repositorio(caminho_arquivo).atual()
+# --- FIM DO BANCO DE QUESTÕES COMPARTILHADO ---
@@ -0,0 +1,240 @@
+"""Teste de carga/benchmark do simulador rodando o app de verdade, sem navegador (AppTest).
+
+Cada candidato simulado percorre o fluxo completo: tela inicial, início do simulado, as 12
+páginas (marcando todas as questões), finalização e abertura da revisão do gabarito.
+
+Uso:
+    python benchmark_simulador.py [-n 20] [-c 4] [--reserva] [-o resultado_benchmark.json] [--comparar anterior.json]
+
+Com -c > 1, os candidatos rodam em processos paralelos (cada um com seu próprio runtime
+do Streamlit, disputando CPU como sessões simultâneas num servidor).
+
+O resultado (JSON) traz percentis de latência por tela, o tempo gasto na montagem do
+simulado e na correção, e o tamanho aproximado do session_state por sessão. Com
+--comparar, imprime a variação em relação a um resultado anterior.
+
+Por padrão a reserva de simulados prontos (reserva_simulados.py) fica desligada: todo
+início monta o simulado na hora e nenhuma thread sorteia em segundo plano durante as
+medições. Com --reserva, ela fica ligada; o benchmark espera a reserva encher fora das
+telas medidas, e o tempo de retirada aparece em "retirar_reserva" ("montar_simulado" passa
+a contar só os inícios que não encontraram simulado pronto).
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+CAMINHO_APP = os.path.join(PASTA, "simulador_pf_agente.py")
+
+# As tentativas do benchmark não devem poluir o banco de tentativas real
+os.environ.setdefault("SIMULADO_TENTATIVAS_DB", os.path.join(tempfile.mkdtemp(prefix="bench_simulado_"), "tentativas.sqlite3"))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import montagem_simulado  # noqa: E402
+import revisao_simulado  # noqa: E402
+from metricas import tamanho_aproximado  # noqa: E402
+
+# Medições do candidato em andamento neste processo (cada processo roda um candidato por vez)
+_latencias = defaultdict(list)  # tela -> [segundos]
+_tempos_funcoes = defaultdict(list)  # função -> [segundos]
+
+
+def _registrar(destino, chave, segundos):
+    destino[chave].append(segundos)
+
+
+def _cronometrar_funcoes():
+    """Envolve as funções de interesse para medir o tempo gasto nelas durante as execuções do app."""
+    # Importado aqui: a capacidade da reserva vem de SIMULADO_RESERVA, definida em main()
+    import reserva_simulados
+    retirar_original = reserva_simulados.ReservaSimulados.retirar
+
+    def retirar_cronometrado(self):
+        inicio = time.perf_counter()
+        try:
+            return retirar_original(self)
+        finally:
+            _registrar(_tempos_funcoes, "retirar_reserva", time.perf_counter() - inicio)
+
+    reserva_simulados.ReservaSimulados.retirar = retirar_cronometrado
+
+    montar_original = montagem_simulado.montar_simulado
+
+    def montar_cronometrado(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return montar_original(*args, **kwargs)
+        finally:
+            _registrar(_tempos_funcoes, "montar_simulado", time.perf_counter() - inicio)
+
+    montagem_simulado.montar_simulado = montar_cronometrado
+
+    # A tela de resultados corrige a tentativa (calcular_pontuacao em lote) ao montar a revisão;
+    # só a correção é medida, sem os índices da revisão
+    calcular_original = revisao_simulado.calcular_pontuacao
+
+    def calcular_cronometrado(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return calcular_original(*args, **kwargs)
+        finally:
+            _registrar(_tempos_funcoes, "calcular_pontuacao", time.perf_counter() - inicio)
+
+    revisao_simulado.calcular_pontuacao = calcular_cronometrado
+
+
+def _aguardar_reserva(limite_segundos=60):
+    """Espera a reserva de simulados encher, para que o abastecimento não dispute CPU com as telas medidas."""
+    import reserva_simulados
+    reserva = reserva_simulados._reserva_atual
+    fim = time.monotonic() + limite_segundos
+    while reserva is not None and len(reserva) < reserva.capacidade and time.monotonic() < fim:
+        time.sleep(0.01)
+
+
+def _executar(at, tela):
+    inicio = time.perf_counter()
+    at.run()
+    _registrar(_latencias, tela, time.perf_counter() - inicio)
+    if at.exception:
+        raise RuntimeError(f"Exceção no app durante '{tela}': {at.exception[0].message}")
+
+
+def simular_candidato(semente):
+    """Percorre o fluxo completo de um candidato; devolve (tamanho do session_state, latências, tempos das funções)."""
+    _latencias.clear()
+    _tempos_funcoes.clear()
+    rng = random.Random(semente)
+    at = AppTest.from_file(CAMINHO_APP, default_timeout=120)
+    _executar(at, "tela_inicial")
+    _aguardar_reserva()
+
+    at.button(key="iniciar_simulado_btn_principal").click()
+    _executar(at, "iniciar_simulado")
+    _aguardar_reserva()  # Repõe o simulado retirado antes das páginas
+
+    while True:
+        for radio in at.radio:
+            radio.set_value(rng.choice(["Certo", "Errado", "Branco"]))
+        proxima = [b for b in at.button if b.key == "btn_proxima_paginacao"]
+        if not proxima:
+            break
+        proxima[0].click()
+        _executar(at, "mudar_pagina")
+
+    tamanho_sessao = tamanho_aproximado(dict(at.session_state.items()))
+    [b for b in at.button if "Finalizar" in b.label][0].click()
+    _executar(at, "finalizar_resultado")
+
+    at.toggle(key="mostrar_gabarito").set_value(True)
+    _executar(at, "abrir_revisao")
+    return tamanho_sessao, dict(_latencias), dict(_tempos_funcoes)
+
+
+def _resumo(valores):
+    valores = np.asarray(valores, dtype=np.float64)
+    if not len(valores):
+        return {"n": 0}
+    return {
+        "n": int(len(valores)),
+        "media": float(valores.mean()),
+        "p50": float(np.percentile(valores, 50)),
+        "p90": float(np.percentile(valores, 90)),
+        "p99": float(np.percentile(valores, 99)),
+        "max": float(valores.max()),
+    }
+
+
+def _versao_codigo():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=PASTA, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual, anterior):
+    """Imprime a variação percentual do p50/p90 de cada medição em relação a um resultado anterior."""
+    for secao in ("latencias_s", "funcoes_s"):
+        for nome, estatisticas in atual[secao].items():
+            antes = anterior.get(secao, {}).get(nome)
+            if not antes or not antes.get("n"):
+                continue
+            variacoes = ", ".join(
+                f"{p}: {antes[p] * 1000:.1f} -> {estatisticas[p] * 1000:.1f} ms ({(estatisticas[p] / antes[p] - 1) * 100:+.0f}%)"
+                for p in ("p50", "p90") if antes[p]
+            )
+            print(f"{secao}/{nome}: {variacoes}")
+    antes, depois = anterior.get("memoria_sessao_bytes", {}).get("p50"), atual["memoria_sessao_bytes"].get("p50")
+    if antes and depois:
+        print(f"memoria_sessao_bytes/p50: {antes:.0f} -> {depois:.0f} ({(depois / antes - 1) * 100:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless do simulador (fluxo completo por candidato).")
+    parser.add_argument("-n", "--candidatos", type=int, default=20, help="número de candidatos simulados")
+    parser.add_argument("-c", "--concorrencia", type=int, default=1, help="candidatos executados ao mesmo tempo (processos)")
+    parser.add_argument("-o", "--saida", default="resultado_benchmark.json", help="arquivo JSON com os resultados")
+    parser.add_argument("--comparar", help="resultado JSON anterior para comparação")
+    parser.add_argument("--reserva", action="store_true", help="mantém ligada a reserva de simulados prontos")
+    args = parser.parse_args()
+    if not args.reserva:
+        os.environ["SIMULADO_RESERVA"] = "0"
+
+    # O AppTest mantém um runtime global por processo, então a concorrência é feita com processos
+    inicio = time.perf_counter()
+    if args.concorrencia > 1:
+        # Durante cada execução o AppTest troca o módulo __main__ pelo do app; as funções
+        # enviadas aos processos precisam ser referenciadas pelo nome real deste módulo.
+        import benchmark_simulador
+        with ProcessPoolExecutor(max_workers=args.concorrencia, initializer=benchmark_simulador._cronometrar_funcoes) as executor:
+            medicoes = list(executor.map(benchmark_simulador.simular_candidato, range(args.candidatos)))
+    else:
+        _cronometrar_funcoes()
+        medicoes = [simular_candidato(semente) for semente in range(args.candidatos)]
+    duracao = time.perf_counter() - inicio
+
+    tamanhos_sessao = []
+    latencias = defaultdict(list)
+    tempos_funcoes = defaultdict(list)
+    for tamanho_sessao, latencias_candidato, tempos_candidato in medicoes:
+        tamanhos_sessao.append(tamanho_sessao)
+        for tela, valores in latencias_candidato.items():
+            latencias[tela].extend(valores)
+        for nome, valores in tempos_candidato.items():
+            tempos_funcoes[nome].extend(valores)
+
+    resultado = {
+        "versao_codigo": _versao_codigo(),
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parametros": {"candidatos": args.candidatos, "concorrencia": args.concorrencia, "reserva": args.reserva},
+        "duracao_total_s": duracao,
+        "latencias_s": {tela: _resumo(v) for tela, v in sorted(latencias.items())},
+        "funcoes_s": {nome: _resumo(v) for nome, v in sorted(tempos_funcoes.items())},
+        "memoria_sessao_bytes": _resumo(tamanhos_sessao),
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    for tela, estatisticas in resultado["latencias_s"].items():
+        print(f"{tela:22s} p50 {estatisticas['p50'] * 1000:8.1f} ms | p90 {estatisticas['p90'] * 1000:8.1f} ms | p99 {estatisticas['p99'] * 1000:8.1f} ms (n={estatisticas['n']})")
+    for nome, estatisticas in resultado["funcoes_s"].items():
+        print(f"{nome:30s} p50 {estatisticas['p50'] * 1000:8.2f} ms | max {estatisticas['max'] * 1000:8.2f} ms")
+    print(f"session_state por sessão: ~{resultado['memoria_sessao_bytes']['p50'] / 1024:.1f} KiB (p50)")
+    print(f"LOG: Resultados gravados em '{args.saida}'.")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import bisect
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+# --- BUSCA TEXTUAL (MODO ESTUDO) ---
+# Índice invertido sobre disciplina + enunciado, com tokenização para o português:
+# caixa baixa, remoção de acentos, descarte de palavras vazias e redução de plurais.
+# A ordenação usa BM25, e a última palavra da consulta também casa por prefixo (para
+# buscas enquanto se digita). Quando o banco é recarregado, o novo índice reaproveita as
+# listas de ocorrências das questões que não mudaram e só tokeniza as novas/alteradas.
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_TERMOS_PREFIXO = 50
+
+_PALAVRAS_VAZIAS = frozenset("""
+a ao aos as ate com como da das de dela dele deles do dos e ela elas ele eles em entre era
+essa esse esta este eu foi ha isso isto ja la mais mas me mesmo na nas nao no nos o os ou
+para pela pelas pelo pelos por qual quando que quem se sem ser seu seus so sua suas tambem
+te tem um uma umas uns
+""".split())
+
+# Plurais mais comuns (aplicados sobre o texto já sem acentos), do sufixo mais longo ao mais curto
+_REGRAS_PLURAL = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"), ("ns", "m"), ("res", "r"), ("s", ""))
+_RE_PALAVRA = re.compile(r"\w+")
+
+
+def dobrar_acentos(texto):
+    """Caixa baixa e sem acentos: 'Inquérito' -> 'inquerito'."""
+    # Na forma NFKD os acentos viram caracteres combinantes, descartados na conversão para ASCII
+    return unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode("ascii")
+
+
+def reduzir_plural(palavra):
+    if len(palavra) <= 3:
+        return palavra
+    for sufixo, troca in _REGRAS_PLURAL:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) >= 3:
+            return palavra[:-len(sufixo)] + troca
+    return palavra
+
+
+def tokenizar(texto):
+    """Termos indexáveis de um texto, na ordem em que aparecem."""
+    return [reduzir_plural(p) for p in _RE_PALAVRA.findall(dobrar_acentos(texto)) if p not in _PALAVRAS_VAZIAS]
+
+
+def _texto_indexado(questao):
+    return f"{questao.get('disciplina', '')} {questao.get('enunciado', '')}"
+
+
+class IndiceBusca:
+    """Índice invertido de uma versão do banco; `anterior` é o índice da versão anterior."""
+
+    def __init__(self, banco, anterior=None):
+        self.banco = banco
+        self.versao = banco.versao
+        n = len(banco)
+
+        self._ids = [q.get('id') for q in banco]
+        self._posicao_por_id = {q_id: i for i, q_id in enumerate(self._ids)}
+        textos = [_texto_indexado(q) for q in banco]
+        self.assinaturas = np.fromiter((hash(t) for t in textos), dtype=np.int64, count=n)
+
+        # Questões idênticas às da versão anterior reaproveitam as ocorrências já calculadas
+        nova_posicao = np.full(len(anterior.assinaturas) if anterior is not None else 0, -1, dtype=np.int64)
+        reaproveitadas = np.zeros(n, dtype=bool)
+        if anterior is not None:
+            for i, q_id in enumerate(self._ids):
+                antiga = anterior._posicao_por_id.get(q_id)
+                if antiga is not None and anterior.assinaturas[antiga] == self.assinaturas[i]:
+                    nova_posicao[antiga] = i
+                    reaproveitadas[i] = True
+
+        self.comprimentos = np.zeros(n, dtype=np.float32)
+        herdadas = {}
+        if anterior is not None:
+            mantidas = nova_posicao >= 0
+            self.comprimentos[nova_posicao[mantidas]] = anterior.comprimentos[mantidas]
+            for termo, (docs, frequencias) in anterior.ocorrencias.items():
+                novos_docs = nova_posicao[docs]
+                manter = novos_docs >= 0
+                if manter.any():
+                    herdadas[termo] = (novos_docs[manter].astype(np.int32), frequencias[manter])
+
+        novas_docs = {}
+        novas_frequencias = {}
+        novas = np.flatnonzero(~reaproveitadas)
+        for i in novas.tolist():
+            termos = tokenizar(textos[i])
+            self.comprimentos[i] = len(termos)
+            for termo, freq in Counter(termos).items():
+                novas_docs.setdefault(termo, []).append(i)
+                novas_frequencias.setdefault(termo, []).append(freq)
+
+        self.ocorrencias = dict(herdadas)
+        for termo, docs in novas_docs.items():
+            docs = np.array(docs, dtype=np.int32)
+            frequencias = np.array(novas_frequencias[termo], dtype=np.uint16)
+            if termo in herdadas:
+                docs = np.concatenate((herdadas[termo][0], docs))
+                frequencias = np.concatenate((herdadas[termo][1], frequencias))
+            self.ocorrencias[termo] = (docs, frequencias)
+        self._vocabulario = sorted(self.ocorrencias)
+        self.comprimento_medio = float(self.comprimentos.mean()) if n else 0.0
+        self.questoes_tokenizadas = len(novas)
+
+    def _termos_por_prefixo(self, prefixo):
+        inicio = bisect.bisect_left(self._vocabulario, prefixo)
+        termos = []
+        for termo in self._vocabulario[inicio:inicio + MAX_TERMOS_PREFIXO]:
+            if not termo.startswith(prefixo):
+                break
+            termos.append(termo)
+        return termos
+
+    def buscar(self, consulta, limite=50):
+        """Posições no banco das questões mais relevantes para a consulta (da melhor para a pior)."""
+        palavras = [p for p in _RE_PALAVRA.findall(dobrar_acentos(consulta)) if p not in _PALAVRAS_VAZIAS]
+        if not palavras or not len(self.comprimentos):
+            return []
+
+        termos = {reduzir_plural(p): 1.0 for p in palavras}
+        if not consulta[-1:].isspace():
+            # Última palavra ainda sendo digitada: também casa por prefixo, com peso menor
+            for termo in self._termos_por_prefixo(palavras[-1]):
+                termos.setdefault(termo, 0.5)
+
+        n = len(self.comprimentos)
+        pontuacao = np.zeros(n, dtype=np.float32)
+        normalizacao = BM25_K1 * (1 - BM25_B + BM25_B * self.comprimentos / max(self.comprimento_medio, 1e-9))
+        for termo, peso in termos.items():
+            if termo not in self.ocorrencias:
+                continue
+            docs, frequencias = self.ocorrencias[termo]
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            tf = frequencias.astype(np.float32)
+            pontuacao[docs] += peso * idf * tf * (BM25_K1 + 1) / (tf + normalizacao[docs])
+
+        candidatos = np.flatnonzero(pontuacao)
+        if len(candidatos) > limite:
+            candidatos = candidatos[np.argpartition(-pontuacao[candidatos], limite - 1)[:limite]]
+        return candidatos[np.argsort(-pontuacao[candidatos], kind="stable")].tolist()
+
+
+_indice_atual = None
+_indice_lock = threading.Lock()
+
+
+def obter_indice_busca(banco):
+    """Índice da versão atual do banco; reconstruído (incrementalmente) quando a versão muda."""
+    global _indice_atual
+    indice = _indice_atual
+    if indice is not None and indice.versao == banco.versao:
+        return indice
+    with _indice_lock:
+        if _indice_atual is None or _indice_atual.versao != banco.versao:
+            _indice_atual = IndiceBusca(banco, anterior=_indice_atual)
+            print(f"LOG: Índice de busca montado para a versão {str(banco.versao)[:12]} ({_indice_atual.questoes_tokenizadas} de {len(banco)} questões tokenizadas).")
+        return _indice_atual
+
+
+def preparar_indice_busca(banco):
+    """Monta o índice em segundo plano logo que uma nova versão do banco aparece."""
+    indice = _indice_atual
+    if indice is not None and indice.versao == banco.versao:
+        return
+    if not _indice_lock.locked():
+        threading.Thread(target=obter_indice_busca, args=(banco,), daemon=True, name="indice-busca").start()
+# --- FIM DA BUSCA TEXTUAL ---
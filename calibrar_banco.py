@@ -0,0 +1,240 @@
+"""Calibração da dificuldade e da discriminação das questões (TRI) a partir das tentativas gravadas.
+
+Uso:
+    python calibrar_banco.py [--modelo 2pl|rasch] [--min-respostas 30] [--sem-partida-quente] [--tentativas arquivo.sqlite3] [banco.json banco.bqpf ...]
+
+Lê as respostas das tentativas finalizadas (persistencia.py; questões em branco não entram)
+e ajusta um modelo logístico: P(acerto) = 1 / (1 + exp(-a * (habilidade - dificuldade))),
+com a = 1 no modelo de Rasch. O ajuste alterna passos de Newton para as habilidades e para
+os parâmetros das questões, cada um calculado de uma vez para todas as respostas
+(np.bincount), com prioris normais que mantêm finitos os candidatos e as questões que
+acertam ou erram tudo. A partida quente começa das dificuldades/discriminações já gravadas
+no banco, e um reajuste com poucas tentativas novas converge em menos iterações.
+
+Os parâmetros das questões com respostas suficientes são gravados de volta no banco: no
+JSON, como as chaves "dificuldade" e "discriminacao" de cada questão; no .bqpf, em duas
+seções opcionais. Sem bancos na linha de comando, grava no JSON e, se existir, no .bqpf
+da pasta do simulador (a mesma que ele lê, de onde quer que o comando rode).
+O simulador recarrega o banco e passa a montar os simulados pelos estratos de dificuldade.
+"""
+import argparse
+import json
+import os
+from array import array
+
+import numpy as np
+
+from banco_questoes import (
+    CAMINHO_BANCO_COMPILADO, CAMINHO_PADRAO_BANCO, BancoCompilado, gravar_calibracao_compilado, parametros_calibracao
+)
+from caminhos import resolver_caminho
+from persistencia import CAMINHO_PADRAO_TENTATIVAS, obter_armazem
+from pontuacao import CODIGO_BRANCO, codificar
+
+MODELOS = ("2pl", "rasch")
+MIN_RESPOSTAS_PADRAO = 30  # Questões com menos respostas mantêm os parâmetros que já tinham
+MAX_ITERACOES = 200
+TOLERANCIA = 1e-4  # Maior passo (em qualquer parâmetro) para considerar o ajuste convergido
+PASSO_MAXIMO = 1.0  # Limita cada passo de Newton enquanto o ajuste ainda está longe
+# Prioris: habilidade ~ N(0, 1), dificuldade ~ N(0, 2²), log(discriminação) ~ N(0, 0,5²)
+VARIANCIA_HABILIDADE = 1.0
+VARIANCIA_DIFICULDADE = 4.0
+VARIANCIA_LOG_DISCRIMINACAO = 0.25
+
+
+def ler_respostas(armazem):
+    """Respostas das tentativas finalizadas como arrays: (pessoa, item, acerto) e a lista de ids dos itens.
+
+    As linhas vão direto para buffers tipados (array), sem um objeto Python por resposta, e
+    o gabarito de cada questão é codificado uma vez (de novo só se a tentativa trouxer
+    outro gabarito gravado para ela).
+    """
+    pessoas, itens, acertos = array('i'), array('i'), array('b')
+    por_questao = {}  # id -> (posição do item, gabarito gravado, código do gabarito)
+    pessoa = -1
+    token_anterior = None
+    for token, q_id, gabarito, resposta in armazem.respostas_registradas():
+        codigo = codificar(resposta)
+        if codigo == CODIGO_BRANCO or q_id is None:
+            continue
+        if token != token_anterior:
+            pessoa += 1
+            token_anterior = token
+        q_id = str(q_id)
+        questao = por_questao.get(q_id)
+        if questao is None or questao[1] != gabarito:
+            item = len(por_questao) if questao is None else questao[0]
+            questao = por_questao[q_id] = (item, gabarito, codificar(gabarito))
+        pessoas.append(pessoa)
+        itens.append(questao[0])
+        acertos.append(codigo == questao[2])
+    return (np.frombuffer(pessoas, dtype=np.intc).astype(np.int32), np.frombuffer(itens, dtype=np.intc).astype(np.int32),
+            np.frombuffer(acertos, dtype=np.int8).astype(np.float64), list(por_questao))
+
+
+def _probabilidades(habilidades, dificuldades, discriminacoes, pessoas, itens):
+    return 1.0 / (1.0 + np.exp(-discriminacoes[itens] * (habilidades[pessoas] - dificuldades[itens])))
+
+
+def ajustar_modelo(pessoas, itens, acertos, num_itens, modelo="2pl", dificuldades_iniciais=None, discriminacoes_iniciais=None,
+                   max_iteracoes=MAX_ITERACOES, tolerancia=TOLERANCIA):
+    """Ajusta o modelo às respostas; devolve (dificuldades, discriminações, habilidades, iterações).
+
+    `pessoas`, `itens` e `acertos` têm uma posição por resposta. Os valores iniciais (NaN =
+    sem valor) fazem a partida quente; os demais itens começam com dificuldade 0 e
+    discriminação 1.
+    """
+    num_pessoas = int(pessoas.max()) + 1 if len(pessoas) else 0
+    dificuldades = np.zeros(num_itens)
+    log_discriminacoes = np.zeros(num_itens)
+    if dificuldades_iniciais is not None:
+        dificuldades = np.where(np.isnan(dificuldades_iniciais), 0.0, dificuldades_iniciais).astype(np.float64)
+    if modelo == "2pl" and discriminacoes_iniciais is not None:
+        validas = ~np.isnan(discriminacoes_iniciais) & (np.nan_to_num(discriminacoes_iniciais) > 0)
+        log_discriminacoes[validas] = np.log(discriminacoes_iniciais[validas])
+    discriminacoes = np.exp(log_discriminacoes)
+    habilidades = np.zeros(num_pessoas)
+
+    def passo_habilidades():
+        p = _probabilidades(habilidades, dificuldades, discriminacoes, pessoas, itens)
+        gradiente = np.bincount(pessoas, a * (acertos - p), num_pessoas) - habilidades / VARIANCIA_HABILIDADE
+        informacao = np.bincount(pessoas, a * a * p * (1 - p), num_pessoas) + 1 / VARIANCIA_HABILIDADE
+        return np.clip(gradiente / informacao, -PASSO_MAXIMO, PASSO_MAXIMO)
+
+    a = discriminacoes[itens]
+    if dificuldades_iniciais is not None:
+        # Partida quente: com os itens fixos, as habilidades convergem sozinhas em poucos passos
+        for _ in range(max_iteracoes):
+            passo = passo_habilidades()
+            habilidades += passo
+            if np.abs(passo).max(initial=0) < tolerancia:
+                break
+
+    iteracao = 0
+    for iteracao in range(1, max_iteracoes + 1):
+        anteriores = np.concatenate((dificuldades, log_discriminacoes))
+        habilidades += passo_habilidades()
+        # A escala só é definida a menos de deslocamento (e, no 2PL, de um fator): fixar média 0
+        # e desvio 1 nas habilidades, compensando nos itens, não muda nenhuma probabilidade e
+        # elimina a direção em que o ajuste alternado andaria devagar
+        centro = habilidades.mean()
+        escala = habilidades.std() if modelo == "2pl" and habilidades.std() > 0 else 1.0
+        habilidades = (habilidades - centro) / escala
+        dificuldades = (dificuldades - centro) / escala
+        log_discriminacoes += np.log(escala)
+        discriminacoes = np.exp(log_discriminacoes)
+        a = discriminacoes[itens]
+
+        p = _probabilidades(habilidades, dificuldades, discriminacoes, pessoas, itens)
+        residuos, pesos = acertos - p, p * (1 - p)
+        gradiente_b = -np.bincount(itens, a * residuos, num_itens) - dificuldades / VARIANCIA_DIFICULDADE
+        informacao_b = np.bincount(itens, a * a * pesos, num_itens) + 1 / VARIANCIA_DIFICULDADE
+        if modelo == "2pl":
+            # Dificuldade e log(a) num só passo de Newton 2x2 por item: nas questões muito fáceis
+            # ou muito difíceis os dois são fortemente correlacionados
+            distancia = a * (habilidades[pessoas] - dificuldades[itens])  # Derivada do logito em log(a)
+            gradiente_a = np.bincount(itens, distancia * residuos, num_itens) - log_discriminacoes / VARIANCIA_LOG_DISCRIMINACAO
+            informacao_a = np.bincount(itens, distancia * distancia * pesos, num_itens) + 1 / VARIANCIA_LOG_DISCRIMINACAO
+            informacao_cruzada = -np.bincount(itens, a * distancia * pesos, num_itens)
+            determinante = informacao_b * informacao_a - informacao_cruzada ** 2
+            passo_b = (informacao_a * gradiente_b - informacao_cruzada * gradiente_a) / determinante
+            passo_a = (informacao_b * gradiente_a - informacao_cruzada * gradiente_b) / determinante
+            log_discriminacoes += np.clip(passo_a, -PASSO_MAXIMO, PASSO_MAXIMO)
+            discriminacoes = np.exp(log_discriminacoes)
+        else:
+            passo_b = gradiente_b / informacao_b
+        dificuldades += np.clip(passo_b, -PASSO_MAXIMO, PASSO_MAXIMO)
+
+        if np.abs(np.concatenate((dificuldades, log_discriminacoes)) - anteriores).max(initial=0) < tolerancia:
+            break
+    return dificuldades, discriminacoes, habilidades, iteracao
+
+
+def parametros_gravados(caminho):
+    """Dificuldade/discriminação já gravadas num banco (.json ou .bqpf), por id; {} se o arquivo não existir."""
+    if not os.path.exists(caminho):
+        return {}
+    if caminho.endswith(".bqpf"):
+        compilado = BancoCompilado(caminho)
+        if compilado.dificuldades is None:
+            return {}
+        return {q_id.decode('utf-8'): (float(b), float(a)) for q_id, b, a in
+                zip(compilado.ids.tolist(), compilado.dificuldades.tolist(), compilado.discriminacoes.tolist())}
+    with open(caminho, 'r', encoding='utf-8') as f:
+        questoes = json.load(f)
+    return {str(q.get('id')): parametros_calibracao(q) for q in questoes if isinstance(q, dict)}
+
+
+def gravar_calibracao_json(caminho, parametros_por_id):
+    """Grava "dificuldade"/"discriminacao" nas questões do JSON (troca atômica); devolve quantas foram atualizadas."""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        questoes = json.load(f)
+    if not isinstance(questoes, list):
+        print(f"LOG ERRO: Conteúdo de '{caminho}' não é uma lista. Calibração não gravada nele.")
+        return 0
+    atualizadas = 0
+    for q in questoes:
+        parametros = parametros_por_id.get(str(q.get('id'))) if isinstance(q, dict) else None
+        if parametros is not None:
+            q['dificuldade'], q['discriminacao'] = round(parametros[0], 4), round(parametros[1], 4)
+            atualizadas += 1
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(questoes, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+    return atualizadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra dificuldade/discriminação (TRI) das questões a partir das tentativas gravadas.")
+    parser.add_argument("bancos", nargs="*", help=f"bancos a atualizar (.json e/ou .bqpf; padrão: {CAMINHO_PADRAO_BANCO} e {CAMINHO_BANCO_COMPILADO}, se existir)")
+    parser.add_argument("--tentativas", default=CAMINHO_PADRAO_TENTATIVAS, help="banco SQLite das tentativas")
+    parser.add_argument("--modelo", choices=MODELOS, default="2pl", help="2pl (dificuldade e discriminação) ou rasch (só dificuldade)")
+    parser.add_argument("--min-respostas", type=int, default=MIN_RESPOSTAS_PADRAO, help="respostas mínimas para gravar os parâmetros de uma questão")
+    parser.add_argument("--sem-partida-quente", action="store_true", help="ignora os parâmetros já gravados e ajusta do zero")
+    args = parser.parse_args()
+    # Os bancos padrão ficam na pasta dos scripts, como no simulador, de onde quer que o comando rode
+    bancos = args.bancos or [c for c in map(resolver_caminho, (CAMINHO_PADRAO_BANCO, CAMINHO_BANCO_COMPILADO)) if os.path.exists(c)]
+
+    pessoas, itens, acertos, ids = ler_respostas(obter_armazem(args.tentativas))
+    if not len(acertos):
+        print(f"LOG AVISO: Nenhuma resposta de tentativa finalizada em '{args.tentativas}'; nada a calibrar.")
+        return
+    print(f"LOG: {len(acertos)} respostas de {int(pessoas.max()) + 1} tentativas finalizadas, {len(ids)} questões.")
+
+    dificuldades_iniciais = discriminacoes_iniciais = None
+    if not args.sem_partida_quente and bancos:
+        gravados = parametros_gravados(bancos[0])
+        iniciais = np.array([gravados.get(q_id, (np.nan, np.nan)) for q_id in ids], dtype=np.float64).reshape(-1, 2)
+        dificuldades_iniciais, discriminacoes_iniciais = iniciais[:, 0], iniciais[:, 1]
+        print(f"LOG: Partida quente a partir de '{bancos[0]}' ({int((~np.isnan(dificuldades_iniciais)).sum())} questões já calibradas).")
+
+    dificuldades, discriminacoes, _, iteracoes = ajustar_modelo(pessoas, itens, acertos, len(ids), args.modelo,
+                                                                dificuldades_iniciais, discriminacoes_iniciais)
+    print(f"LOG: Modelo {args.modelo} ajustado em {iteracoes} iterações.")
+
+    respostas_por_item = np.bincount(itens, minlength=len(ids))
+    suficientes = np.flatnonzero(respostas_por_item >= args.min_respostas)
+    parametros_por_id = {ids[j]: (float(dificuldades[j]), float(discriminacoes[j])) for j in suficientes.tolist()}
+    if len(suficientes) < len(ids):
+        print(f"LOG AVISO: {len(ids) - len(suficientes)} questões têm menos de {args.min_respostas} respostas e mantêm os parâmetros anteriores.")
+    if not parametros_por_id:
+        return
+    print(f"LOG: Dificuldade das {len(suficientes)} questões calibradas: mediana {np.median(dificuldades[suficientes]):.2f}, "
+          f"de {dificuldades[suficientes].min():.2f} a {dificuldades[suficientes].max():.2f}.")
+
+    for caminho in bancos:
+        if caminho.endswith(".bqpf"):
+            try:
+                versao = gravar_calibracao_compilado(caminho, parametros_por_id)
+            except PermissionError as e:
+                print(f"LOG ERRO: {e}")
+                continue
+            print(f"LOG: Calibração gravada em '{caminho}' (versão {versao[:12]}).")
+        else:
+            atualizadas = gravar_calibracao_json(caminho, parametros_por_id)
+            print(f"LOG: Calibração gravada em '{caminho}' ({atualizadas} questões).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+
+# --- CAMINHOS DOS ARQUIVOS DO SIMULADO ---
+# Banco de questões, tentativas e métricas ficam ao lado dos scripts: caminhos relativos
+# não dependem da pasta de onde o servidor ou as ferramentas de linha de comando rodam.
+
+PASTA_SIMULADO = os.path.dirname(os.path.abspath(__file__))
+
+
+def resolver_caminho(caminho_arquivo):
+    """Caminhos relativos são resolvidos a partir da pasta dos scripts do simulado."""
+    if os.path.isabs(caminho_arquivo):
+        return caminho_arquivo
+    return os.path.join(PASTA_SIMULADO, caminho_arquivo)
+# --- FIM DOS CAMINHOS DOS ARQUIVOS ---
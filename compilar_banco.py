@@ -0,0 +1,133 @@
+"""Compila o banco de questões (JSON e/ou fragmentos JSONL) no formato binário .bqpf.
+
+Uso:
+    python compilar_banco.py [-o questoes_pf_agente.bqpf] [--relatorio-duplicatas arquivo.json] [fonte.json fonte2.jsonl ...]
+
+Sem fontes, compila `questoes_pf_agente.json`. O simulador passa a usar o arquivo .bqpf
+automaticamente quando ele existe na pasta do script e não é mais antigo que o JSON, e o
+recarrega quando é recompilado. Depois de editar o JSON, recompile para voltar ao .bqpf.
+
+Durante a compilação, as questões quase duplicadas (mesma disciplina, enunciado reescrito)
+são agrupadas (duplicatas.py); o grupo de cada questão vai para o arquivo compilado e os
+grupos são listados num relatório JSON (por padrão, `<saída>.duplicatas.json`). A
+dificuldade/discriminação gravadas nas questões por calibrar_banco.py são mantidas.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from banco_questoes import (
+    CAMINHO_BANCO_COMPILADO, CAMINHO_PADRAO_BANCO, disciplina_canonica, escrever_banco_compilado, parametros_calibracao, validar_questoes
+)
+from caminhos import resolver_caminho
+from duplicatas import AssinaturasMinHash, agrupar_quase_duplicatas, gravar_relatorio, montar_relatorio
+
+
+def ler_fonte(caminho):
+    """Gera as questões de um arquivo: lista JSON ou JSONL (um objeto por linha, lido em fluxo)."""
+    if caminho.endswith(".jsonl"):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            for num_linha, linha in enumerate(f, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    yield json.loads(linha)
+                except json.JSONDecodeError as e:
+                    print(f"LOG ERRO: Linha {num_linha} de '{caminho}' não é um JSON válido: {e}")
+        return
+
+    with open(caminho, 'r', encoding='utf-8') as f:
+        questoes = json.load(f)
+    if not isinstance(questoes, list):
+        print(f"LOG ERRO: Conteúdo de '{caminho}' não é uma lista. Arquivo ignorado.")
+        return
+    yield from questoes
+
+
+def _relatorio_duplicatas(grupos, menor_similaridade, metadados, disciplinas, caminho_blob, destino):
+    """Grava o relatório dos grupos, lendo do blob só o início dos enunciados agrupados."""
+    offsets = [0]
+    for m in metadados:
+        offsets.append(offsets[-1] + m[4])
+    with open(caminho_blob, 'rb') as blob:
+        def enunciado_de(i):
+            blob.seek(offsets[i])
+            return blob.read(min(offsets[i + 1] - offsets[i], 800)).decode('utf-8', 'ignore')
+        relatorio = montar_relatorio(grupos, menor_similaridade, [m[0] for m in metadados], disciplinas, enunciado_de)
+    gravar_relatorio(relatorio, destino)
+    return relatorio
+
+
+def compilar(fontes, destino, relatorio_duplicatas=None):
+    """Valida as questões de todas as fontes e grava o banco compilado; devolve (total, versão, grupos de duplicatas).
+
+    Só os metadados e as assinaturas MinHash ficam em memória; os enunciados vão direto
+    para um arquivo temporário.
+    """
+    metadados = []
+    disciplinas = []
+    calibracao = []
+    codigos_disciplina = {}
+    assinaturas = AssinaturasMinHash()
+    relatorio = []
+    ids_vistos = set()
+    pasta_destino = os.path.dirname(os.path.abspath(destino))
+    with tempfile.NamedTemporaryFile(dir=pasta_destino, suffix=".blob", delete=False) as blob:
+        try:
+            for fonte in fontes:
+                for q in ler_fonte(fonte):
+                    if not isinstance(q, dict) or not validar_questoes([q], ids_vistos):
+                        continue
+                    if not isinstance(q['bloco'], int) or not 0 <= q['bloco'] <= 255:
+                        print(f"LOG AVISO: Questão {q['id']} tem bloco inválido ('{q['bloco']}') e foi descartada.")
+                        ids_vistos.discard(q['id'])
+                        continue
+                    enunciado = str(q['enunciado'])
+                    assinaturas.adicionar(enunciado)
+                    enunciado = enunciado.encode('utf-8')
+                    blob.write(enunciado)
+                    metadados.append((str(q['id']), q['bloco'], str(q['disciplina']), q['gabarito'], len(enunciado)))
+                    disciplinas.append(disciplina_canonica(str(q['disciplina'])))
+                    calibracao.append(parametros_calibracao(q))
+            blob.close()
+            versao = None
+            if metadados:
+                matriz, validas = assinaturas.resultado()
+                codigos = [codigos_disciplina.setdefault(d, len(codigos_disciplina)) for d in disciplinas]
+                grupos, menor_similaridade = agrupar_quase_duplicatas(matriz, validas, codigos)
+                calibracao = np.array(calibracao, dtype=np.float32)
+                versao = escrever_banco_compilado(metadados, blob.name, destino, grupos=grupos,
+                                                  calibracao=None if np.isnan(calibracao[:, 0]).all() else (calibracao[:, 0], calibracao[:, 1]))
+                relatorio = _relatorio_duplicatas(grupos, menor_similaridade, metadados, disciplinas, blob.name,
+                                                  relatorio_duplicatas or f"{os.path.splitext(destino)[0]}.duplicatas.json")
+        finally:
+            blob.close()
+            os.remove(blob.name)
+    return len(metadados), versao, relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila o banco de questões no formato binário .bqpf.")
+    parser.add_argument("fontes", nargs="*", default=[resolver_caminho(CAMINHO_PADRAO_BANCO)], help="arquivos .json (lista) ou .jsonl")
+    parser.add_argument("-o", "--saida", default=resolver_caminho(CAMINHO_BANCO_COMPILADO), help="arquivo .bqpf de saída")
+    parser.add_argument("--relatorio-duplicatas", help="relatório JSON dos grupos de quase duplicatas (padrão: <saída>.duplicatas.json)")
+    args = parser.parse_args()
+
+    try:
+        total, versao, relatorio = compilar(args.fontes, args.saida, args.relatorio_duplicatas)
+    except PermissionError as e:
+        print(f"LOG ERRO: {e}")
+        return
+    if not total:
+        print("LOG ERRO: Nenhuma questão válida encontrada nas fontes; nenhum arquivo foi gerado.")
+        return
+    print(f"LOG: {total} questões compiladas em '{args.saida}' (versão {versao[:12]}).")
+    if relatorio:
+        print(f"LOG AVISO: {len(relatorio)} grupos de quase duplicatas ({sum(g['tamanho'] for g in relatorio)} questões); o sorteio não junta questões do mesmo grupo. Veja o relatório para revisar.")
+
+
+if __name__ == "__main__":
+    main()
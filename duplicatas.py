@@ -0,0 +1,212 @@
+"""Detecção de questões quase duplicadas (MinHash + LSH sobre o enunciado, por disciplina).
+
+Uso:
+    python duplicatas.py [-o relatorio_duplicatas.json] [fonte.json fonte2.jsonl ...]
+
+O mesmo item, reescrito por fontes diferentes, costuma manter a maior parte das palavras.
+Cada enunciado vira um conjunto de shingles (pares de termos já normalizados pela busca:
+sem acentos, sem palavras vazias, plurais reduzidos) e uma assinatura MinHash. Assinaturas
+que coincidem numa faixa inteira (LSH) viram candidatas; as candidatas da mesma disciplina
+com similaridade estimada acima do limiar são unidas em grupos. O custo é linear no número
+de questões. O compilador do banco grava o grupo de cada questão, e o sorteio não coloca
+duas questões do mesmo grupo num simulado.
+"""
+import argparse
+import json
+import zlib
+
+import numpy as np
+
+from busca import tokenizar
+
+NUM_PERMUTACOES = 64
+BANDAS = 16  # 16 faixas de 4 linhas: pares com similaridade ~0,5 ou mais tendem a colidir em alguma faixa
+TAMANHO_SHINGLE = 2
+LIMIAR_SIMILARIDADE = 0.5
+LOTE_DOCUMENTOS = 1000
+SEMENTE_PERMUTACOES = 20240601
+EXEMPLOS_POR_GRUPO = 5  # Questões de cada grupo com o início do enunciado no relatório (as demais, só o id)
+
+_PRIMO = (1 << 61) - 1
+_MASCARA_32 = np.uint64(0xFFFFFFFF)
+_MULTIPLICADORES_SHINGLE = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F), np.uint64(1))
+
+
+class AssinaturasMinHash:
+    """Recebe os textos um a um e calcula as assinaturas MinHash em lotes vetorizados."""
+
+    def __init__(self):
+        rng = np.random.default_rng(SEMENTE_PERMUTACOES)
+        # a, b < 2^32 e x < 2^32: a * x + b cabe em 64 bits antes do módulo
+        self._a = rng.integers(1, 1 << 32, size=(NUM_PERMUTACOES, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=(NUM_PERMUTACOES, 1), dtype=np.uint64)
+        self._hash_termo = {}
+        self._pendentes = []
+        self._lotes = []
+
+    def adicionar(self, texto):
+        termos = tokenizar(texto)
+        hashes = []
+        for termo in termos:
+            h = self._hash_termo.get(termo)
+            if h is None:
+                h = self._hash_termo[termo] = zlib.crc32(termo.encode('utf-8'))
+            hashes.append(h)
+        self._pendentes.append(hashes)
+        if len(self._pendentes) >= LOTE_DOCUMENTOS:
+            self._processar_pendentes()
+
+    def _shingles_do_lote(self, documentos):
+        """Hashes (uint64 < 2^32) dos shingles do lote e o documento de cada um, em ordem."""
+        tamanhos = np.array([len(d) for d in documentos], dtype=np.int64)
+        termos = np.fromiter((h for d in documentos for h in d), dtype=np.uint64, count=int(tamanhos.sum()))
+        documento_do_termo = np.repeat(np.arange(len(documentos)), tamanhos)
+
+        k = TAMANHO_SHINGLE
+        if len(termos) >= k:
+            # Shingle em j é válido se as k posições pertencem ao mesmo documento
+            validos = documento_do_termo[:len(termos) - k + 1] == documento_do_termo[k - 1:]
+            combinados = sum(termos[j:len(termos) - k + 1 + j] * _MULTIPLICADORES_SHINGLE[j] for j in range(k))
+            shingles = (combinados ^ (combinados >> np.uint64(32)))[validos] & _MASCARA_32
+            documentos_shingles = documento_do_termo[:len(termos) - k + 1][validos]
+        else:
+            shingles = np.empty(0, dtype=np.uint64)
+            documentos_shingles = np.empty(0, dtype=np.int64)
+
+        # Textos curtos demais para um shingle usam os próprios termos
+        curtos = np.isin(documento_do_termo, np.flatnonzero((tamanhos > 0) & (tamanhos < k)))
+        shingles = np.concatenate((shingles, termos[curtos]))
+        documentos_shingles = np.concatenate((documentos_shingles, documento_do_termo[curtos]))
+        ordem = np.argsort(documentos_shingles, kind="stable")
+        return shingles[ordem], documentos_shingles[ordem]
+
+    def _processar_pendentes(self):
+        documentos, self._pendentes = self._pendentes, []
+        assinaturas = np.full((len(documentos), NUM_PERMUTACOES), np.iinfo(np.uint32).max, dtype=np.uint32)
+        shingles, documentos_shingles = self._shingles_do_lote(documentos)
+        if len(shingles):
+            inicios = np.flatnonzero(np.r_[True, documentos_shingles[1:] != documentos_shingles[:-1]])
+            valores = (self._a * shingles[None, :] + self._b) % np.uint64(_PRIMO) & _MASCARA_32
+            assinaturas[documentos_shingles[inicios]] = np.minimum.reduceat(valores, inicios, axis=1).T
+        self._lotes.append((assinaturas, np.array([len(d) > 0 for d in documentos], dtype=bool)))
+
+    def resultado(self):
+        """(assinaturas (n, NUM_PERMUTACOES) uint32, máscara dos textos que tinham algum termo)."""
+        if self._pendentes:
+            self._processar_pendentes()
+        if not self._lotes:
+            return np.empty((0, NUM_PERMUTACOES), dtype=np.uint32), np.empty(0, dtype=bool)
+        return np.concatenate([a for a, _ in self._lotes]), np.concatenate([v for _, v in self._lotes])
+
+
+def _raiz(pais, i):
+    while pais[i] != i:
+        pais[i] = pais[pais[i]]
+        i = pais[i]
+    return i
+
+
+def agrupar_quase_duplicatas(assinaturas, validas, codigos_disciplina, limiar=LIMIAR_SIMILARIDADE):
+    """Grupo de cada questão (int32; -1 = sem quase duplicata) e a menor similaridade de cada grupo."""
+    n = len(assinaturas)
+    codigos_disciplina = np.asarray(codigos_disciplina, dtype=np.int64)
+    posicoes = np.flatnonzero(validas)
+    linhas_por_banda = NUM_PERMUTACOES // BANDAS
+
+    pares = []
+    for banda in range(BANDAS):
+        faixa = assinaturas[posicoes, banda * linhas_por_banda:(banda + 1) * linhas_por_banda].astype(np.uint64)
+        chave = np.zeros(len(posicoes), dtype=np.uint64)
+        for coluna in range(linhas_por_banda):
+            chave = chave * np.uint64(0x100000001B3) ^ faixa[:, coluna]
+        # Mesma disciplina e mesma faixa ficam vizinhas; cada uma vira par com a seguinte
+        ordem = np.lexsort((chave, codigos_disciplina[posicoes]))
+        iguais = (chave[ordem][1:] == chave[ordem][:-1]) & (codigos_disciplina[posicoes][ordem][1:] == codigos_disciplina[posicoes][ordem][:-1])
+        vizinhos = posicoes[ordem]
+        pares.append(np.stack((vizinhos[:-1][iguais], vizinhos[1:][iguais]), axis=1))
+
+    grupos = np.full(n, -1, dtype=np.int32)
+    if not pares or not sum(len(p) for p in pares):
+        return grupos, []
+    pares = np.unique(np.sort(np.concatenate(pares), axis=1), axis=0)
+    similaridades = (assinaturas[pares[:, 0]] == assinaturas[pares[:, 1]]).mean(axis=1)
+    aceitos = similaridades >= limiar
+    pares, similaridades = pares[aceitos], similaridades[aceitos]
+
+    pais = {}
+    for i, j in pares.tolist():
+        pais.setdefault(i, i)
+        pais.setdefault(j, j)
+        ri, rj = _raiz(pais, i), _raiz(pais, j)
+        if ri != rj:
+            pais[max(ri, rj)] = min(ri, rj)
+    raizes = sorted({_raiz(pais, i) for i in pais})
+    numero_grupo = {r: g for g, r in enumerate(raizes)}
+    for i in pais:
+        grupos[i] = numero_grupo[_raiz(pais, i)]
+
+    menor_similaridade = [1.0] * len(raizes)
+    for (i, _), similaridade in zip(pares.tolist(), similaridades.tolist()):
+        g = grupos[i]
+        menor_similaridade[g] = min(menor_similaridade[g], similaridade)
+    return grupos, menor_similaridade
+
+
+def detectar_quase_duplicatas(enunciados, disciplinas, limiar=LIMIAR_SIMILARIDADE):
+    """Atalho para textos em memória: devolve (grupos, menor similaridade de cada grupo)."""
+    coletor = AssinaturasMinHash()
+    for enunciado in enunciados:
+        coletor.adicionar(str(enunciado))
+    assinaturas, validas = coletor.resultado()
+    tabela = {}
+    codigos = [tabela.setdefault(d, len(tabela)) for d in disciplinas]
+    return agrupar_quase_duplicatas(assinaturas, validas, codigos, limiar)
+
+
+def montar_relatorio(grupos, menor_similaridade, ids, disciplinas, enunciado_de):
+    """Lista de grupos (maiores primeiro) com ids, disciplina e o início de cada enunciado."""
+    membros = {}
+    for i, g in enumerate(grupos.tolist()):
+        if g >= 0:
+            membros.setdefault(g, []).append(i)
+    relatorio = []
+    for g, indices in sorted(membros.items(), key=lambda item: -len(item[1])):
+        relatorio.append({
+            "grupo": g,
+            "disciplina": disciplinas[indices[0]],
+            "tamanho": len(indices),
+            "menor_similaridade_estimada": round(menor_similaridade[g], 3),
+            "questoes": [{"id": ids[i], "enunciado": enunciado_de(i)[:200]} if n < EXEMPLOS_POR_GRUPO else {"id": ids[i]}
+                         for n, i in enumerate(indices)],
+        })
+    return relatorio
+
+
+def gravar_relatorio(relatorio, destino):
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump({"total_grupos": len(relatorio), "total_questoes_em_grupos": sum(g["tamanho"] for g in relatorio), "grupos": relatorio},
+                  f, ensure_ascii=False, indent=2)
+
+
+def main():
+    from banco_questoes import CAMINHO_PADRAO_BANCO, disciplina_canonica, validar_questoes
+    from caminhos import resolver_caminho
+    from compilar_banco import ler_fonte
+
+    parser = argparse.ArgumentParser(description="Relatório de questões quase duplicadas (MinHash + LSH por disciplina).")
+    parser.add_argument("fontes", nargs="*", default=[resolver_caminho(CAMINHO_PADRAO_BANCO)], help="arquivos .json (lista) ou .jsonl")
+    parser.add_argument("-o", "--saida", default=resolver_caminho("relatorio_duplicatas.json"), help="arquivo JSON do relatório")
+    parser.add_argument("--limiar", type=float, default=LIMIAR_SIMILARIDADE, help="similaridade mínima (0 a 1) para agrupar")
+    args = parser.parse_args()
+
+    ids_vistos = set()
+    questoes = [q for fonte in args.fontes for q in ler_fonte(fonte) if isinstance(q, dict) and validar_questoes([q], ids_vistos)]
+    disciplinas = [disciplina_canonica(q['disciplina']) for q in questoes]
+    grupos, menor_similaridade = detectar_quase_duplicatas((q['enunciado'] for q in questoes), disciplinas, args.limiar)
+    relatorio = montar_relatorio(grupos, menor_similaridade, [q['id'] for q in questoes], disciplinas, lambda i: str(questoes[i]['enunciado']))
+    gravar_relatorio(relatorio, args.saida)
+    print(f"LOG: {len(relatorio)} grupos de quase duplicatas ({int((grupos >= 0).sum())} de {len(questoes)} questões) gravados em '{args.saida}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# --- CONSTANTES E CONFIGURAÇÕES DO SIMULADO (Agente PF) ---
+# Baseado no Edital fornecido
+TEMPO_TOTAL_SEGUNDOS = (4 * 3600) + (30 * 60)  # 4 horas e 30 minutos [cite: 407]
+NUM_QUESTOES_BLOCO_1 = 60  # [cite: 404]
+NUM_QUESTOES_BLOCO_2 = 36  # [cite: 404]
+NUM_QUESTOES_BLOCO_3 = 24  # [cite: 404]
+TOTAL_QUESTOES_PROVA = NUM_QUESTOES_BLOCO_1 + NUM_QUESTOES_BLOCO_2 + NUM_QUESTOES_BLOCO_3
+
+QUESTOES_POR_BLOCO = {
+    1: NUM_QUESTOES_BLOCO_1,
+    2: NUM_QUESTOES_BLOCO_2,
+    3: NUM_QUESTOES_BLOCO_3
+}
+
+# Critérios de Reprovação (será REPROVADO se nota INFERIOR a estes valores)
+# Portanto, para APROVAÇÃO, a nota deve ser MAIOR OU IGUAL
+MIN_PONTOS_BLOCO_1 = 6.00  # [cite: 442]
+MIN_PONTOS_BLOCO_2 = 3.00  # [cite: 443]
+MIN_PONTOS_BLOCO_3 = 2.00  # [cite: 444]
+MIN_PONTOS_TOTAL = 48.00 # [cite: 444]
+
+# Cotas de questões por disciplina dentro de cada bloco, espelhando a distribuição do edital.
+# Vagas não cobertas (ou disciplinas sem questões suficientes no banco) são completadas
+# com questões de qualquer disciplina do mesmo bloco. Blocos sem cotas são sorteados livremente.
+COTAS_DISCIPLINA_POR_BLOCO = {
+    1: {
+        "Língua Portuguesa": 14,
+        "Noções de Direito Administrativo": 8,
+        "Noções de Direito Constitucional": 8,
+        "Noções de Direito Penal e Processual Penal": 8,
+        "Legislação Especial": 8,
+        "Direitos Humanos": 4,
+        "Estatística": 5,
+        "Raciocínio Lógico": 5,
+    },
+}
+
+# Perfil de dificuldade de cada bloco: pesos dos estratos (fácil, média, difícil) entre as
+# questões calibradas (ver calibrar_banco.py). Os estratos são os tercis da dificuldade no
+# bloco, então pesos iguais deixam todo simulado perto da dificuldade média do banco, sem a
+# variação de um sorteio livre. Enquanto o banco não tiver calibração, o sorteio é livre.
+PERFIL_DIFICULDADE_POR_BLOCO = {
+    1: (1, 1, 1),
+    2: (1, 1, 1),
+    3: (1, 1, 1),
+}
+
+# Nomes alternativos de disciplina usados no banco -> nome canônico usado nas cotas
+DISCIPLINAS_EQUIVALENTES = {
+    "Noções de Direito Penal": "Noções de Direito Penal e Processual Penal",
+    "Noções de Direito Processual Penal": "Noções de Direito Penal e Processual Penal",
+}
+# --- FIM DAS CONFIGURAÇÕES ---
@@ -0,0 +1,161 @@
+"""Estimativa (Monte Carlo) da chance de aprovação a partir de uma estratégia de prova.
+
+Uso:
+    python estimativa_aprovacao.py [--respondidas 85] [--acerto 0.8] [-n 1000000] [-p 4] [--semente 1]
+
+Cada grupo de questões (um bloco inteiro ou uma disciplina de um bloco) tem um número de
+questões respondidas e uma taxa de acerto; as demais ficam em branco. Para cada folha de
+resposta sorteada, o número de acertos de cada grupo segue uma binomial, os pontos seguem
+a regra Cebraspe (+1 certa, -1 errada) e a aprovação segue os mínimos do edital. Sortear
+acertos por grupo equivale a sortear questão por questão, mas custa uma binomial por
+grupo em vez de uma por questão, sem montar as folhas na memória.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from edital import MIN_PONTOS_TOTAL, QUESTOES_POR_BLOCO, TOTAL_QUESTOES_PROVA
+from metricas import cronometrado
+from montagem_simulado import repartir_proporcionalmente
+from pontuacao import BLOCOS, MIN_PONTOS_POR_BLOCO, SITUACAO_CERTA, SITUACAO_ERRADA, aplicar_criterios
+
+AMOSTRAS_PADRAO = 1_000_000
+TAMANHO_LOTE = 250_000  # Folhas sorteadas por vez (limita a memória e define a divisão entre processos)
+
+
+def perfil_uniforme(respondidas, taxa_acerto):
+    """Um grupo por bloco: as respondidas são distribuídas na proporção do tamanho de cada bloco."""
+    respondidas = max(0, min(int(respondidas), TOTAL_QUESTOES_PROVA))
+    por_bloco = repartir_proporcionalmente(respondidas, list(QUESTOES_POR_BLOCO.values()))
+    return [(bloco, n, taxa_acerto) for bloco, n in zip(QUESTOES_POR_BLOCO, por_bloco)]
+
+
+def perfil_da_revisao(revisao):
+    """Um grupo por (bloco, disciplina) de uma tentativa corrigida, com o desempenho observado nela.
+
+    A taxa de acerto usa a correção de Laplace ((acertos + 1) / (respondidas + 2)), para que
+    poucas questões numa disciplina não virem 0% ou 100% de certeza.
+    """
+    blocos = revisao.banco.blocos[revisao.indices]
+    grupos = []
+    for disciplina, indices in revisao.indices_por_disciplina.items():
+        for bloco in np.unique(blocos[indices]).tolist():
+            if bloco not in BLOCOS:
+                continue
+            situacoes = revisao.situacoes[indices[blocos[indices] == bloco]]
+            acertos = int((situacoes == SITUACAO_CERTA).sum())
+            respondidas = acertos + int((situacoes == SITUACAO_ERRADA).sum())
+            if respondidas:
+                grupos.append((bloco, respondidas, (acertos + 1) / (respondidas + 2)))
+    return grupos
+
+
+def _simular_lote(grupos, amostras, semente):
+    """Sorteia `amostras` folhas; devolve os histogramas de pontos por bloco e a contagem de aprovações."""
+    rng = np.random.default_rng(semente)
+    pontos = np.zeros((amostras, len(BLOCOS)), dtype=np.int16)
+    for bloco, respondidas, taxa_acerto in grupos:
+        acertos = rng.binomial(respondidas, taxa_acerto, size=amostras).astype(np.int16)
+        pontos[:, BLOCOS.index(bloco)] += 2 * acertos - respondidas
+
+    _, aprovado_no_bloco, aprovado_na_pontuacao_total, aprovado = aplicar_criterios(pontos)
+    # Pontos de um bloco vão de -N a +N; o histograma é deslocado em N
+    histogramas = [np.bincount(pontos[:, j] + QUESTOES_POR_BLOCO[bloco], minlength=2 * QUESTOES_POR_BLOCO[bloco] + 1)
+                   for j, bloco in enumerate(BLOCOS)]
+    total = np.bincount(pontos.sum(axis=1, dtype=np.int32) + TOTAL_QUESTOES_PROVA, minlength=2 * TOTAL_QUESTOES_PROVA + 1)
+    return histogramas, total, aprovado_no_bloco.sum(axis=0), int(aprovado_na_pontuacao_total.sum()), int(aprovado.sum())
+
+
+def _validar_grupos(grupos):
+    contagem = dict.fromkeys(BLOCOS, 0)
+    validos = []
+    for bloco, respondidas, taxa_acerto in grupos:
+        if bloco not in contagem:
+            raise ValueError(f"Bloco inválido: {bloco}.")
+        if not 0 <= taxa_acerto <= 1:
+            raise ValueError(f"Taxa de acerto fora de [0, 1]: {taxa_acerto}.")
+        contagem[bloco] += int(respondidas)
+        if respondidas > 0:
+            validos.append((bloco, int(respondidas), float(taxa_acerto)))
+    for bloco, respondidas in contagem.items():
+        if respondidas > QUESTOES_POR_BLOCO[bloco]:
+            raise ValueError(f"Bloco {bloco} tem {QUESTOES_POR_BLOCO[bloco]} questões, mas {respondidas} foram informadas como respondidas.")
+    return validos
+
+
+def _distribuicao(histograma, deslocamento, amostras):
+    valores = np.arange(len(histograma)) - deslocamento
+    probabilidades = histograma / amostras
+    return {"valores": valores, "probabilidades": probabilidades, "media": float(valores @ probabilidades)}
+
+
+@cronometrado("estimar_aprovacao")
+def estimar_aprovacao(grupos, amostras=AMOSTRAS_PADRAO, semente=None, processos=1):
+    """Probabilidade de aprovação e distribuição dos pontos para uma estratégia.
+
+    `grupos` é uma sequência de (bloco, respondidas, taxa_acerto). Com a mesma semente o
+    resultado não depende de `processos`: cada lote tem sua própria semente derivada.
+    Devolve um dicionário com a probabilidade de aprovação (geral, por bloco e no mínimo
+    total) e, em "B1", "B2", "B3" e "total", a distribuição dos pontos (valores,
+    probabilidades e média).
+    """
+    if amostras < 1:
+        raise ValueError(f"O número de amostras deve ser pelo menos 1 (recebido: {amostras}).")
+    grupos = _validar_grupos(grupos)
+    tamanhos = [TAMANHO_LOTE] * (amostras // TAMANHO_LOTE) + ([amostras % TAMANHO_LOTE] if amostras % TAMANHO_LOTE else [])
+    sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+
+    if processos > 1 and len(tamanhos) > 1:
+        with ProcessPoolExecutor(max_workers=min(processos, len(tamanhos))) as executor:
+            parciais = list(executor.map(_simular_lote, [grupos] * len(tamanhos), tamanhos, sementes))
+    else:
+        parciais = [_simular_lote(grupos, n, s) for n, s in zip(tamanhos, sementes)]
+
+    histogramas = [sum(p[0][j] for p in parciais) for j in range(len(BLOCOS))]
+    total = sum(p[1] for p in parciais)
+    aprovados_no_bloco = sum(p[2] for p in parciais)
+    estimativa = {
+        "amostras": amostras,
+        "probabilidade_aprovacao": sum(p[4] for p in parciais) / amostras,
+        "probabilidade_pontuacao_total": sum(p[3] for p in parciais) / amostras,
+        "total": _distribuicao(total, TOTAL_QUESTOES_PROVA, amostras),
+    }
+    for j, bloco in enumerate(BLOCOS):
+        estimativa[f"B{bloco}"] = {
+            **_distribuicao(histogramas[j], QUESTOES_POR_BLOCO[bloco], amostras),
+            "probabilidade_aprovacao": float(aprovados_no_bloco[j]) / amostras,
+        }
+    return estimativa
+
+
+def _inteiro_positivo(texto):
+    """Tipo do argparse para contagens que precisam ser >= 1."""
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{texto}' não é um número inteiro.")
+    if valor < 1:
+        raise argparse.ArgumentTypeError(f"deve ser pelo menos 1 (recebido: {valor}).")
+    return valor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chance de aprovação (Monte Carlo) para uma estratégia de prova.")
+    parser.add_argument("--respondidas", type=int, default=85, help="questões respondidas (as demais ficam em branco)")
+    parser.add_argument("--acerto", type=float, default=0.8, help="taxa de acerto nas respondidas (0 a 1)")
+    parser.add_argument("-n", "--amostras", type=_inteiro_positivo, default=AMOSTRAS_PADRAO, help="folhas de resposta sorteadas")
+    parser.add_argument("-p", "--processos", type=_inteiro_positivo, default=1, help="processos usados no sorteio")
+    parser.add_argument("--semente", type=int, help="semente (para repetir o resultado)")
+    args = parser.parse_args()
+
+    estimativa = estimar_aprovacao(perfil_uniforme(args.respondidas, args.acerto), args.amostras, args.semente, args.processos)
+    print(f"Chance de aprovação: {estimativa['probabilidade_aprovacao']:.2%} ({estimativa['amostras']} folhas sorteadas)")
+    for j, bloco in enumerate(BLOCOS):
+        dados = estimativa[f"B{bloco}"]
+        print(f"  Bloco {bloco}: média {dados['media']:.1f} pontos | P(≥ {MIN_PONTOS_POR_BLOCO[j]:.0f}) = {dados['probabilidade_aprovacao']:.2%}")
+    print(f"  Total: média {estimativa['total']['media']:.1f} pontos | P(≥ {MIN_PONTOS_TOTAL:.0f}) = {estimativa['probabilidade_pontuacao_total']:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Exportação em lote das tentativas corrigidas (CSV ou Parquet) e dos relatórios em PDF.
+
+Uso:
+    python exportar_tentativas.py [-o tentativas.csv | tentativas.parquet] [--situacao finalizado|em_andamento|abandonado|todas]
+                                  [--gabarito atual|gravado] [--lote 500] [--relatorios pasta_pdf] [-p 4] [--tentativas arquivo.sqlite3]
+
+Gera dois arquivos: um com uma linha por tentativa (pontos, acertos, erros e brancos por
+bloco, pontuação total e aprovação, como em calcular_pontuacao) e outro, com o sufixo
+`_questoes`, com uma linha por questão de cada tentativa (resposta, gabarito e situação).
+As tentativas são lidas do SQLite em lotes, corrigidas em lote (pontuacao.py) e gravadas
+no fim de cada arquivo; a memória usada depende do tamanho do lote, não do total.
+
+Por padrão, a correção usa o gabarito atual do banco de questões (o mesmo que o simulador
+carrega), buscado pelo id de cada questão: uma correção de gabarito publicada no banco
+chega à exportação. Questões que não estão mais no banco usam o gabarito gravado com a
+tentativa. Com --gabarito gravado, vale só o gabarito da época em que a prova foi feita.
+
+Com --relatorios, cada tentativa ganha um PDF com o gabarito comentado (relatorios_pdf.py).
+Os PDFs são gerados num pool de processos, com no máximo dois lotes por processo na fila.
+Roda fora do servidor do Streamlit, que continua atendendo normalmente.
+"""
+import argparse
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from banco_questoes import caminho_banco_preferido, obter_banco
+from persistencia import CAMINHO_PADRAO_TENTATIVAS, SITUACAO_ABANDONADO, SITUACAO_EM_ANDAMENTO, SITUACAO_FINALIZADO, obter_armazem
+from pontuacao import (
+    BLOCOS, RESPOSTAS_POR_CODIGO, SITUACAO_BRANCA, SITUACAO_CERTA, SITUACAO_ERRADA, pontuar_tentativas,
+    resultado_da_tentativa, situacao_das_questoes
+)
+from relatorios_pdf import gerar_relatorio_tentativa
+
+TAMANHO_LOTE_PADRAO = 500
+SITUACOES = {"finalizado": SITUACAO_FINALIZADO, "em_andamento": SITUACAO_EM_ANDAMENTO, "abandonado": SITUACAO_ABANDONADO, "todas": None}
+
+COLUNAS_TENTATIVAS = (
+    ("token", "texto"), ("semente", "inteiro"), ("versao_banco", "texto"), ("situacao", "texto"), ("criado_em", "texto"),
+    ("segundos_utilizados", "real"),
+    *((f"B{bloco}_{campo}", tipo) for bloco in BLOCOS for campo, tipo in
+      (("corretas", "inteiro"), ("erradas", "inteiro"), ("brancas", "inteiro"), ("pontos", "real"), ("aprovado", "logico"))),
+    ("total_pontos", "real"), ("aprovado_pontuacao_total", "logico"), ("aprovado", "logico"),
+)
+COLUNAS_QUESTOES = (
+    ("token", "texto"), ("posicao", "inteiro"), ("questao_id", "texto"), ("bloco", "inteiro"), ("disciplina", "texto"),
+    ("gabarito", "texto"), ("resposta", "texto"), ("situacao", "texto"), ("pontos", "inteiro"),
+)
+_NOMES_SITUACAO = {SITUACAO_BRANCA: "branca", SITUACAO_CERTA: "certa", SITUACAO_ERRADA: "errada"}
+_PONTOS_SITUACAO = {SITUACAO_BRANCA: 0, SITUACAO_CERTA: 1, SITUACAO_ERRADA: -1}
+
+
+class _EscritorCsv:
+    def __init__(self, caminho, colunas):
+        self._arquivo = open(caminho, 'w', encoding='utf-8', newline='')
+        self._csv = csv.writer(self._arquivo)
+        self._csv.writerow([nome for nome, _ in colunas])
+        self._colunas = [nome for nome, _ in colunas]
+
+    def escrever(self, dados):
+        self._csv.writerows(zip(*(dados[nome] for nome in self._colunas)))
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+class _EscritorParquet:
+    """Cada lote vira um row group do arquivo; pyarrow só é importado quando a saída é Parquet."""
+
+    def __init__(self, caminho, colunas):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tipos = {"texto": pa.string(), "inteiro": pa.int64(), "real": pa.float64(), "logico": pa.bool_()}
+        self._pa = pa
+        self._schema = pa.schema([(nome, tipos[tipo]) for nome, tipo in colunas])
+        self._escritor = pq.ParquetWriter(caminho, self._schema)
+
+    def escrever(self, dados):
+        self._escritor.write_table(self._pa.Table.from_pydict({nome: dados[nome] for nome in self._schema.names}, schema=self._schema))
+
+    def fechar(self):
+        self._escritor.close()
+
+
+def _caminhos_saida(saida):
+    base, extensao = os.path.splitext(saida)
+    return saida, f"{base}_questoes{extensao or '.csv'}"
+
+
+def gabaritos_do_banco(banco):
+    """Gabarito atual (letra) de cada id do banco."""
+    return {q['id']: q['gabarito'] for q in banco}
+
+
+def _aplicar_gabaritos(tentativa, gabaritos):
+    """Troca, nas questões da tentativa, o gabarito gravado pelo atual; devolve quantos mudaram."""
+    questoes = []
+    alterados = 0
+    for questao in tentativa["questoes"]:
+        gabarito = gabaritos.get(questao.get('id'), questao.get('gabarito'))
+        if gabarito != questao.get('gabarito'):
+            questao = {**questao, 'gabarito': gabarito}
+            alterados += 1
+        questoes.append(questao)
+    tentativa["questoes"] = questoes
+    return alterados
+
+
+def corrigir_lote(tentativas, gabaritos=None):
+    """Corrige um lote de tentativas; devolve (colunas das tentativas, colunas das questões, dados dos relatórios, gabaritos trocados).
+
+    `gabaritos` (id -> letra) substitui o gabarito gravado com cada tentativa; None usa o gravado.
+    """
+    alterados = sum(_aplicar_gabaritos(t, gabaritos) for t in tentativas) if gabaritos else 0
+    lote = pontuar_tentativas((t["respostas"], t["questoes"]) for t in tentativas)
+    situacoes_lote = situacao_das_questoes(lote["respostas"], lote["gabarito"])
+    linhas_tentativas = {nome: [] for nome, _ in COLUNAS_TENTATIVAS}
+    linhas_questoes = {nome: [] for nome, _ in COLUNAS_QUESTOES}
+    relatorios = []
+    for i, tentativa in enumerate(tentativas):
+        questoes = tentativa["questoes"]
+        # Linhas das matrizes do lote, sem o preenchimento das tentativas mais longas
+        respostas = lote["respostas"][i, :len(questoes)]
+        situacoes = situacoes_lote[i, :len(questoes)]
+
+        linhas_tentativas["token"].append(tentativa["token"])
+        linhas_tentativas["semente"].append(tentativa["semente"])
+        linhas_tentativas["versao_banco"].append(tentativa["versao_banco"])
+        linhas_tentativas["situacao"].append(tentativa["situacao"])
+        linhas_tentativas["criado_em"].append(time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(tentativa["criado_em"])) if tentativa["criado_em"] else None)
+        linhas_tentativas["segundos_utilizados"].append(float(tentativa["segundos_utilizados"]))
+        for j, bloco in enumerate(BLOCOS):
+            linhas_tentativas[f"B{bloco}_corretas"].append(int(lote["corretas"][i, j]))
+            linhas_tentativas[f"B{bloco}_erradas"].append(int(lote["erradas"][i, j]))
+            linhas_tentativas[f"B{bloco}_brancas"].append(int(lote["brancas"][i, j]))
+            linhas_tentativas[f"B{bloco}_pontos"].append(float(lote["pontos"][i, j]))
+            linhas_tentativas[f"B{bloco}_aprovado"].append(bool(lote["aprovado_no_bloco"][i, j]))
+        linhas_tentativas["total_pontos"].append(float(lote["total_pontos"][i]))
+        linhas_tentativas["aprovado_pontuacao_total"].append(bool(lote["aprovado_na_pontuacao_total"][i]))
+        linhas_tentativas["aprovado"].append(bool(lote["aprovado"][i]))
+
+        for posicao, (questao, codigo, situacao) in enumerate(zip(questoes, respostas.tolist(), situacoes.tolist()), start=1):
+            bloco = questao.get('bloco')
+            linhas_questoes["token"].append(tentativa["token"])
+            linhas_questoes["posicao"].append(posicao)
+            linhas_questoes["questao_id"].append(str(questao.get('id')))
+            linhas_questoes["bloco"].append(bloco if isinstance(bloco, int) else None)
+            linhas_questoes["disciplina"].append(questao.get('disciplina'))
+            linhas_questoes["gabarito"].append(questao.get('gabarito'))
+            linhas_questoes["resposta"].append(RESPOSTAS_POR_CODIGO[codigo])
+            linhas_questoes["situacao"].append(_NOMES_SITUACAO[situacao])
+            linhas_questoes["pontos"].append(_PONTOS_SITUACAO[situacao])
+
+        relatorios.append((tentativa, resultado_da_tentativa(lote, i), respostas.tolist(), situacoes.tolist()))
+    return linhas_tentativas, linhas_questoes, relatorios, alterados
+
+
+def _gerar_relatorios(relatorios, pasta):
+    """Gera os PDFs de um lote (roda nos processos do pool); devolve quantos foram gravados."""
+    for tentativa, resultado, respostas, situacoes in relatorios:
+        gerar_relatorio_tentativa(tentativa, resultado, respostas, situacoes, os.path.join(pasta, f"{tentativa['token']}.pdf"))
+    return len(relatorios)
+
+
+def exportar(armazem, saida, situacao=SITUACAO_FINALIZADO, tamanho_lote=TAMANHO_LOTE_PADRAO, pasta_relatorios=None, processos=1,
+             gabaritos=None):
+    """Exporta as tentativas lote a lote; devolve (tentativas exportadas, relatórios gerados, gabaritos trocados).
+
+    `gabaritos` (id -> letra, ver gabaritos_do_banco) corrige pelo gabarito atual; None, pelo gravado.
+    """
+    caminho_tentativas, caminho_questoes = _caminhos_saida(saida)
+    classe_escritor = _EscritorParquet if saida.endswith(".parquet") else _EscritorCsv
+    escritores = (classe_escritor(caminho_tentativas, COLUNAS_TENTATIVAS), classe_escritor(caminho_questoes, COLUNAS_QUESTOES))
+    if pasta_relatorios:
+        os.makedirs(pasta_relatorios, exist_ok=True)
+    executor = ProcessPoolExecutor(max_workers=processos) if pasta_relatorios and processos > 1 else None
+    pendentes = deque()
+    exportadas = relatorios_gerados = gabaritos_trocados = 0
+    try:
+        for tentativas in armazem.tentativas_em_lotes(situacao, tamanho_lote):
+            linhas_tentativas, linhas_questoes, relatorios, alterados = corrigir_lote(tentativas, gabaritos)
+            gabaritos_trocados += alterados
+            escritores[0].escrever(linhas_tentativas)
+            escritores[1].escrever(linhas_questoes)
+            exportadas += len(tentativas)
+            if pasta_relatorios and executor is None:
+                relatorios_gerados += _gerar_relatorios(relatorios, pasta_relatorios)
+            elif pasta_relatorios:
+                pendentes.append(executor.submit(_gerar_relatorios, relatorios, pasta_relatorios))
+                # Fila limitada: a leitura espera os processos em vez de acumular lotes na memória
+                while len(pendentes) > 2 * processos:
+                    relatorios_gerados += pendentes.popleft().result()
+            print(f"LOG: {exportadas} tentativas exportadas...")
+        while pendentes:
+            relatorios_gerados += pendentes.popleft().result()
+    finally:
+        for escritor in escritores:
+            escritor.fechar()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return exportadas, relatorios_gerados, gabaritos_trocados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta as tentativas corrigidas (CSV/Parquet) e, opcionalmente, relatórios em PDF.")
+    parser.add_argument("-o", "--saida", default="tentativas.csv", help="arquivo .csv ou .parquet (as questões vão para <saída>_questoes)")
+    parser.add_argument("--situacao", choices=SITUACOES, default="finalizado", help="tentativas exportadas")
+    parser.add_argument("--gabarito", choices=("atual", "gravado"), default="atual",
+                        help="corrige pelo gabarito atual do banco de questões ou pelo gravado com cada tentativa")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE_PADRAO, help="tentativas lidas e corrigidas por vez")
+    parser.add_argument("--relatorios", help="pasta onde gravar um PDF por tentativa")
+    parser.add_argument("-p", "--processos", type=int, default=os.cpu_count() or 1, help="processos que geram os PDFs")
+    parser.add_argument("--tentativas", default=CAMINHO_PADRAO_TENTATIVAS, help="banco SQLite das tentativas")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    gabaritos = None
+    if args.gabarito == "atual":
+        banco = obter_banco(caminho_banco_preferido())
+        if banco.erro_carregamento:
+            print("LOG AVISO: Banco de questões indisponível; a correção usa o gabarito gravado com cada tentativa.")
+        else:
+            gabaritos = gabaritos_do_banco(banco)
+    exportadas, relatorios_gerados, gabaritos_trocados = exportar(obter_armazem(args.tentativas), args.saida, SITUACOES[args.situacao],
+                                                                  max(1, args.lote), args.relatorios, args.processos, gabaritos)
+    caminho_tentativas, caminho_questoes = _caminhos_saida(args.saida)
+    print(f"LOG: {exportadas} tentativas exportadas em '{caminho_tentativas}' e '{caminho_questoes}' ({time.perf_counter() - inicio:.1f} s).")
+    if gabaritos_trocados:
+        print(f"LOG: {gabaritos_trocados} questões corrigidas pelo gabarito atual do banco, diferente do gravado na tentativa.")
+    if args.relatorios:
+        print(f"LOG: {relatorios_gerados} relatórios em PDF gravados em '{args.relatorios}'.")
+
+
+if __name__ == "__main__":
+    main()
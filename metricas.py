@@ -0,0 +1,268 @@
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from caminhos import resolver_caminho
+
+# --- MÉTRICAS DE DESEMPENHO (INSTRUMENTAÇÃO DOS TRECHOS QUENTES) ---
+# Mede o tempo gasto em carregamento do banco, montagem do simulado, desenho das páginas,
+# registro das respostas e correção, e acompanha sessões ativas, tentativas em andamento
+# e o tamanho do session_state. A exportação é escolhida pela variável de ambiente
+# SIMULADO_METRICAS (pode combinar as duas, separadas por vírgula):
+#   "prometheus" -> endpoint HTTP em texto Prometheus (SIMULADO_METRICAS_HOST, padrão 127.0.0.1,
+#                   e porta SIMULADO_METRICAS_PORTA; use 0.0.0.0 para expor fora da máquina)
+#   "arquivo"    -> instantâneos JSON (um por linha) num arquivo local com rotação
+# Sem a variável, as métricas ficam desligadas: `cronometrado` devolve a própria função e
+# `medir` devolve um gerenciador de contexto vazio, sem relógio nem lock.
+
+EXPORTADORES = frozenset(e.strip() for e in os.environ.get("SIMULADO_METRICAS", "").lower().split(",") if e.strip())
+ATIVO = bool(EXPORTADORES)
+
+HOST_PROMETHEUS = os.environ.get("SIMULADO_METRICAS_HOST", "127.0.0.1")
+PORTA_PROMETHEUS = int(os.environ.get("SIMULADO_METRICAS_PORTA", "9464"))
+CAMINHO_ARQUIVO_METRICAS = os.environ.get("SIMULADO_METRICAS_ARQUIVO", "metricas_simulado.jsonl")
+INTERVALO_ARQUIVO_SEGUNDOS = 15
+TAMANHO_MAXIMO_ARQUIVO = 5 * 1024 * 1024
+ARQUIVOS_ROTACIONADOS = 3
+
+# Uma sessão sem nenhuma execução nesse intervalo deixa de contar como ativa. Durante a prova
+# só os fragmentos reexecutam (o script inteiro não roda depois de "Iniciar"); por isso o
+# cronômetro e a página de questões também registram a sessão, e quem está fazendo o
+# simulado nunca expira enquanto a página estiver aberta
+JANELA_SESSAO_ATIVA_SEGUNDOS = 300
+# O tamanho do session_state é recalculado no máximo uma vez por intervalo, por sessão
+INTERVALO_TAMANHO_SESSAO_SEGUNDOS = 10
+
+LIMITES_HISTOGRAMA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_duracoes = {}  # trecho -> [contagens por faixa (+ a de +Inf), soma, quantidade]
+_sessoes = {}  # id da sessão -> [última execução, tentativa em andamento, bytes do session_state, medido em]
+_compartilhados = {}  # id -> weakref dos objetos do processo (ex.: o banco) que as sessões só referenciam
+
+
+def marcar_compartilhado(obj):
+    """Indica que `obj` pertence ao processo: no tamanho de uma sessão conta só a referência."""
+    chave = id(obj)
+    _compartilhados[chave] = weakref.ref(obj, lambda _, chave=chave: _compartilhados.pop(chave, None))
+    return obj
+
+
+def tamanho_aproximado(obj, vistos=None):
+    """Bytes ocupados por um objeto e pelo que ele referencia, sem contar duas vezes.
+
+    O banco compartilhado e suas questões (mapeamentos somente leitura) contam só a
+    referência, pois não pertencem à sessão.
+    """
+    vistos = set() if vistos is None else vistos
+    if id(obj) in vistos:
+        return 0
+    vistos.add(id(obj))
+    tamanho = sys.getsizeof(obj)
+    referencia = _compartilhados.get(id(obj))
+    if referencia is not None and referencia() is obj:
+        return tamanho
+    if isinstance(obj, np.ndarray):
+        return tamanho if obj.base is None else tamanho + obj.nbytes
+    if isinstance(obj, dict):
+        tamanho += sum(tamanho_aproximado(k, vistos) + tamanho_aproximado(v, vistos) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        tamanho += sum(tamanho_aproximado(item, vistos) for item in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        tamanho += tamanho_aproximado(vars(obj), vistos)
+    return tamanho
+
+
+def registrar_duracao(trecho, segundos):
+    with _lock:
+        histograma = _duracoes.get(trecho)
+        if histograma is None:
+            histograma = _duracoes[trecho] = [[0] * (len(LIMITES_HISTOGRAMA) + 1), 0.0, 0]
+        histograma[0][bisect.bisect_left(LIMITES_HISTOGRAMA, segundos)] += 1
+        histograma[1] += segundos
+        histograma[2] += 1
+
+
+class _Medicao:
+    __slots__ = ("trecho", "inicio")
+
+    def __init__(self, trecho):
+        self.trecho = trecho
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registrar_duracao(self.trecho, time.perf_counter() - self.inicio)
+        return False
+
+
+class _MedicaoDesligada:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_MEDICAO_DESLIGADA = _MedicaoDesligada()
+
+
+def medir(trecho):
+    """Gerenciador de contexto que mede a duração de um trecho (`with medir("..."):`)."""
+    return _Medicao(trecho) if ATIVO else _MEDICAO_DESLIGADA
+
+
+def cronometrado(trecho):
+    """Decorador que mede cada chamada da função; com as métricas desligadas não a envolve."""
+    def decorador(funcao):
+        if not ATIVO:
+            return funcao
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                registrar_duracao(trecho, time.perf_counter() - inicio)
+
+        return envolvida
+    return decorador
+
+
+def registrar_sessao(id_sessao, estado_sessao, tentativa_em_andamento):
+    """Marca a sessão como ativa nesta execução e, de tempos em tempos, mede seu session_state."""
+    if not ATIVO or id_sessao is None:
+        return
+    agora = time.time()
+    sessao = _sessoes.get(id_sessao)
+    if sessao is None or agora - sessao[3] >= INTERVALO_TAMANHO_SESSAO_SEGUNDOS:
+        tamanho = tamanho_aproximado({k: estado_sessao[k] for k in list(estado_sessao.keys())})
+        medido_em = agora
+    else:
+        tamanho, medido_em = sessao[2], sessao[3]
+    with _lock:
+        _sessoes[id_sessao] = [agora, bool(tentativa_em_andamento), tamanho, medido_em]
+
+
+def instantaneo():
+    """Estado atual de todas as métricas (descarta sessões inativas)."""
+    agora = time.time()
+    with _lock:
+        for id_sessao in [s for s, dados in _sessoes.items() if agora - dados[0] > JANELA_SESSAO_ATIVA_SEGUNDOS]:
+            del _sessoes[id_sessao]
+        sessoes = list(_sessoes.values())
+        duracoes = {trecho: (list(contagens), soma, quantidade) for trecho, (contagens, soma, quantidade) in _duracoes.items()}
+    tamanhos = [dados[2] for dados in sessoes]
+    return {
+        "momento": agora,
+        "sessoes_ativas": len(sessoes),
+        "tentativas_em_andamento": sum(1 for dados in sessoes if dados[1]),
+        "session_state_bytes_total": sum(tamanhos),
+        "session_state_bytes_max": max(tamanhos, default=0),
+        "duracoes": {
+            trecho: {"quantidade": quantidade, "soma_segundos": soma, "contagens_por_faixa": contagens}
+            for trecho, (contagens, soma, quantidade) in sorted(duracoes.items())
+        },
+    }
+
+
+def texto_prometheus(dados=None):
+    """Métricas no formato de exposição em texto do Prometheus."""
+    dados = instantaneo() if dados is None else dados
+    linhas = []
+    for nome, descricao in (
+        ("sessoes_ativas", "Sessões com alguma execução nos últimos minutos"),
+        ("tentativas_em_andamento", "Sessões com uma prova cronometrada iniciada e não finalizada (sem o modo estudo)"),
+        ("session_state_bytes_total", "Soma do tamanho aproximado do session_state das sessões ativas"),
+        ("session_state_bytes_max", "Maior session_state entre as sessões ativas"),
+    ):
+        linhas += [f"# HELP simulado_{nome} {descricao}", f"# TYPE simulado_{nome} gauge", f"simulado_{nome} {dados[nome]}"]
+
+    linhas += ["# HELP simulado_duracao_segundos Duração dos trechos instrumentados", "# TYPE simulado_duracao_segundos histogram"]
+    for trecho, histograma in dados["duracoes"].items():
+        acumulado = 0
+        for limite, contagem in zip(LIMITES_HISTOGRAMA + ("+Inf",), histograma["contagens_por_faixa"]):
+            acumulado += contagem
+            linhas.append(f'simulado_duracao_segundos_bucket{{trecho="{trecho}",le="{limite}"}} {acumulado}')
+        linhas.append(f'simulado_duracao_segundos_sum{{trecho="{trecho}"}} {histograma["soma_segundos"]}')
+        linhas.append(f'simulado_duracao_segundos_count{{trecho="{trecho}"}} {histograma["quantidade"]}')
+    return "\n".join(linhas) + "\n"
+
+
+class _TratadorPrometheus(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        corpo = texto_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass  # Sem uma linha no console a cada coleta
+
+
+def _rotacionar(caminho):
+    for i in range(ARQUIVOS_ROTACIONADOS - 1, 0, -1):
+        if os.path.exists(f"{caminho}.{i}"):
+            os.replace(f"{caminho}.{i}", f"{caminho}.{i + 1}")
+    os.replace(caminho, f"{caminho}.1")
+
+
+def _gravar_arquivo_periodicamente(caminho):
+    while True:
+        time.sleep(INTERVALO_ARQUIVO_SEGUNDOS)
+        try:
+            if os.path.exists(caminho) and os.path.getsize(caminho) >= TAMANHO_MAXIMO_ARQUIVO:
+                _rotacionar(caminho)
+            with open(caminho, "a", encoding="utf-8") as f:
+                f.write(json.dumps(instantaneo(), ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"LOG ERRO: Não foi possível gravar as métricas em '{caminho}': {e}")
+
+
+_exportacao_iniciada = False
+_exportacao_lock = threading.Lock()
+
+
+def iniciar_exportacao():
+    """Sobe, uma única vez por processo, os exportadores escolhidos em SIMULADO_METRICAS."""
+    global _exportacao_iniciada
+    if not ATIVO or _exportacao_iniciada:
+        return
+    with _exportacao_lock:
+        if _exportacao_iniciada:
+            return
+        _exportacao_iniciada = True
+        if "prometheus" in EXPORTADORES:
+            try:
+                servidor = ThreadingHTTPServer((HOST_PROMETHEUS, PORTA_PROMETHEUS), _TratadorPrometheus)
+            except OSError as e:
+                print(f"LOG ERRO: Não foi possível abrir o endpoint de métricas em {HOST_PROMETHEUS}:{PORTA_PROMETHEUS}: {e}")
+            else:
+                threading.Thread(target=servidor.serve_forever, daemon=True, name="metricas-prometheus").start()
+                print(f"LOG: Métricas Prometheus em http://{HOST_PROMETHEUS}:{PORTA_PROMETHEUS}/metrics")
+        if "arquivo" in EXPORTADORES:
+            caminho = resolver_caminho(CAMINHO_ARQUIVO_METRICAS)
+            threading.Thread(target=_gravar_arquivo_periodicamente, args=(caminho,), daemon=True, name="metricas-arquivo").start()
+            print(f"LOG: Métricas gravadas a cada {INTERVALO_ARQUIVO_SEGUNDOS}s em '{caminho}'.")
+        desconhecidos = EXPORTADORES - {"prometheus", "arquivo"}
+        if desconhecidos:
+            print(f"LOG AVISO: Exportadores de métricas desconhecidos ignorados: {', '.join(sorted(desconhecidos))}.")
+# --- FIM DAS MÉTRICAS DE DESEMPENHO ---
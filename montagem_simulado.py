@@ -0,0 +1,260 @@
+import random
+
+import numpy as np
+
+from banco_questoes import BancoQuestoes
+from edital import QUESTOES_POR_BLOCO, TOTAL_QUESTOES_PROVA, COTAS_DISCIPLINA_POR_BLOCO, PERFIL_DIFICULDADE_POR_BLOCO
+from metricas import cronometrado
+
+# --- MONTAGEM DO SIMULADO (SORTEIO ESTRATIFICADO) ---
+# O sorteio trabalha apenas com os índices pré-computados do banco (por bloco e por
+# bloco/disciplina) e custa O(k) no número de questões sorteadas, não no tamanho do banco.
+# Com a mesma semente e a mesma versão do banco, o simulado gerado é sempre o mesmo.
+# A sessão guarda apenas as posições sorteadas (int32); as questões são lidas do banco.
+# Quando o banco tem grupos de quase duplicatas (duplicatas.py), no máximo uma questão de
+# cada grupo entra no simulado. Quando o banco está calibrado (calibrar_banco.py), cada cota
+# é repartida entre os estratos de dificuldade segundo o perfil do bloco, e as questões ainda
+# não calibradas entram na proporção em que existem na disciplina.
+# As cotas que o banco não cobre são avisadas uma vez por versão do banco, e não a cada
+# sorteio (a reserva monta centenas de simulados seguidos).
+MAX_TENTATIVAS_REJEICAO = 20  # Sorteios rejeitados por vaga antes de filtrar a lista inteira
+
+_versoes_avisadas = set()  # Versões do banco cujas faltas já foram avisadas
+
+
+class _GruposUsados:
+    """Grupos de quase duplicatas já presentes no simulado em montagem."""
+
+    def __init__(self, grupos):
+        self.grupos = grupos
+        self.usados = set()
+
+    def bloqueado(self, i):
+        return self.grupos is not None and int(self.grupos[i]) in self.usados
+
+    def marcar(self, indices):
+        """Registra os grupos de `indices` e devolve só os que não repetem grupo."""
+        if self.grupos is None:
+            return indices
+        aceitos = []
+        for i in indices:
+            grupo = int(self.grupos[i])
+            if grupo < 0:
+                aceitos.append(i)
+            elif grupo not in self.usados:
+                self.usados.add(grupo)
+                aceitos.append(i)
+        return aceitos
+
+
+def _amostra_excluindo(rng, indices, k, excluidos, grupos_usados=None):
+    """Sorteia k índices distintos de `indices` que não estejam em `excluidos` nem em grupo já usado."""
+    if k <= 0:
+        return []
+    k_inicial = k
+    # Rejeição é O(k) enquanto a fração já ocupada do conjunto for pequena
+    if len(indices) >= 2 * (k + len(excluidos)):
+        escolhidos = []
+        vistos = set(excluidos)
+        rejeitados = 0
+        while len(escolhidos) < k and rejeitados < MAX_TENTATIVAS_REJEICAO * k:
+            i = indices[rng.randrange(len(indices))]
+            if i in vistos:
+                rejeitados += 1
+                continue
+            vistos.add(i)
+            if grupos_usados is not None and not grupos_usados.marcar([i]):
+                rejeitados += 1
+                continue
+            escolhidos.append(i)
+        if len(escolhidos) == k:
+            return escolhidos
+        excluidos = vistos
+        k -= len(escolhidos)
+    else:
+        escolhidos = []
+    restantes = [i for i in indices if i not in excluidos and not (grupos_usados is not None and grupos_usados.bloqueado(i))]
+    if grupos_usados is None:
+        return escolhidos + rng.sample(restantes, min(k, len(restantes)))
+    rng.shuffle(restantes)
+    for i in restantes:
+        if len(escolhidos) == k_inicial:
+            break
+        escolhidos.extend(grupos_usados.marcar([i]))
+    return escolhidos
+
+
+def repartir_proporcionalmente(total, pesos):
+    """Divide `total` em partes inteiras proporcionais a `pesos` (método dos maiores restos).
+
+    Cada parte é arredondada para baixo e as que sobram vão para os maiores restos; em caso
+    de empate, para a que vem primeiro em `pesos`.
+    """
+    soma_pesos = sum(pesos)
+    ideais = [total * peso / soma_pesos for peso in pesos]
+    partes = [int(ideal) for ideal in ideais]
+    for j in sorted(range(len(partes)), key=lambda j: ideais[j] - partes[j], reverse=True)[:total - sum(partes)]:
+        partes[j] += 1
+    return partes
+
+
+def _cotas_por_estrato(k, estratos, perfil):
+    """Quantas das k questões vêm de cada estrato (e, na última posição, das não calibradas)."""
+    total = sum(len(e) for e in estratos)
+    if not total:
+        return [0] * len(estratos)
+    nao_calibradas = round(k * len(estratos[-1]) / total)
+    return repartir_proporcionalmente(k - nao_calibradas, perfil) + [nao_calibradas]
+
+
+def _sortear_por_estrato(rng, estratos, indices, k, excluidos, perfil, grupos_usados=None):
+    """Sorteia k índices de `indices` seguindo o perfil; estratos sem questões suficientes são completados com o conjunto todo."""
+    escolhidos = []
+    for indices_estrato, cota in zip(estratos, _cotas_por_estrato(k, estratos, perfil)):
+        escolhidos.extend(_amostra_excluindo(rng, indices_estrato, cota, set(excluidos).union(escolhidos), grupos_usados))
+    escolhidos.extend(_amostra_excluindo(rng, indices, k - len(escolhidos), set(excluidos).union(escolhidos), grupos_usados))
+    return escolhidos
+
+
+def sortear_indices_bloco(banco, bloco_num, num_necessario, rng, grupos_usados=None, perfil=None):
+    """Sorteia as posições (no banco) das questões de um bloco, respeitando as cotas do edital.
+
+    Retorna lista vazia se o banco não tem questões do bloco. Se houver menos questões
+    únicas que o necessário, completa com repetição (o aviso sai em avisar_faltas_do_banco). `grupos_usados` acumula os grupos de
+    quase duplicatas já sorteados (entre blocos do mesmo simulado). `perfil` traz os pesos
+    dos estratos de dificuldade; é ignorado se o banco não tem calibração.
+    """
+    indices_bloco = banco.indices_por_bloco.get(bloco_num, ())
+    if not indices_bloco:
+        return []
+    grupos_usados = grupos_usados if grupos_usados is not None else _GruposUsados(getattr(banco, 'grupos', None))
+    com_grupos = grupos_usados if grupos_usados.grupos is not None else None
+    indices_por_estrato = getattr(banco, 'indices_por_estrato', None) if perfil is not None else None
+
+    selecionados = []
+    for disciplina, cota in COTAS_DISCIPLINA_POR_BLOCO.get(bloco_num, {}).items():
+        indices_disciplina = banco.indices_por_bloco_disciplina.get((bloco_num, disciplina), ())
+        cota = min(cota, num_necessario - len(selecionados))
+        if indices_por_estrato is not None and indices_disciplina:
+            sorteados = _sortear_por_estrato(rng, indices_por_estrato[(bloco_num, disciplina)], indices_disciplina,
+                                             min(cota, len(indices_disciplina)), (), perfil, com_grupos)
+        else:
+            sorteados = grupos_usados.marcar(rng.sample(indices_disciplina, min(cota, len(indices_disciplina))))
+            if len(sorteados) < min(cota, len(indices_disciplina)):
+                # Quase duplicatas descartadas: repõe com outras questões da disciplina
+                sorteados.extend(_amostra_excluindo(rng, indices_disciplina, cota - len(sorteados), set(sorteados), grupos_usados))
+        selecionados.extend(sorteados)
+
+    # Completa as vagas não cobertas pelas cotas com qualquer questão do bloco
+    if indices_por_estrato is not None:
+        selecionados.extend(_sortear_por_estrato(rng, indices_por_estrato[(bloco_num, None)], indices_bloco,
+                                                 num_necessario - len(selecionados), selecionados, perfil, com_grupos))
+    else:
+        selecionados.extend(_amostra_excluindo(rng, indices_bloco, num_necessario - len(selecionados), set(selecionados), com_grupos))
+
+    if len(selecionados) < num_necessario:
+        selecionados.extend(rng.choices(indices_bloco, k=num_necessario - len(selecionados)))
+
+    rng.shuffle(selecionados)
+    return selecionados
+
+
+def sortear_indices_simulado(banco, semente=None, perfil_dificuldade=None):
+    """Posições sorteadas no banco para cada bloco (lista vazia para bloco sem questões).
+
+    `perfil_dificuldade` (bloco -> pesos dos estratos) substitui o PERFIL_DIFICULDADE_POR_BLOCO
+    do edital.py; um bloco sem perfil é sorteado sem olhar a dificuldade.
+    """
+    rng = random.Random(semente)
+    grupos_usados = _GruposUsados(getattr(banco, 'grupos', None))
+    perfis = PERFIL_DIFICULDADE_POR_BLOCO if perfil_dificuldade is None else perfil_dificuldade
+    return {bloco_num: sortear_indices_bloco(banco, bloco_num, num_necessario, rng, grupos_usados, perfis.get(bloco_num))
+            for bloco_num, num_necessario in QUESTOES_POR_BLOCO.items()}
+
+
+def selecionar_questoes_simulado(banco, semente=None):
+    """Seleciona aleatoriamente o número correto de questões para cada bloco."""
+    if not len(banco):
+        return [{"id": f"ERRO_Q_{i}", "bloco": (i % 3) + 1, "disciplina": "Erro Carregamento", "enunciado": "Nenhuma questão pôde ser carregada. Verifique o arquivo JSON e o console.", "gabarito": "C"} for i in range(TOTAL_QUESTOES_PROVA)]
+
+    rng = random.Random(semente)
+    questoes_selecionadas_final = []
+
+    for bloco_num, indices in sortear_indices_simulado(banco, semente).items():
+        num_necessario = QUESTOES_POR_BLOCO[bloco_num]
+        if indices:
+            selecao_para_este_bloco = [banco[i] for i in indices]
+        else: # Fallback se não há NENHUMA questão para o bloco no JSON
+            print(f"LOG ERRO: Nenhuma questão disponível no JSON para o Bloco {bloco_num}. Usando placeholders.")
+            selecao_para_este_bloco = [{"id": f"PLACEHOLDER_B{bloco_num}_{i}", "bloco": bloco_num, "disciplina": "Placeholder", "enunciado": f"Questão placeholder de emergência Bloco {bloco_num} - {i+1}", "gabarito": rng.choice(["C", "E"])} for i in range(num_necessario)]
+
+        questoes_selecionadas_final.extend(selecao_para_este_bloco)
+
+    # Verificação final do total (embora a lógica acima deva garantir)
+    if len(questoes_selecionadas_final) != TOTAL_QUESTOES_PROVA:
+        print(f"LOG ERRO: Seleção final resultou em {len(questoes_selecionadas_final)} questões, esperado {TOTAL_QUESTOES_PROVA}. Preenchendo com placeholders.")
+        # Preenche se faltar (situação de erro extremo)
+        while len(questoes_selecionadas_final) < TOTAL_QUESTOES_PROVA:
+            bloco_fallback = (len(questoes_selecionadas_final) % 3) + 1
+            questoes_selecionadas_final.append({"id": f"TOTAL_FILL_PAD_{len(questoes_selecionadas_final)}", "bloco": bloco_fallback, "disciplina": "Placeholder Preenchimento", "enunciado": "Questão de preenchimento para totalizar.", "gabarito": "C"})
+
+    return questoes_selecionadas_final
+
+
+@cronometrado("montar_simulado")
+def montar_simulado(banco, semente=None, perfil_dificuldade=None):
+    """Monta o simulado como (banco, posições int32 das questões nesse banco).
+
+    Normalmente o banco é o próprio banco compartilhado. Se faltar algum bloco, as questões
+    (com os placeholders) formam um banco só deste simulado.
+    """
+    return _montar_simulado(banco, semente, perfil_dificuldade)
+
+
+@cronometrado("montar_simulado_reserva")
+def montar_simulado_reserva(banco, semente=None, perfil_dificuldade=None):
+    """Como montar_simulado, para a reserva em segundo plano (reserva_simulados.py).
+
+    Fica numa medição separada: "montar_simulado" continua sendo só a espera de um candidato.
+    """
+    return _montar_simulado(banco, semente, perfil_dificuldade)
+
+
+def avisar_faltas_do_banco(banco):
+    """Avisa no log, uma vez por versão do banco, as cotas e os blocos que ele não consegue cobrir."""
+    if banco.versao in _versoes_avisadas:
+        return
+    _versoes_avisadas.add(banco.versao)
+    for bloco_num, num_necessario in QUESTOES_POR_BLOCO.items():
+        indices_bloco = banco.indices_por_bloco.get(bloco_num, ())
+        if not indices_bloco:
+            continue  # Bloco sem questões: o simulado usa placeholders (LOG ERRO na seleção)
+        vagas = num_necessario
+        for disciplina, cota in COTAS_DISCIPLINA_POR_BLOCO.get(bloco_num, {}).items():
+            disponiveis = len(banco.indices_por_bloco_disciplina.get((bloco_num, disciplina), ()))
+            cota = min(cota, vagas)
+            if disponiveis < cota:
+                print(f"LOG AVISO: Bloco {bloco_num} tem {disponiveis} questões de '{disciplina}', cota de {cota}. Vagas restantes serão completadas com outras disciplinas do bloco.")
+            vagas -= min(cota, disponiveis)
+        if len(indices_bloco) < num_necessario:
+            print(f"LOG AVISO: Bloco {bloco_num} tem {len(indices_bloco)} questões únicas, {num_necessario} são necessárias. Haverá repetição para este bloco.")
+
+
+def _montar_simulado(banco, semente, perfil_dificuldade):
+    if len(banco):
+        avisar_faltas_do_banco(banco)
+    indices_por_bloco = sortear_indices_simulado(banco, semente, perfil_dificuldade) if len(banco) else {}
+    indices = [i for bloco_num in QUESTOES_POR_BLOCO for i in indices_por_bloco.get(bloco_num, ())]
+    if len(indices) == TOTAL_QUESTOES_PROVA:
+        return banco, np.array(indices, dtype=np.int32)
+    questoes = selecionar_questoes_simulado(banco, semente=semente)
+    return BancoQuestoes(questoes, versao=None), np.arange(len(questoes), dtype=np.int32)
+
+
+def simulado_valido(banco_simulado, indices):
+    """Confere um simulado montado: total de questões e, por bloco, o número exigido pelo edital."""
+    if len(indices) != TOTAL_QUESTOES_PROVA:
+        return False
+    contagem = np.bincount(banco_simulado.blocos[indices], minlength=max(QUESTOES_POR_BLOCO) + 1)
+    return all(contagem[bloco_num] == n for bloco_num, n in QUESTOES_POR_BLOCO.items())
+# --- FIM DA MONTAGEM DO SIMULADO ---
@@ -0,0 +1,233 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from caminhos import resolver_caminho
+from metricas import cronometrado
+
+# --- ARMAZENAMENTO DURÁVEL DAS TENTATIVAS (SQLITE EM MODO WAL) ---
+# Cada tentativa recebe um código (token) que permite retomá-la depois de uma queda de
+# conexão ou reinício do servidor. As respostas são gravadas em lote: cada envio de
+# formulário (mudança de página ou finalização) vira uma única transação. `criado_em` é o
+# início da prova: o prazo de uma tentativa retomada é contado a partir dele, no relógio.
+
+# Pode ser trocado pela variável de ambiente SIMULADO_TENTATIVAS_DB (ex.: em benchmarks)
+CAMINHO_PADRAO_TENTATIVAS = os.environ.get("SIMULADO_TENTATIVAS_DB", "tentativas_simulado.sqlite3")
+
+SITUACAO_EM_ANDAMENTO = "em_andamento"
+SITUACAO_FINALIZADO = "finalizado"
+SITUACAO_ABANDONADO = "abandonado"
+
+TOKENS_POR_CONSULTA = 500  # Tokens por "IN (...)" nas leituras em lote (abaixo do limite de parâmetros do SQLite)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tentativas (
+    token TEXT PRIMARY KEY,
+    semente INTEGER,
+    versao_banco TEXT,
+    situacao TEXT NOT NULL,
+    pagina_atual INTEGER NOT NULL DEFAULT 0,
+    segundos_utilizados REAL NOT NULL DEFAULT 0,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tentativa_questoes (
+    token TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    questao_json TEXT NOT NULL,
+    PRIMARY KEY (token, posicao)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS respostas (
+    token TEXT NOT NULL,
+    questao_id TEXT NOT NULL,
+    resposta TEXT,
+    PRIMARY KEY (token, questao_id)
+) WITHOUT ROWID;
+"""
+
+
+class ArmazemTentativas:
+    """Acesso ao banco SQLite de tentativas por uma única conexão do processo, protegida por um lock.
+
+    O Streamlit roda cada execução (e cada execução de fragmento) numa thread nova; uma
+    conexão por thread abriria uma conexão a cada gravação. Cada operação é curta (uma
+    transação), então as sessões só esperam umas pelas outras por alguns milissegundos.
+    Leituras em fluxo, que mantêm um cursor aberto entre um item e outro, usam uma conexão
+    própria, fechada ao final.
+    """
+
+    def __init__(self, caminho_arquivo=CAMINHO_PADRAO_TENTATIVAS):
+        self.caminho = resolver_caminho(caminho_arquivo)
+        self._lock = threading.Lock()
+        self._conexao = self._abrir_conexao()
+        with self._lock, self._conexao as conexao:
+            conexao.executescript(_ESQUEMA)
+
+    def _abrir_conexao(self):
+        conexao = sqlite3.connect(self.caminho, timeout=10, check_same_thread=False)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        return conexao
+
+    def criar_tentativa(self, questoes_simulado, semente=None, versao_banco=None, inicio=None):
+        """Registra uma nova tentativa com seu conjunto de questões e devolve o token (ou None).
+
+        `inicio` (epoch) é o instante em que a prova começou; por padrão, agora.
+        """
+        token = secrets.token_urlsafe(9)
+        agora = time.time() if inicio is None else inicio
+        try:
+            with self._lock, self._conexao as conexao:
+                conexao.execute(
+                    "INSERT INTO tentativas (token, semente, versao_banco, situacao, criado_em, atualizado_em) VALUES (?, ?, ?, ?, ?, ?)",
+                    (token, semente, versao_banco, SITUACAO_EM_ANDAMENTO, agora, agora),
+                )
+                conexao.executemany(
+                    "INSERT INTO tentativa_questoes (token, posicao, questao_json) VALUES (?, ?, ?)",
+                    ((token, posicao, json.dumps(dict(q), ensure_ascii=False)) for posicao, q in enumerate(questoes_simulado)),
+                )
+        except sqlite3.Error as e:
+            print(f"LOG ERRO: Não foi possível registrar a tentativa no banco '{self.caminho}': {e}")
+            return None
+        return token
+
+    @cronometrado("salvar_progresso")
+    def salvar_progresso(self, token, respostas_alteradas, pagina_atual, segundos_utilizados, situacao=None):
+        """Grava, numa única transação, as respostas alteradas e o estado da tentativa."""
+        if token is None:
+            return False
+        try:
+            with self._lock, self._conexao as conexao:
+                if respostas_alteradas:
+                    conexao.executemany(
+                        "INSERT INTO respostas (token, questao_id, resposta) VALUES (?, ?, ?) "
+                        "ON CONFLICT (token, questao_id) DO UPDATE SET resposta = excluded.resposta",
+                        ((token, q_id, resposta) for q_id, resposta in respostas_alteradas.items()),
+                    )
+                conexao.execute(
+                    "UPDATE tentativas SET pagina_atual = ?, segundos_utilizados = ?, situacao = COALESCE(?, situacao), atualizado_em = ? WHERE token = ?",
+                    (pagina_atual, segundos_utilizados, situacao, time.time(), token),
+                )
+        except sqlite3.Error as e:
+            print(f"LOG ERRO: Não foi possível salvar o progresso da tentativa {token}: {e}")
+            return False
+        return True
+
+    def carregar_tentativa(self, token):
+        """Lê apenas as linhas da tentativa `token`; devolve None se ela não existir."""
+        try:
+            with self._lock:
+                conexao = self._conexao
+                linha = conexao.execute(
+                    "SELECT semente, versao_banco, situacao, pagina_atual, segundos_utilizados, criado_em FROM tentativas WHERE token = ?",
+                    (token,),
+                ).fetchone()
+                if linha is None:
+                    return None
+                questoes = [q_json for (q_json,) in conexao.execute(
+                    "SELECT questao_json FROM tentativa_questoes WHERE token = ? ORDER BY posicao", (token,)
+                )]
+                respostas = dict(conexao.execute("SELECT questao_id, resposta FROM respostas WHERE token = ?", (token,)))
+        except sqlite3.Error as e:
+            print(f"LOG ERRO: Não foi possível carregar a tentativa {token}: {e}")
+            return None
+
+        return _montar_tentativa(token, *linha, questoes=[json.loads(q_json) for q_json in questoes], respostas=respostas)
+
+    def tentativas_em_lotes(self, situacao=SITUACAO_FINALIZADO, tamanho_lote=500):
+        """Gera listas de até `tamanho_lote` tentativas (no formato de carregar_tentativa), em ordem de token.
+
+        `situacao=None` inclui todas. Cada lote custa uma consulta às tentativas (a partir do
+        último token lido) e, para questões e respostas, buscas pela chave primária só dos
+        tokens do lote; só o lote atual fica em memória, qualquer que seja o tamanho das tabelas.
+        """
+        ultimo_token = ""
+        while True:
+            try:
+                with self._lock:
+                    conexao = self._conexao
+                    linhas = conexao.execute(
+                        "SELECT token, semente, versao_banco, situacao, pagina_atual, segundos_utilizados, criado_em FROM tentativas "
+                        "WHERE token > ? AND (? IS NULL OR situacao = ?) ORDER BY token LIMIT ?",
+                        (ultimo_token, situacao, situacao, tamanho_lote),
+                    ).fetchall()
+                    if not linhas:
+                        return
+                    tokens = [linha[0] for linha in linhas]
+                    questoes = {}
+                    respostas = {}
+                    for inicio in range(0, len(tokens), TOKENS_POR_CONSULTA):
+                        parte = tokens[inicio:inicio + TOKENS_POR_CONSULTA]
+                        marcadores = ", ".join("?" * len(parte))
+                        for token, q_json in conexao.execute(
+                            f"SELECT token, questao_json FROM tentativa_questoes WHERE token IN ({marcadores}) ORDER BY token, posicao", parte
+                        ):
+                            questoes.setdefault(token, []).append(json.loads(q_json))
+                        for token, q_id, resposta in conexao.execute(
+                            f"SELECT token, questao_id, resposta FROM respostas WHERE token IN ({marcadores})", parte
+                        ):
+                            respostas.setdefault(token, {})[q_id] = resposta
+            except sqlite3.Error as e:
+                print(f"LOG ERRO: Não foi possível ler as tentativas de '{self.caminho}': {e}")
+                return
+            yield [_montar_tentativa(token, *dados, questoes=questoes.get(token, []), respostas=respostas.get(token, {}))
+                   for token, *dados in linhas]
+            ultimo_token = linhas[-1][0]
+
+    def respostas_registradas(self, situacao=SITUACAO_FINALIZADO):
+        """Gera (token, id da questão, gabarito, resposta) de cada questão respondida nas tentativas com essa situação.
+
+        As linhas são lidas em fluxo, na ordem dos tokens, por uma conexão só desta leitura;
+        questões em branco não aparecem.
+        """
+        conexao = None
+        try:
+            conexao = self._abrir_conexao()
+            cursor = conexao.execute(
+                "SELECT t.token, json_extract(q.questao_json, '$.id'), json_extract(q.questao_json, '$.gabarito'), r.resposta "
+                "FROM tentativas t "
+                "JOIN tentativa_questoes q ON q.token = t.token "
+                "JOIN respostas r ON r.token = q.token AND r.questao_id = json_extract(q.questao_json, '$.id') "
+                "WHERE t.situacao = ? AND r.resposta IS NOT NULL ORDER BY t.token",
+                (situacao,),
+            )
+            yield from cursor
+        except sqlite3.Error as e:
+            print(f"LOG ERRO: Não foi possível ler as respostas gravadas em '{self.caminho}': {e}")
+        finally:
+            if conexao is not None:
+                conexao.close()
+
+
+def _montar_tentativa(token, semente, versao_banco, situacao, pagina_atual, segundos_utilizados, criado_em=None, questoes=(), respostas=None):
+    return {
+        "token": token,
+        "semente": semente,
+        "versao_banco": versao_banco,
+        "situacao": situacao,
+        "pagina_atual": pagina_atual,
+        "segundos_utilizados": segundos_utilizados,
+        "criado_em": criado_em,
+        "questoes": questoes,
+        "respostas": {**{q.get('id'): None for q in questoes}, **(respostas or {})},
+    }
+
+
+_armazens = {}
+_armazens_lock = threading.Lock()
+
+
+def obter_armazem(caminho_arquivo=CAMINHO_PADRAO_TENTATIVAS):
+    """Devolve o armazém (único no processo) associado ao arquivo SQLite."""
+    caminho = resolver_caminho(caminho_arquivo)
+    armazem = _armazens.get(caminho)
+    if armazem is None:
+        with _armazens_lock:
+            armazem = _armazens.get(caminho)
+            if armazem is None:
+                armazem = _armazens[caminho] = ArmazemTentativas(caminho)
+    return armazem
+# --- FIM DO ARMAZENAMENTO DURÁVEL DAS TENTATIVAS ---
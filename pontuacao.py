@@ -0,0 +1,173 @@
+import numpy as np
+
+from edital import (
+    MIN_PONTOS_BLOCO_1, MIN_PONTOS_BLOCO_2, MIN_PONTOS_BLOCO_3, MIN_PONTOS_TOTAL
+)
+from metricas import cronometrado
+
+# --- PONTUAÇÃO EM LOTE (CEBRASPE) ---
+# Folhas de resposta e gabaritos são codificados como vetores int8:
+#   0 = Branco, 1 = Certo (C), 2 = Errado (E)
+# e os blocos como int8 (1, 2, 3; 0 = posição vazia/ignorada). Assim, milhares de
+# tentativas são corrigidas de uma vez, por exemplo após a correção de um gabarito.
+# Uma tentativa em andamento guarda só as posições das questões no banco (int32) e as
+# respostas já codificadas (um byte por questão); gabarito e blocos vêm do banco.
+
+CODIGO_BRANCO = 0
+CODIGO_CERTO = 1
+CODIGO_ERRADO = 2
+
+# Situação de cada questão depois da correção
+SITUACAO_BRANCA = 0
+SITUACAO_CERTA = 1
+SITUACAO_ERRADA = 2
+
+BLOCOS = (1, 2, 3)
+MIN_PONTOS_POR_BLOCO = np.array([MIN_PONTOS_BLOCO_1, MIN_PONTOS_BLOCO_2, MIN_PONTOS_BLOCO_3])
+
+# Respostas da interface ("Certo"/"Errado") e letras do gabarito ("C"/"E") no mesmo código
+_CODIGOS = {"Certo": CODIGO_CERTO, "C": CODIGO_CERTO, "Errado": CODIGO_ERRADO, "E": CODIGO_ERRADO}
+# Resposta exibida/gravada para cada código (None = Branco)
+RESPOSTAS_POR_CODIGO = (None, "Certo", "Errado")
+_NOMES_BLOCO = {1: "Bloco I", 2: "Bloco II", 3: "Bloco III"}
+
+
+def codificar(valor):
+    """Código numérico de uma resposta ou gabarito; qualquer outro valor conta como Branco."""
+    return _CODIGOS.get(valor, CODIGO_BRANCO)
+
+
+def codificar_respostas(respostas, questoes):
+    """Vetor int8 com as respostas de uma tentativa, na ordem das questões do simulado."""
+    return np.fromiter((codificar(respostas.get(q.get('id'))) for q in questoes), dtype=np.int8, count=len(questoes))
+
+
+def codificar_questoes(questoes):
+    """Vetores int8 (gabarito, blocos) das questões de um simulado."""
+    gabarito = np.fromiter((codificar(q.get('gabarito')) for q in questoes), dtype=np.int8, count=len(questoes))
+    blocos = np.fromiter((q.get('bloco') if q.get('bloco') in BLOCOS else 0 for q in questoes), dtype=np.int8, count=len(questoes))
+    return gabarito, blocos
+
+
+@cronometrado("pontuar")
+def pontuar_lote(respostas, gabarito, blocos):
+    """Corrige várias tentativas de uma vez.
+
+    `respostas` tem forma (tentativas, questões); `gabarito` e `blocos` podem ter a mesma
+    forma (cada tentativa com seu conjunto de questões) ou forma (questões,), quando todas
+    as tentativas responderam à mesma prova. Retorna um dicionário de arrays NumPy: as
+    contagens e os pontos têm forma (tentativas, 3), um por bloco.
+    """
+    respostas = np.atleast_2d(np.asarray(respostas, dtype=np.int8))
+    gabarito = np.asarray(gabarito, dtype=np.int8)
+    blocos = np.asarray(blocos, dtype=np.int8)
+
+    respondidas = respostas != CODIGO_BRANCO
+    acertos = respondidas & (respostas == gabarito)
+    erros = respondidas & ~acertos
+    brancas = ~respondidas
+
+    corretas = np.empty((respostas.shape[0], len(BLOCOS)), dtype=np.int32)
+    erradas = np.empty_like(corretas)
+    em_branco = np.empty_like(corretas)
+    for j, bloco in enumerate(BLOCOS):
+        no_bloco = blocos == bloco
+        corretas[:, j] = (acertos & no_bloco).sum(axis=1)
+        erradas[:, j] = (erros & no_bloco).sum(axis=1)
+        em_branco[:, j] = (brancas & no_bloco).sum(axis=1)
+
+    # Pontuação Cebraspe: +1 para certa, -1 para errada, 0 para branca [cite: 433, 434, 435]
+    pontos = (corretas - erradas).astype(np.float64)
+    total_pontos, aprovado_no_bloco, aprovado_na_pontuacao_total, aprovado = aplicar_criterios(pontos)
+    return {
+        "corretas": corretas,
+        "erradas": erradas,
+        "brancas": em_branco,
+        "pontos": pontos,
+        "total_pontos": total_pontos,
+        "aprovado_no_bloco": aprovado_no_bloco,
+        "aprovado_na_pontuacao_total": aprovado_na_pontuacao_total,
+        "aprovado": aprovado,
+    }
+
+
+def aplicar_criterios(pontos):
+    """Critérios do edital sobre pontos por bloco (forma (..., 3)).
+
+    Devolve (total_pontos, aprovado_no_bloco, aprovado_na_pontuacao_total, aprovado).
+    """
+    total_pontos = pontos.sum(axis=-1)
+    # Critérios de aprovação (nota DEVE SER >= ao mínimo)
+    aprovado_no_bloco = pontos >= MIN_PONTOS_POR_BLOCO
+    aprovado_na_pontuacao_total = total_pontos >= MIN_PONTOS_TOTAL
+    return total_pontos, aprovado_no_bloco, aprovado_na_pontuacao_total, aprovado_no_bloco.all(axis=-1) & aprovado_na_pontuacao_total
+
+
+def situacao_das_questoes(respostas, gabarito):
+    """Situação (branca/certa/errada) de cada questão, com a mesma forma de `respostas`."""
+    respostas = np.asarray(respostas, dtype=np.int8)
+    situacao = np.where(respostas == gabarito, SITUACAO_CERTA, SITUACAO_ERRADA).astype(np.int8)
+    situacao[respostas == CODIGO_BRANCO] = SITUACAO_BRANCA
+    return situacao
+
+
+def pontuar_tentativas(tentativas):
+    """Codifica e corrige uma sequência de pares (respostas, questoes_simulado).
+
+    Tentativas com números diferentes de questões são completadas com posições de bloco 0,
+    que não contam em nenhum bloco. Além do resultado de pontuar_lote, devolve as matrizes
+    codificadas em "respostas", "gabarito" e "blocos" (linha i = tentativa i, com o
+    preenchimento), para quem precisa delas não codificar as tentativas de novo.
+    """
+    tentativas = list(tentativas)
+    tamanho = max((len(questoes) for _, questoes in tentativas), default=0)
+    respostas_lote = np.zeros((len(tentativas), tamanho), dtype=np.int8)
+    gabarito_lote = np.zeros_like(respostas_lote)
+    blocos_lote = np.zeros_like(respostas_lote)
+    for i, (respostas, questoes) in enumerate(tentativas):
+        n = len(questoes)
+        respostas_lote[i, :n] = codificar_respostas(respostas, questoes)
+        gabarito_lote[i, :n], blocos_lote[i, :n] = codificar_questoes(questoes)
+    lote = pontuar_lote(respostas_lote, gabarito_lote, blocos_lote)
+    lote.update(respostas=respostas_lote, gabarito=gabarito_lote, blocos=blocos_lote)
+    return lote
+
+
+def resultado_da_tentativa(lote, i):
+    """Monta, para a tentativa `i` de um lote, o dicionário de resultado usado pela interface."""
+    resultado = {}
+    motivos_reprovacao = []
+    for j, bloco in enumerate(BLOCOS):
+        pontos_bloco = float(lote["pontos"][i, j])
+        aprovado_bloco = bool(lote["aprovado_no_bloco"][i, j])
+        resultado[f"B{bloco}"] = {
+            "pontos": pontos_bloco,
+            "corretas": int(lote["corretas"][i, j]),
+            "erradas": int(lote["erradas"][i, j]),
+            "brancas": int(lote["brancas"][i, j]),
+            "aprovado_no_bloco": aprovado_bloco,
+        }
+        if not aprovado_bloco:
+            motivos_reprovacao.append(f"{_NOMES_BLOCO[bloco]}: {pontos_bloco:.2f} (Mínimo necessário: {MIN_PONTOS_POR_BLOCO[j]:.2f})")
+
+    pontos_total = float(lote["total_pontos"][i])
+    aprovado_total_pontos = bool(lote["aprovado_na_pontuacao_total"][i])
+    if not aprovado_total_pontos: # Checa a pontuação total separadamente
+        motivos_reprovacao.append(f"Pontuação Total: {pontos_total:.2f} (Mínimo necessário: {MIN_PONTOS_TOTAL:.2f})")
+
+    resultado["total_pontos"] = pontos_total
+    resultado["aprovado_na_pontuacao_total"] = aprovado_total_pontos # Se passou no critério da nota total
+    resultado["status_geral"] = "APROVADO(A) ✅" if lote["aprovado"][i] else "REPROVADO(A) ❌" # Se passou em TODOS os critérios
+    resultado["motivos_reprovacao"] = motivos_reprovacao
+    return resultado
+
+
+def calcular_pontuacao(respostas, indices, banco):
+    """Calcula a pontuação baseada nas respostas (códigos int8) e nos critérios do edital.
+
+    `indices` são as posições das questões do simulado em `banco`, de onde vêm o gabarito
+    e os blocos já codificados.
+    """
+    lote = pontuar_lote(respostas, banco.gabaritos[indices], banco.blocos[indices])
+    return resultado_da_tentativa(lote, 0)
+# --- FIM DA PONTUAÇÃO EM LOTE ---
@@ -0,0 +1,126 @@
+import time
+import zlib
+
+from pontuacao import BLOCOS, RESPOSTAS_POR_CODIGO, SITUACAO_BRANCA, SITUACAO_CERTA, SITUACAO_ERRADA
+
+# --- RELATÓRIO EM PDF DE UMA TENTATIVA (GABARITO COMENTADO) ---
+# PDF só de texto, escrito diretamente (sem biblioteca externa): fontes padrão Helvetica
+# com codificação WinAnsi (cobre os acentos do português), linhas quebradas por largura
+# estimada e conteúdo de cada página comprimido com zlib.
+
+LARGURA_PAGINA, ALTURA_PAGINA = 595, 842  # A4, em pontos
+MARGEM = 50
+LARGURA_MEDIA_CARACTERE = 0.52  # Em frações do tamanho da fonte (Helvetica, texto corrido)
+
+_CORES_SITUACAO = {SITUACAO_BRANCA: (0.45, 0.45, 0.45), SITUACAO_CERTA: (0.0, 0.5, 0.0), SITUACAO_ERRADA: (0.75, 0.0, 0.0)}
+_NOMES_SITUACAO = {SITUACAO_BRANCA: "em branco", SITUACAO_CERTA: "certa", SITUACAO_ERRADA: "errada"}
+
+
+def _escapar(texto):
+    dados = texto.encode('cp1252', 'ignore')
+    return dados.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _quebrar_linhas(texto, largura):
+    """Quebra gulosa por palavras (bem mais barata que textwrap nos milhares de parágrafos de um lote)."""
+    linhas = []
+    atual = ""
+    for palavra in texto.split():
+        if atual and len(atual) + 1 + len(palavra) > largura:
+            linhas.append(atual)
+            atual = palavra
+        else:
+            atual = f"{atual} {palavra}" if atual else palavra
+    linhas.append(atual)
+    return linhas
+
+
+class DocumentoPdf:
+    """Texto corrido em páginas A4; `salvar` grava o arquivo PDF completo."""
+
+    def __init__(self):
+        self._paginas = []
+        self._atual = None
+        self._y = 0
+
+    def _nova_pagina(self):
+        self._atual = []
+        self._paginas.append(self._atual)
+        self._y = ALTURA_PAGINA - MARGEM
+
+    def texto(self, conteudo, tamanho=10, negrito=False, cor=(0, 0, 0)):
+        """Acrescenta um parágrafo, quebrado na largura útil da página."""
+        largura = max(20, int((LARGURA_PAGINA - 2 * MARGEM) / (tamanho * LARGURA_MEDIA_CARACTERE)))
+        for linha in _quebrar_linhas(str(conteudo), largura):
+            if self._atual is None or self._y - tamanho < MARGEM:
+                self._nova_pagina()
+            self._y -= tamanho * 1.3
+            self._atual.append(b"%.3f %.3f %.3f rg BT /%s %d Tf %d %.1f Td (%s) Tj ET" % (
+                *cor, b"F2" if negrito else b"F1", tamanho, MARGEM, self._y, _escapar(linha)))
+
+    def espaco(self, pontos=8):
+        self._y -= pontos
+
+    def salvar(self, caminho):
+        if not self._paginas:
+            self._nova_pagina()
+        num_paginas = len(self._paginas)
+        # Objetos: 1 catálogo, 2 árvore de páginas, 3 e 4 fontes, depois (página, conteúdo) de cada página
+        objetos = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % (5 + 2 * i) for i in range(num_paginas)), num_paginas),
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        ]
+        for i, linhas in enumerate(self._paginas):
+            conteudo = zlib.compress(b"\n".join(linhas))
+            objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                           % (LARGURA_PAGINA, ALTURA_PAGINA, 6 + 2 * i))
+            objetos.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(conteudo), conteudo))
+
+        with open(caminho, 'wb') as f:
+            f.write(b"%PDF-1.4\n")
+            posicoes = []
+            for numero, objeto in enumerate(objetos, start=1):
+                posicoes.append(f.tell())
+                f.write(b"%d 0 obj\n%s\nendobj\n" % (numero, objeto))
+            inicio_xref = f.tell()
+            f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+            f.write(b"".join(b"%010d 00000 n \n" % p for p in posicoes))
+            f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref))
+
+
+def gerar_relatorio_tentativa(tentativa, resultado, respostas, situacoes, caminho):
+    """Grava o PDF com o resultado e o gabarito comentado de uma tentativa.
+
+    `tentativa` segue o formato de ArmazemTentativas.carregar_tentativa; `resultado` vem de
+    pontuacao.resultado_da_tentativa; `respostas` e `situacoes` são os códigos por questão.
+    """
+    documento = DocumentoPdf()
+    documento.texto("Simulado Agente PF - Relatório da tentativa", tamanho=16, negrito=True)
+    criado_em = tentativa.get("criado_em")
+    documento.texto(f"Código: {tentativa['token']} | Semente: {tentativa.get('semente')} | "
+                    f"Iniciada em: {time.strftime('%d/%m/%Y %H:%M', time.localtime(criado_em)) if criado_em else 'N/A'} | "
+                    f"Tempo utilizado: {int(tentativa.get('segundos_utilizados') or 0) // 60} min", tamanho=9)
+    documento.espaco(12)
+
+    documento.texto(f"Resultado: {resultado['status_geral']}", tamanho=13, negrito=True)
+    documento.texto(f"Pontuação total: {resultado['total_pontos']:.2f}")
+    for bloco in BLOCOS:
+        dados = resultado[f"B{bloco}"]
+        documento.texto(f"Bloco {bloco}: {dados['pontos']:.2f} pontos ({dados['corretas']} certas, {dados['erradas']} erradas, "
+                        f"{dados['brancas']} em branco){'' if dados['aprovado_no_bloco'] else ' - abaixo do mínimo'}")
+    for motivo in resultado["motivos_reprovacao"]:
+        documento.texto(f"Reprovação - {motivo}", cor=_CORES_SITUACAO[SITUACAO_ERRADA])
+    documento.espaco(12)
+
+    documento.texto("Gabarito comentado", tamanho=13, negrito=True)
+    for posicao, (questao, codigo, situacao) in enumerate(zip(tentativa["questoes"], respostas, situacoes), start=1):
+        documento.espaco(6)
+        documento.texto(f"Questão {posicao} (Bloco {questao.get('bloco', 'N/A')} - {questao.get('disciplina', 'N/A')} - ID: {questao.get('id')})", negrito=True)
+        documento.texto(questao.get('enunciado', 'Enunciado não disponível.'), tamanho=9)
+        resposta = RESPOSTAS_POR_CODIGO[codigo] or "Branco"
+        documento.texto(f"Gabarito oficial: {questao.get('gabarito', 'N/A')} | Resposta: {resposta} ({_NOMES_SITUACAO[int(situacao)]})",
+                        tamanho=9, negrito=True, cor=_CORES_SITUACAO[int(situacao)])
+    documento.salvar(caminho)
+# --- FIM DO RELATÓRIO EM PDF ---
@@ -0,0 +1,87 @@
+import os
+import random
+import threading
+from collections import deque
+
+from montagem_simulado import montar_simulado_reserva, simulado_valido
+
+# --- RESERVA DE SIMULADOS PRONTOS (UMA POR PROCESSO) ---
+# Uma thread em segundo plano mantém simulados já sorteados e conferidos para a versão
+# atual do banco, até CAPACIDADE_RESERVA; cada simulado retirado é reposto. Iniciar um
+# simulado vira um popleft() na fila, sem sorteio dentro do rerun, mesmo quando muitos
+# candidatos começam ao mesmo tempo. Quando o banco é recarregado, a reserva da versão
+# anterior é descartada e outra começa a ser montada. Cada simulado guarda sua semente,
+# que continua refazendo a mesma prova.
+
+# Pode ser trocado pela variável de ambiente SIMULADO_RESERVA (0 desativa a reserva)
+CAPACIDADE_RESERVA = int(os.environ.get("SIMULADO_RESERVA", "200"))
+
+
+class ReservaSimulados:
+    """Fila limitada de simulados (semente, banco, posições) prontos para um banco."""
+
+    def __init__(self, banco, capacidade=CAPACIDADE_RESERVA):
+        self.banco = banco
+        self.capacidade = capacidade
+        self._prontos = deque()
+        self._condicao = threading.Condition()
+        self._encerrada = False
+        self._sorteio_sementes = random.SystemRandom()
+        if capacidade > 0 and len(banco) and not banco.erro_carregamento:
+            threading.Thread(target=self._abastecer, daemon=True, name="reserva-simulados").start()
+
+    def __len__(self):
+        return len(self._prontos)
+
+    def retirar(self):
+        """Um simulado pronto (semente, banco, posições int32), ou None se a reserva estiver vazia."""
+        with self._condicao:
+            if not self._prontos:
+                return None
+            pronto = self._prontos.popleft()
+            self._condicao.notify()
+        return pronto
+
+    def encerrar(self):
+        """Para a reposição e descarta os simulados guardados (banco recarregado)."""
+        with self._condicao:
+            self._encerrada = True
+            self._prontos.clear()
+            self._condicao.notify()
+
+    def _abastecer(self):
+        while True:
+            with self._condicao:
+                while len(self._prontos) >= self.capacidade and not self._encerrada:
+                    self._condicao.wait()
+                if self._encerrada:
+                    return
+            semente = self._sorteio_sementes.randrange(2**32)
+            banco_simulado, indices = montar_simulado_reserva(self.banco, semente=semente)
+            if banco_simulado is not self.banco or not simulado_valido(banco_simulado, indices):
+                # Banco sem questões de algum bloco: cada início monta o seu (com os placeholders)
+                print(f"LOG AVISO: Reserva de simulados desativada para a versão {str(self.banco.versao)[:12]}: o banco não forma um simulado completo.")
+                return
+            with self._condicao:
+                if self._encerrada:
+                    return
+                self._prontos.append((semente, banco_simulado, indices))
+
+
+_reserva_atual = None
+_reserva_lock = threading.Lock()
+
+
+def obter_reserva(banco):
+    """Reserva do banco atual; a da versão anterior é encerrada quando o banco muda."""
+    global _reserva_atual
+    reserva = _reserva_atual
+    if reserva is not None and reserva.banco is banco:
+        return reserva
+    with _reserva_lock:
+        if _reserva_atual is None or _reserva_atual.banco is not banco:
+            if _reserva_atual is not None:
+                _reserva_atual.encerrar()
+            _reserva_atual = ReservaSimulados(banco)
+        return _reserva_atual
+# --- FIM DA RESERVA DE SIMULADOS PRONTOS ---
@@ -0,0 +1,72 @@
+import numpy as np
+
+from pontuacao import (
+    calcular_pontuacao, situacao_das_questoes,
+    RESPOSTAS_POR_CODIGO, SITUACAO_BRANCA, SITUACAO_CERTA, SITUACAO_ERRADA
+)
+
+# --- REVISÃO DO GABARITO (PRÉ-COMPUTADA POR TENTATIVA) ---
+# A tentativa é corrigida uma única vez ao chegar na tela de resultados. Os filtros da
+# revisão usam índices pré-computados por situação e por disciplina. O markdown de cada
+# questão é montado só quando ela é exibida, lendo o enunciado do banco compartilhado pela
+# posição da tentativa, para que o session_state não guarde cópias dos enunciados.
+
+_CORES_SITUACAO = {SITUACAO_BRANCA: "gray", SITUACAO_CERTA: "green", SITUACAO_ERRADA: "red"}
+
+
+class RevisaoSimulado:
+    """Resultado e gabarito comentado de uma tentativa, prontos para exibição paginada."""
+
+    def __init__(self, respostas, indices, banco):
+        self.banco = banco
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.respostas = np.array(respostas, dtype=np.int8)
+
+        self.resultado = calcular_pontuacao(self.respostas, self.indices, banco)
+        self.situacoes = situacao_das_questoes(self.respostas, banco.gabaritos[self.indices])
+
+        self.indices_por_situacao = {
+            situacao: np.flatnonzero(self.situacoes == situacao)
+            for situacao in (SITUACAO_BRANCA, SITUACAO_CERTA, SITUACAO_ERRADA)
+        }
+        por_disciplina = {}
+        for q_idx, i in enumerate(self.indices.tolist()):
+            por_disciplina.setdefault(banco[i].get('disciplina', 'N/A'), []).append(q_idx)
+        self.indices_por_disciplina = {d: np.array(v, dtype=np.int64) for d, v in por_disciplina.items()}
+        self.disciplinas = sorted(self.indices_por_disciplina)
+
+        self._filtros = {}
+
+    def __len__(self):
+        return len(self.indices)
+
+    def filtrar(self, situacao=None, disciplinas=()):
+        """Índices (ordenados) das questões que atendem aos filtros; cada combinação é calculada uma vez."""
+        chave = (situacao, tuple(sorted(disciplinas)))
+        if chave not in self._filtros:
+            indices = np.arange(len(self.indices)) if situacao is None else self.indices_por_situacao[situacao]
+            if disciplinas:
+                indices_disciplinas = np.concatenate([self.indices_por_disciplina.get(d, np.empty(0, dtype=np.int64)) for d in disciplinas])
+                indices = np.intersect1d(indices, indices_disciplinas)
+            self._filtros[chave] = indices.tolist()
+        return self._filtros[chave]
+
+    def markdown_questao(self, q_idx):
+        """Markdown (com HTML) do gabarito comentado da questão `q_idx`, montado a cada exibição."""
+        q_simulado = self.banco[int(self.indices[q_idx])]
+        q_id_gabarito = q_simulado.get('id', f'gabarito_id_fallback_{q_idx}')
+        resp_usr_val = RESPOSTAS_POR_CODIGO[self.respostas[q_idx]]
+        resp_usr_display = resp_usr_val if resp_usr_val is not None else "Branco"
+        cor_texto = _CORES_SITUACAO[int(self.situacoes[q_idx])]
+
+        disciplina_gabarito = q_simulado.get('disciplina', 'N/A')
+        bloco_gabarito = q_simulado.get('bloco', 'N/A')
+        enunciado_gabarito = q_simulado.get('enunciado', 'Enunciado não disponível.')
+        gabarito_oficial = q_simulado.get('gabarito', 'N/A')
+
+        return (
+            f"**Questão {q_idx + 1} (Bloco {bloco_gabarito} - {disciplina_gabarito} - ID: `{q_id_gabarito}` )**\n\n"
+            f"{enunciado_gabarito}\n\n"
+            f"Gabarito Oficial: **{gabarito_oficial}** | Sua Resposta: <span style='color:{cor_texto}; font-weight:bold;'>{resp_usr_display}</span>"
+        )
+# --- FIM DA REVISÃO DO GABARITO ---
@@ -1,265 +1,228 @@
 import streamlit as st
+import math
+import os
 import time
 import random
-import json
+
+import numpy as np
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from banco_questoes import CAMINHO_PADRAO_BANCO, BancoQuestoes, caminho_banco_preferido, obter_banco
+from busca import obter_indice_busca, preparar_indice_busca
+import metricas
+from estimativa_aprovacao import estimar_aprovacao, perfil_da_revisao, perfil_uniforme
+from edital import (
+    TEMPO_TOTAL_SEGUNDOS, NUM_QUESTOES_BLOCO_1, NUM_QUESTOES_BLOCO_2, NUM_QUESTOES_BLOCO_3,
+    TOTAL_QUESTOES_PROVA, MIN_PONTOS_BLOCO_1, MIN_PONTOS_BLOCO_2, MIN_PONTOS_BLOCO_3, MIN_PONTOS_TOTAL
+)
+from montagem_simulado import montar_simulado, simulado_valido
+from persistencia import obter_armazem, SITUACAO_ABANDONADO, SITUACAO_FINALIZADO
+from metricas import cronometrado
+from pontuacao import (
+    codificar, CODIGO_CERTO, CODIGO_ERRADO, RESPOSTAS_POR_CODIGO, SITUACAO_BRANCA, SITUACAO_CERTA, SITUACAO_ERRADA
+)
+from reserva_simulados import obter_reserva
+from revisao_simulado import RevisaoSimulado
 
 # --- CONFIGURAÇÃO DA PÁGINA (DEVE SER O PRIMEIRO COMANDO STREAMLIT) ---
 st.set_page_config(layout="wide", page_title="Simulador Agente PF")
-
-# --- CONSTANTES E CONFIGURAÇÕES DO SIMULADO (Agente PF) ---
-# Baseado no Edital fornecido
-TEMPO_TOTAL_SEGUNDOS = (4 * 3600) + (30 * 60)  # 4 horas e 30 minutos [cite: 407]
-NUM_QUESTOES_BLOCO_1 = 60  # [cite: 404]
-NUM_QUESTOES_BLOCO_2 = 36  # [cite: 404]
-NUM_QUESTOES_BLOCO_3 = 24  # [cite: 404]
-TOTAL_QUESTOES_PROVA = NUM_QUESTOES_BLOCO_1 + NUM_QUESTOES_BLOCO_2 + NUM_QUESTOES_BLOCO_3
-
-# Critérios de Reprovação (será REPROVADO se nota INFERIOR a estes valores)
-# Portanto, para APROVAÇÃO, a nota deve ser MAIOR OU IGUAL
-MIN_PONTOS_BLOCO_1 = 6.00  # [cite: 442]
-MIN_PONTOS_BLOCO_2 = 3.00  # [cite: 443]
-MIN_PONTOS_BLOCO_3 = 2.00  # [cite: 444]
-MIN_PONTOS_TOTAL = 48.00 # [cite: 444]
-# --- FIM DAS CONFIGURAÇÕES ---
-
-# --- FUNÇÕES AUXILIARES ---
-def carregar_questoes_do_json(caminho_arquivo="questoes_pf_agente.json"):
-    """Carrega as questões de um arquivo JSON."""
-    try:
-        with open(caminho_arquivo, 'r', encoding='utf-8') as f:
-            questoes = json.load(f)
-        if not isinstance(questoes, list):
-            print(f"LOG ERRO: Conteúdo do JSON não é uma lista.")
-            return []
-        if not all(isinstance(q, dict) for q in questoes):
-            print(f"LOG ERRO: Nem todos os elementos da lista no JSON são dicionários (questões).")
-            return []
-        if not questoes:
-            print(f"LOG AVISO: Arquivo JSON '{caminho_arquivo}' está vazio.")
-            return []
-        # Validação básica da estrutura de cada questão
-        for i, q in enumerate(questoes):
-            if not all(key in q for key in ['id', 'bloco', 'disciplina', 'enunciado', 'gabarito']):
-                print(f"LOG AVISO: Questão {i} no JSON está com chaves faltando. ID: {q.get('id', 'N/A')}")
-        return questoes
-    except FileNotFoundError:
-        print(f"LOG ERRO: Arquivo JSON '{caminho_arquivo}' não encontrado.")
-        return []
-    except json.JSONDecodeError as e:
-        print(f"LOG ERRO: Erro ao decodificar o JSON do arquivo '{caminho_arquivo}': {e}")
-        return []
-
-def selecionar_questoes_simulado(questoes_disponiveis):
-    """Seleciona aleatoriamente o número correto de questões para cada bloco."""
-    if not questoes_disponiveis:
-        return [{"id": f"ERRO_Q_{i}", "bloco": (i % 3) + 1, "disciplina": "Erro Carregamento", "enunciado": "Nenhuma questão pôde ser carregada. Verifique o arquivo JSON e o console.", "gabarito": "C"} for i in range(TOTAL_QUESTOES_PROVA)]
-
-    random.shuffle(list(questoes_disponiveis)) # Embaralha uma cópia para variedade
-
-    questoes_selecionadas_final = []
-    blocos_config = {
-        1: NUM_QUESTOES_BLOCO_1,
-        2: NUM_QUESTOES_BLOCO_2,
-        3: NUM_QUESTOES_BLOCO_3
-    }
-
-    for bloco_num, num_necessario in blocos_config.items():
-        # Filtra questões disponíveis para o bloco atual
-        questoes_do_bloco_disponiveis = [q for q in questoes_disponiveis if q.get('bloco') == bloco_num]
-        
-        selecao_para_este_bloco = []
-        if len(questoes_do_bloco_disponiveis) >= num_necessario:
-            # Se há questões suficientes únicas, seleciona sem repetição (ideal)
-            selecao_para_este_bloco = random.sample(questoes_do_bloco_disponiveis, num_necessario)
-        elif questoes_do_bloco_disponiveis: # Se há algumas, mas menos que o necessário
-            print(f"LOG AVISO: Bloco {bloco_num} tem {len(questoes_do_bloco_disponiveis)} questões únicas, {num_necessario} são necessárias. Haverá repetição para este bloco.")
-            selecao_para_este_bloco = random.choices(questoes_do_bloco_disponiveis, k=num_necessario)
-        else: # Fallback se não há NENHUMA questão para o bloco no JSON
-            print(f"LOG ERRO: Nenhuma questão disponível no JSON para o Bloco {bloco_num}. Usando placeholders.")
-            selecao_para_este_bloco = [{"id": f"PLACEHOLDER_B{bloco_num}_{i}", "bloco": bloco_num, "disciplina": "Placeholder", "enunciado": f"Questão placeholder de emergência Bloco {bloco_num} - {i+1}", "gabarito": random.choice(["C", "E"])} for i in range(num_necessario)]
-        
-        questoes_selecionadas_final.extend(selecao_para_este_bloco)
-    
-    # Verificação final do total (embora a lógica acima deva garantir)
-    if len(questoes_selecionadas_final) != TOTAL_QUESTOES_PROVA:
-        print(f"LOG ERRO: Seleção final resultou em {len(questoes_selecionadas_final)} questões, esperado {TOTAL_QUESTOES_PROVA}. Preenchendo com placeholders.")
-        # Preenche se faltar (situação de erro extremo)
-        while len(questoes_selecionadas_final) < TOTAL_QUESTOES_PROVA:
-            bloco_fallback = (len(questoes_selecionadas_final) % 3) + 1
-            questoes_selecionadas_final.append({"id": f"TOTAL_FILL_PAD_{len(questoes_selecionadas_final)}", "bloco": bloco_fallback, "disciplina": "Placeholder Preenchimento", "enunciado": "Questão de preenchimento para totalizar.", "gabarito": "C"})
-    
-    return questoes_selecionadas_final
-
-
-def calcular_pontuacao(respostas, questoes_simulado):
-    """Calcula a pontuação baseada nas respostas e nos critérios do edital."""
-    pontos_b1, corretas_b1, erradas_b1, brancas_b1 = 0.0, 0, 0, 0
-    pontos_b2, corretas_b2, erradas_b2, brancas_b2 = 0.0, 0, 0, 0
-    pontos_b3, corretas_b3, erradas_b3, brancas_b3 = 0.0, 0, 0, 0
-
-    for questao in questoes_simulado:
-        q_id = questao.get('id', f'unknown_id_{random.randint(1000,9999)}')
-        bloco = questao.get('bloco')
-        gabarito = questao.get('gabarito')
-        resposta_usuario = respostas.get(q_id)
-
-        # Pontuação Cebraspe: +1 para certa, -1 para errada, 0 para branca [cite: 433, 434, 435]
-        if resposta_usuario is None or resposta_usuario == "Branco":
-            if bloco == 1: brancas_b1 += 1
-            elif bloco == 2: brancas_b2 += 1
-            elif bloco == 3: brancas_b3 += 1
-        elif resposta_usuario == gabarito:
-            if bloco == 1: pontos_b1 += 1.0; corretas_b1 += 1
-            elif bloco == 2: pontos_b2 += 1.0; corretas_b2 += 1
-            elif bloco == 3: pontos_b3 += 1.0; corretas_b3 += 1
-        else:  # Resposta errada
-            if bloco == 1: pontos_b1 -= 1.0; erradas_b1 += 1
-            elif bloco == 2: pontos_b2 -= 1.0; erradas_b2 += 1
-            elif bloco == 3: pontos_b3 -= 1.0; erradas_b3 += 1
-            
-    pontos_total = pontos_b1 + pontos_b2 + pontos_b3
-    
-    # Critérios de aprovação (nota DEVE SER >= ao mínimo)
-    aprovado_b1 = pontos_b1 >= MIN_PONTOS_BLOCO_1
-    aprovado_b2 = pontos_b2 >= MIN_PONTOS_BLOCO_2
-    aprovado_b3 = pontos_b3 >= MIN_PONTOS_BLOCO_3
-    aprovado_total_pontos = pontos_total >= MIN_PONTOS_TOTAL
-    
-    status_aprovacao = "APROVADO(A) ✅"
-    motivos_reprovacao = []
-
-    aprovacao_final_nos_criterios = aprovado_b1 and aprovado_b2 and aprovado_b3 and aprovado_total_pontos
-
-    if not aprovado_b1:
-        motivos_reprovacao.append(f"Bloco I: {pontos_b1:.2f} (Mínimo necessário: {MIN_PONTOS_BLOCO_1:.2f})")
-    if not aprovado_b2:
-        motivos_reprovacao.append(f"Bloco II: {pontos_b2:.2f} (Mínimo necessário: {MIN_PONTOS_BLOCO_2:.2f})")
-    if not aprovado_b3:
-        motivos_reprovacao.append(f"Bloco III: {pontos_b3:.2f} (Mínimo necessário: {MIN_PONTOS_BLOCO_3:.2f})")
-    if not aprovado_total_pontos: # Checa a pontuação total separadamente
-         motivos_reprovacao.append(f"Pontuação Total: {pontos_total:.2f} (Mínimo necessário: {MIN_PONTOS_TOTAL:.2f})")
-
-    if not aprovacao_final_nos_criterios:
-        status_aprovacao = "REPROVADO(A) ❌"
-
-    return {
-        "B1": {"pontos": pontos_b1, "corretas": corretas_b1, "erradas": erradas_b1, "brancas": brancas_b1, "aprovado_no_bloco": aprovado_b1},
-        "B2": {"pontos": pontos_b2, "corretas": corretas_b2, "erradas": erradas_b2, "brancas": brancas_b2, "aprovado_no_bloco": aprovado_b2},
-        "B3": {"pontos": pontos_b3, "corretas": corretas_b3, "erradas": erradas_b3, "brancas": brancas_b3, "aprovado_no_bloco": aprovado_b3},
-        "total_pontos": pontos_total,
-        "aprovado_na_pontuacao_total": aprovado_total_pontos, # Se passou no critério da nota total
-        "status_geral": status_aprovacao, # Se passou em TODOS os critérios
-        "motivos_reprovacao": motivos_reprovacao
-    }
-# --- FIM DAS FUNÇÕES AUXILIARES ---
-
-
-# --- CARREGAR QUESTÕES (EXECUTADO UMA VEZ NO INÍCIO) ---
-if 'todas_questoes_base' not in st.session_state:
-    json_questoes = carregar_questoes_do_json()
-    if not json_questoes:
-        st.session_state.todas_questoes_base = [
-            {"id": "FALLBACK_B1_01", "bloco": 1, "disciplina": "Exemplo Fallback", "enunciado": "Questão exemplo fallback Bloco 1. Verifique 'questoes_pf_agente.json'.", "gabarito": "C"},
-            {"id": "FALLBACK_B2_01", "bloco": 2, "disciplina": "Exemplo Fallback", "enunciado": "Questão exemplo fallback Bloco 2. Arquivo na mesma pasta?", "gabarito": "E"},
-            {"id": "FALLBACK_B3_01", "bloco": 3, "disciplina": "Exemplo Fallback", "enunciado": "Questão exemplo fallback Bloco 3. JSON é uma lista de objetos?", "gabarito": "C"},
-        ]
-        st.session_state.json_load_error = True
-    else:
-        st.session_state.todas_questoes_base = json_questoes
-        st.session_state.json_load_error = False
+metricas.iniciar_exportacao()  # Só faz algo com SIMULADO_METRICAS definida (ver metricas.py)
+
+# --- CARREGAR QUESTÕES (BANCO ÚNICO COMPARTILHADO PELO PROCESSO) ---
+# O banco é carregado/validado uma vez por processo e recarregado automaticamente quando o
+# arquivo muda. Se existir o banco compilado (.bqpf) e ele não for mais antigo que o JSON, só
+# os metadados ficam em memória e os enunciados são lidos quando a página é desenhada.
+# A sessão não guarda cópia do banco.
+banco = obter_banco(caminho_banco_preferido())
+preparar_indice_busca(banco)  # Índice do modo estudo, montado em segundo plano a cada nova versão do banco
+reserva_simulados = obter_reserva(banco)  # Simulados já sorteados em segundo plano (ver reserva_simulados.py)
 # --- FIM DO CARREGAMENTO DE QUESTÕES ---
 
 
-# --- INTERFACE PRINCIPAL DO STREAMLIT ---
-st.title("Simulador - Prova Objetiva Agente PF 👮‍♂️👮‍♀️")
-st.markdown("---")
+# --- FRAGMENTOS DA TELA DE SIMULADO ---
+# Cronômetro e páginas de questões rodam como fragmentos: um tique do relógio ou um clique
+# de navegação reexecuta só o fragmento, não o script inteiro.
+# A tentativa fica na sessão em forma compacta: 'banco_simulado' (referência ao banco de
+# onde as questões foram sorteadas), 'indices_simulado' (posições int32 nesse banco) e
+# 'respostas_simulado' (um byte por questão: 0 = Branco, 1 = Certo, 2 = Errado).
+QUESTOES_POR_PAGINA = 10
+CHAVES_SIMULADO = ['simulado_iniciado', 'simulado_finalizado', 'banco_simulado', 'indices_simulado', 'respostas_simulado',
+                   'tempo_inicio', 'pagina_atual', 'semente_simulado', 'revisao_simulado', 'pagina_revisao',
+                   'token_tentativa', 'modo_estudo']
+_INDICE_RADIO_POR_CODIGO = {CODIGO_CERTO: 0, CODIGO_ERRADO: 1}  # Demais códigos: "Branco" (índice 2)
 
-# Inicialização do estado da sessão se não existir
-default_session_state = {
-    'simulado_iniciado': False,
-    'simulado_finalizado': False,
-    'questoes_do_simulado': [],
-    'respostas_usuario': {},
-    'tempo_inicio': 0,
-    'pagina_atual': 0
-}
-for key, value in default_session_state.items():
-    if key not in st.session_state:
-        st.session_state[key] = value
 
-# Feedback sobre carregamento de questões (na sidebar)
-if 'json_load_error' in st.session_state:
-    if st.session_state.json_load_error:
-        st.sidebar.warning("⚠️ Falha ao carregar 'questoes_pf_agente.json'. Usando questões de exemplo internas. Verifique o console do terminal para logs.")
+def limpar_simulado():
+    """Remove da sessão tudo o que pertence ao simulado atual."""
+    for key_to_reset in CHAVES_SIMULADO:
+        if key_to_reset in st.session_state:
+            del st.session_state[key_to_reset]
+
+
+def tempo_restante_simulado():
+    if st.session_state.modo_estudo:
+        return math.inf  # Modo estudo não tem limite de tempo
+    return TEMPO_TOTAL_SEGUNDOS - (time.time() - st.session_state.tempo_inicio)
+
+
+def num_questoes_simulado():
+    indices = st.session_state.indices_simulado
+    return 0 if indices is None else len(indices)
+
+
+def num_total_paginas():
+    return max(1, (num_questoes_simulado() + QUESTOES_POR_PAGINA - 1) // QUESTOES_POR_PAGINA)
+
+
+def questoes_da_pagina(pagina):
+    """Questões da página, lidas do banco da tentativa pelas posições guardadas na sessão."""
+    inicio_idx = pagina * QUESTOES_POR_PAGINA
+    banco_simulado = st.session_state.banco_simulado
+    return [banco_simulado[i] for i in st.session_state.indices_simulado[inicio_idx:inicio_idx + QUESTOES_POR_PAGINA].tolist()]
+
+
+def iniciar_tentativa(banco_simulado, indices, respostas=None):
+    """Coloca na sessão a forma compacta de uma tentativa (banco, posições e respostas codificadas)."""
+    st.session_state.banco_simulado = banco_simulado
+    st.session_state.indices_simulado = np.asarray(indices, dtype=np.int32)
+    st.session_state.respostas_simulado = np.zeros(len(indices), dtype=np.int8) if respostas is None else respostas
+
+
+def salvar_progresso(respostas_alteradas=None, situacao=None):
+    """Grava o progresso da tentativa no armazém durável (uma transação por chamada)."""
+    segundos_utilizados = min(TEMPO_TOTAL_SEGUNDOS, time.time() - st.session_state.tempo_inicio)
+    obter_armazem().salvar_progresso(st.session_state.token_tentativa, respostas_alteradas,
+                                     st.session_state.pagina_atual, segundos_utilizados, situacao)
+
+
+@cronometrado("registrar_respostas")
+def registrar_respostas_pagina():
+    """Copia as respostas do formulário da página atual para 'respostas_simulado' (callback de envio).
+
+    Devolve apenas as respostas que mudaram ({id: "Certo"/"Errado"/None}), para serem gravadas em lote.
+    """
+    alteradas = {}
+    if tempo_restante_simulado() <= 0:
+        return alteradas  # Respostas enviadas depois do prazo não são aceitas
+    respostas = st.session_state.respostas_simulado
+    for i, questao_obj in enumerate(questoes_da_pagina(st.session_state.pagina_atual), start=st.session_state.pagina_atual * QUESTOES_POR_PAGINA):
+        q_id = questao_obj.get('id', f'radio_id_fallback_{i}')
+        resposta = st.session_state.get(f"radio_key_{q_id}")
+        if resposta is None:
+            continue
+        codigo = codificar(resposta)
+        if respostas[i] != codigo:
+            respostas[i] = codigo
+            alteradas[q_id] = RESPOSTAS_POR_CODIGO[codigo]
+    return alteradas
+
+
+def mudar_pagina(deslocamento):
+    alteradas = registrar_respostas_pagina()
+    st.session_state.pagina_atual += deslocamento
+    salvar_progresso(alteradas)
+
+
+def finalizar_simulado():
+    alteradas = registrar_respostas_pagina()
+    st.session_state.simulado_finalizado = True
+    salvar_progresso(alteradas, situacao=SITUACAO_FINALIZADO)
+
+
+def encerrar_por_tempo():
+    """Finaliza a prova quando o tempo acaba (chamado no servidor, em qualquer execução)."""
+    st.session_state.simulado_finalizado = True
+    salvar_progresso(situacao=SITUACAO_FINALIZADO)
+    st.toast("Tempo esgotado!", icon="⏰")
+    st.rerun()
+
+
+def retomar_simulado(token):
+    """Recarrega na sessão uma tentativa gravada, com as mesmas questões e o prazo original.
+
+    O tempo é contado no relógio desde o início da prova (`criado_em`), inclusive enquanto o
+    candidato esteve desconectado. Uma tentativa em andamento cujo prazo já acabou não volta
+    para a prova: é encerrada com as respostas gravadas e abre direto no resultado.
+    Se a tentativa é da versão atual do banco, volta a apontar para ele; senão, as questões
+    gravadas com a tentativa formam um banco só dela.
+    """
+    armazem = obter_armazem()
+    tentativa = armazem.carregar_tentativa(token)
+    if tentativa is None or tentativa["situacao"] == SITUACAO_ABANDONADO or not tentativa["questoes"]:
+        return False
+    if tentativa["situacao"] != SITUACAO_FINALIZADO and time.time() - tentativa["criado_em"] >= TEMPO_TOTAL_SEGUNDOS:
+        armazem.salvar_progresso(token, None, tentativa["pagina_atual"], TEMPO_TOTAL_SEGUNDOS, situacao=SITUACAO_FINALIZADO)
+        tentativa["situacao"] = SITUACAO_FINALIZADO
+        st.toast("O prazo deste simulado já terminou; ele foi encerrado com as respostas gravadas.", icon="⏰")
+    ids = [q.get('id') for q in tentativa["questoes"]]
+    indices = banco.posicoes_dos_ids(ids) if tentativa["versao_banco"] == banco.versao else None
+    if indices is None:
+        banco_tentativa, indices = BancoQuestoes(tentativa["questoes"], versao=tentativa["versao_banco"]), np.arange(len(ids), dtype=np.int32)
     else:
-        st.sidebar.success(f"✅ {len(st.session_state.todas_questoes_base)} questões carregadas do JSON!")
-
-# Lógica principal de exibição de telas
-if st.session_state.simulado_iniciado and not st.session_state.simulado_finalizado:
-    # --- TELA: SIMULADO EM ANDAMENTO ---
-    tempo_decorrido = time.time() - st.session_state.tempo_inicio
-    tempo_restante = TEMPO_TOTAL_SEGUNDOS - tempo_decorrido
-
+        banco_tentativa = banco
+    st.session_state.token_tentativa = token
+    iniciar_tentativa(banco_tentativa, indices, np.fromiter((codificar(tentativa["respostas"].get(q_id)) for q_id in ids), dtype=np.int8, count=len(ids)))
+    st.session_state.semente_simulado = tentativa["semente"]
+    st.session_state.pagina_atual = tentativa["pagina_atual"]
+    st.session_state.tempo_inicio = tentativa["criado_em"]
+    st.session_state.simulado_iniciado = True
+    st.session_state.simulado_finalizado = tentativa["situacao"] == SITUACAO_FINALIZADO
+    st.session_state.revisao_simulado = None
+    return True
+
+
+def registrar_sessao():
+    """Marca a sessão como ativa nas métricas; chamado também nos fragmentos, que não reexecutam o script."""
+    if not metricas.ATIVO:
+        return
+    contexto_execucao = get_script_run_ctx()
+    metricas.registrar_sessao(contexto_execucao.session_id if contexto_execucao else None, st.session_state,
+                              st.session_state.simulado_iniciado and not st.session_state.simulado_finalizado
+                              and not st.session_state.modo_estudo)
+
+
+@st.fragment(run_every=1)
+def fragmento_cronometro():
+    """Atualiza o tempo restante a cada segundo e finaliza a prova no servidor quando ele acaba."""
+    registrar_sessao()
+    tempo_restante = tempo_restante_simulado()
     if tempo_restante <= 0:
-        st.session_state.simulado_finalizado = True
-        st.toast("Tempo esgotado!", icon="⏰")
-        st.rerun()
+        encerrar_por_tempo()
 
     minutos_rest, segundos_rest = divmod(int(tempo_restante), 60)
     horas_rest, minutos_rest = divmod(minutos_rest, 60)
-    
-    st.sidebar.header("⏳ Tempo Restante")
-    st.sidebar.subheader(f"{horas_rest:02d}:{minutos_rest:02d}:{segundos_rest:02d}")
-    st.sidebar.info(f"**Questões:** {TOTAL_QUESTOES_PROVA} (B1: {NUM_QUESTOES_BLOCO_1}, B2: {NUM_QUESTOES_BLOCO_2}, B3: {NUM_QUESTOES_BLOCO_3})")
-    st.sidebar.markdown("---")
-    if st.sidebar.button("🏳️ Abandonar Simulado", type="secondary", key="btn_abandonar"):
-        for key_to_reset in ['simulado_iniciado', 'simulado_finalizado', 'questoes_do_simulado', 'respostas_usuario', 'tempo_inicio', 'pagina_atual']:
-            if key_to_reset in st.session_state:
-                del st.session_state[key_to_reset]
-        st.toast("Simulado abandonado.", icon="🏳️")
-        st.rerun()
-    st.sidebar.caption("Boa prova!")
-    
-    st.subheader("Questões da Prova Objetiva")
-    st.caption(f"Instruções: Marque 'Certo', 'Errado' ou 'Branco'. Pontuação Cebraspe: +1 (Certa), -1 (Errada), 0 (Branca).")
-    st.caption(f"Critérios de Aprovação (Agente PF): Bloco I ≥ {MIN_PONTOS_BLOCO_1:.0f}, Bloco II ≥ {MIN_PONTOS_BLOCO_2:.0f}, Bloco III ≥ {MIN_PONTOS_BLOCO_3:.0f}, Total ≥ {MIN_PONTOS_TOTAL:.0f} pontos.")
-    st.markdown("---")
+    st.header("⏳ Tempo Restante")
+    st.subheader(f"{horas_rest:02d}:{minutos_rest:02d}:{segundos_rest:02d}")
 
-    # Controles de Paginação (FORA DO FORMULÁRIO)
-    questoes_por_pagina = 10
-    if not st.session_state.questoes_do_simulado:
-        num_total_paginas = 1
-    else:
-        num_total_paginas = (len(st.session_state.questoes_do_simulado) + questoes_por_pagina - 1) // questoes_por_pagina
-        if num_total_paginas == 0: num_total_paginas = 1
 
-    if st.session_state.pagina_atual >= num_total_paginas: st.session_state.pagina_atual = num_total_paginas - 1
-    if st.session_state.pagina_atual < 0: st.session_state.pagina_atual = 0
+@st.fragment
+@cronometrado("desenhar_pagina_questoes")
+def fragmento_questoes():
+    """Paginação e formulário da página atual; navegar registra as respostas e reexecuta só este trecho."""
+    registrar_sessao()
+    if tempo_restante_simulado() <= 0:
+        encerrar_por_tempo()
 
-    nav_cols = st.columns([1, 3, 1])
-    with nav_cols[0]:
-        if st.session_state.pagina_atual > 0:
-            if st.button("⬅️ Anterior", use_container_width=True, key="btn_anterior_paginacao"):
-                st.session_state.pagina_atual -= 1
-                st.rerun()
-    with nav_cols[1]:
-        st.markdown(f"<div style='text-align: center; margin-top: 8px;'>Página {st.session_state.pagina_atual + 1} de {num_total_paginas}</div>", unsafe_allow_html=True)
-    with nav_cols[2]:
-        if st.session_state.pagina_atual < num_total_paginas - 1:
-            if st.button("Próxima ➡️", use_container_width=True, key="btn_proxima_paginacao"):
-                st.session_state.pagina_atual += 1
-                st.rerun()
-    st.markdown("---")
+    total_paginas = num_total_paginas()
+    if st.session_state.pagina_atual >= total_paginas: st.session_state.pagina_atual = total_paginas - 1
+    if st.session_state.pagina_atual < 0: st.session_state.pagina_atual = 0
 
     with st.form("simulado_form"):
-        inicio_idx = st.session_state.pagina_atual * questoes_por_pagina
-        fim_idx = inicio_idx + questoes_por_pagina
-        
-        questoes_pagina_atual = []
-        if st.session_state.questoes_do_simulado:
-            questoes_pagina_atual = st.session_state.questoes_do_simulado[inicio_idx:fim_idx]
-
-        if not questoes_pagina_atual and st.session_state.questoes_do_simulado:
+        # Controles de Paginação (botões de envio do formulário, para não perder as marcações da página)
+        nav_cols = st.columns([1, 3, 1])
+        with nav_cols[0]:
+            if st.session_state.pagina_atual > 0:
+                st.form_submit_button("⬅️ Anterior", use_container_width=True, key="btn_anterior_paginacao", on_click=mudar_pagina, args=(-1,))
+        with nav_cols[1]:
+            st.markdown(f"<div style='text-align: center; margin-top: 8px;'>Página {st.session_state.pagina_atual + 1} de {total_paginas}</div>", unsafe_allow_html=True)
+        with nav_cols[2]:
+            if st.session_state.pagina_atual < total_paginas - 1:
+                st.form_submit_button("Próxima ➡️", use_container_width=True, key="btn_proxima_paginacao", on_click=mudar_pagina, args=(1,))
+
+        inicio_idx = st.session_state.pagina_atual * QUESTOES_POR_PAGINA
+        questoes_pagina_atual = questoes_da_pagina(st.session_state.pagina_atual)
+
+        if not questoes_pagina_atual and num_questoes_simulado():
             st.warning("Não há questões para exibir nesta página.")
         
         for i, questao_obj in enumerate(questoes_pagina_atual, start=inicio_idx):
@@ -269,103 +232,309 @@ if st.session_state.simulado_iniciado and not st.session_state.simulado_finaliza
             bloco_q = questao_obj.get('bloco', 'N/A')
             enunciado_q = questao_obj.get('enunciado', 'Enunciado não disponível.')
 
-            st.markdown(f"**Questão {inicio_idx + i - inicio_idx + 1} (Bloco {bloco_q} - {disciplina_q})** ID: `{q_id}`")
+            st.markdown(f"**Questão {i + 1} (Bloco {bloco_q} - {disciplina_q})** ID: `{q_id}`")
             st.markdown(enunciado_q)
             
-            default_index = 2 
-            resposta_salva = st.session_state.respostas_usuario.get(q_id)
-            if resposta_salva == "Certo": default_index = 0
-            elif resposta_salva == "Errado": default_index = 1
-            
-            resposta = st.radio(
+            default_index = _INDICE_RADIO_POR_CODIGO.get(int(st.session_state.respostas_simulado[i]), 2)
+
+            st.radio(
                 "Sua resposta:", options=["Certo", "Errado", "Branco"],
                 key=f"radio_key_{q_id}", 
                 index=default_index,
                 horizontal=True
             )
-            if resposta == "Branco":
-                 st.session_state.respostas_usuario[q_id] = None
-            else:
-                st.session_state.respostas_usuario[q_id] = resposta
         
         st.markdown("---")
-        submitted = st.form_submit_button("🏁 Finalizar Simulado e Ver Resultado", type="primary", use_container_width=True)
+        submitted = st.form_submit_button("🏁 Finalizar Simulado e Ver Resultado", type="primary", use_container_width=True, on_click=finalizar_simulado)
         if submitted:
-            st.session_state.simulado_finalizado = True
             st.rerun()
+# --- FIM DOS FRAGMENTOS DA TELA DE SIMULADO ---
+
+
+# --- FRAGMENTO DA REVISÃO DO GABARITO ---
+# Só a página atual da revisão é desenhada, e apenas com a revisão aberta; filtros e
+# navegação reexecutam só este fragmento.
+REVISAO_POR_PAGINA = 10
+FILTROS_SITUACAO = {
+    "Todas": None,
+    "Somente erradas": SITUACAO_ERRADA,
+    "Somente certas": SITUACAO_CERTA,
+    "Somente em branco": SITUACAO_BRANCA,
+}
+
+
+def reiniciar_pagina_revisao():
+    st.session_state.pagina_revisao = 0
+
+
+def mudar_pagina_revisao(deslocamento):
+    st.session_state.pagina_revisao += deslocamento
+
+
+@st.fragment
+@cronometrado("desenhar_revisao")
+def fragmento_revisao(revisao):
+    """Gabarito detalhado paginado e filtrável, a partir da correção pré-computada da tentativa."""
+    if not st.toggle("🔍 Ver Gabarito Detalhado e Suas Respostas", key="mostrar_gabarito"):
+        return
+
+    filtro_cols = st.columns(2)
+    with filtro_cols[0]:
+        filtro_situacao = st.selectbox("Mostrar:", list(FILTROS_SITUACAO), key="filtro_situacao_revisao", on_change=reiniciar_pagina_revisao)
+    with filtro_cols[1]:
+        filtro_disciplinas = st.multiselect("Disciplinas:", revisao.disciplinas, key="filtro_disciplinas_revisao", on_change=reiniciar_pagina_revisao)
+
+    indices = revisao.filtrar(FILTROS_SITUACAO[filtro_situacao], filtro_disciplinas)
+    if not indices:
+        st.write("Nenhuma questão corresponde aos filtros selecionados.")
+        return
+
+    total_paginas = (len(indices) + REVISAO_POR_PAGINA - 1) // REVISAO_POR_PAGINA
+    if st.session_state.pagina_revisao >= total_paginas: st.session_state.pagina_revisao = total_paginas - 1
+    if st.session_state.pagina_revisao < 0: st.session_state.pagina_revisao = 0
+
+    nav_cols = st.columns([1, 3, 1])
+    with nav_cols[0]:
+        if st.session_state.pagina_revisao > 0:
+            st.button("⬅️ Anterior", use_container_width=True, key="btn_anterior_revisao", on_click=mudar_pagina_revisao, args=(-1,))
+    with nav_cols[1]:
+        st.markdown(f"<div style='text-align: center; margin-top: 8px;'>{len(indices)} questões — Página {st.session_state.pagina_revisao + 1} de {total_paginas}</div>", unsafe_allow_html=True)
+    with nav_cols[2]:
+        if st.session_state.pagina_revisao < total_paginas - 1:
+            st.button("Próxima ➡️", use_container_width=True, key="btn_proxima_revisao", on_click=mudar_pagina_revisao, args=(1,))
+
+    inicio_idx = st.session_state.pagina_revisao * REVISAO_POR_PAGINA
+    for q_idx in indices[inicio_idx:inicio_idx + REVISAO_POR_PAGINA]:
+        st.markdown("---")
+        st.markdown(revisao.markdown_questao(q_idx), unsafe_allow_html=True)
+# --- FIM DO FRAGMENTO DA REVISÃO DO GABARITO ---
+
+
+# --- FRAGMENTO DO MODO ESTUDO ---
+# A busca usa o índice invertido compartilhado (busca.py); cada consulta reexecuta só este
+# fragmento. As questões encontradas seguem para a mesma paginação/formulário do simulado.
+QUESTOES_POR_ESTUDO = 30
+
+
+def iniciar_estudo(indices):
+    limpar_simulado()
+    iniciar_tentativa(banco, indices)
+    st.session_state.modo_estudo = True
+    st.session_state.simulado_iniciado = True
+    st.session_state.simulado_finalizado = False
+    st.session_state.tempo_inicio = time.time()
+    st.session_state.pagina_atual = 0
+    st.session_state.tela_estudo = False
+
+
+@st.fragment
+def fragmento_busca_estudo():
+    """Campo de busca, prévia dos resultados e início do estudo com as questões encontradas."""
+    consulta = st.text_input("Buscar por tema:", key="consulta_estudo", placeholder="ex.: crase, inquérito policial, regência")
+    if not consulta.strip():
+        return
+
+    with st.spinner("Preparando o índice de busca..."):
+        indice = obter_indice_busca(banco)
+    indices = indice.buscar(consulta, limite=QUESTOES_POR_ESTUDO)
+    if not indices:
+        st.info("Nenhuma questão encontrada para essa busca.")
+        return
+
+    st.button(f"📝 Responder as {len(indices)} questões encontradas", key="iniciar_estudo_btn", type="primary",
+              use_container_width=True, on_click=iniciar_estudo, args=(indices,))
+    for posicao, i in enumerate(indices[:QUESTOES_POR_PAGINA], start=1):
+        questao_obj = banco[i]
+        st.markdown("---")
+        st.markdown(f"**{posicao}. {questao_obj.get('disciplina', 'N/A')}** (Bloco {questao_obj.get('bloco', 'N/A')}) ID: `{questao_obj.get('id')}`")
+        st.markdown(questao_obj.get('enunciado', 'Enunciado não disponível.'))
+    if len(indices) > QUESTOES_POR_PAGINA:
+        st.caption(f"Mostrando as {QUESTOES_POR_PAGINA} mais relevantes de {len(indices)}.")
+# --- FIM DO FRAGMENTO DO MODO ESTUDO ---
+
+
+# --- FRAGMENTOS DA ESTIMATIVA DE APROVAÇÃO ---
+# Chance de aprovação por Monte Carlo (estimativa_aprovacao.py), para uma estratégia
+# informada na tela inicial ou para o desempenho de uma tentativa já corrigida.
+AMOSTRAS_ESTIMATIVA = 1_000_000
+NOMES_BLOCOS = {"B1": "Bloco I", "B2": "Bloco II", "B3": "Bloco III"}
+
+
+def mostrar_estimativa(estimativa):
+    st.metric(label="Chance de aprovação", value=f"{estimativa['probabilidade_aprovacao']:.1%}")
+    cols_blocos = st.columns(4)
+    for col, (chave, nome) in zip(cols_blocos, NOMES_BLOCOS.items()):
+        with col:
+            st.caption(f"{nome}: média {estimativa[chave]['media']:.1f} pts — P(mínimo) = {estimativa[chave]['probabilidade_aprovacao']:.1%}")
+    with cols_blocos[3]:
+        st.caption(f"Total: média {estimativa['total']['media']:.1f} pts — P(≥ {MIN_PONTOS_TOTAL:.0f}) = {estimativa['probabilidade_pontuacao_total']:.1%}")
+    distribuicao = estimativa['total']
+    possiveis = np.flatnonzero(distribuicao['probabilidades'])
+    if len(possiveis):
+        faixa = slice(possiveis[0], possiveis[-1] + 1)
+        st.bar_chart({"Pontuação total": distribuicao['valores'][faixa], "Probabilidade": distribuicao['probabilidades'][faixa]},
+                     x="Pontuação total", y="Probabilidade", height=220)
+    st.caption(f"Estimativa com {estimativa['amostras']:,} folhas de resposta sorteadas.".replace(",", "."))
+
+
+@st.fragment
+def fragmento_estrategia():
+    """Calculadora da tela inicial: quantas responder e com que taxa de acerto."""
+    respondidas = st.number_input("Questões que pretende responder:", min_value=0, max_value=TOTAL_QUESTOES_PROVA, value=85, key="estrategia_respondidas")
+    acerto = st.slider("Taxa de acerto esperada nas respondidas (%):", min_value=0, max_value=100, value=80, key="estrategia_acerto")
+    if st.button("Calcular chance de aprovação", key="calcular_estrategia_btn"):
+        mostrar_estimativa(estimar_aprovacao(perfil_uniforme(respondidas, acerto / 100), AMOSTRAS_ESTIMATIVA))
+
+
+@st.fragment
+def fragmento_estimativa_revisao(revisao):
+    """Chance de aprovação se o candidato mantiver, em cada disciplina, o desempenho desta tentativa."""
+    if st.button("Calcular chance de aprovação mantendo este desempenho", key="estimativa_revisao_btn"):
+        mostrar_estimativa(estimar_aprovacao(perfil_da_revisao(revisao), AMOSTRAS_ESTIMATIVA))
+# --- FIM DOS FRAGMENTOS DA ESTIMATIVA DE APROVAÇÃO ---
+
+
+# --- INTERFACE PRINCIPAL DO STREAMLIT ---
+st.title("Simulador - Prova Objetiva Agente PF 👮‍♂️👮‍♀️")
+st.markdown("---")
+
+# Inicialização do estado da sessão se não existir
+default_session_state = {
+    'simulado_iniciado': False,
+    'simulado_finalizado': False,
+    'banco_simulado': None,
+    'indices_simulado': None,
+    'respostas_simulado': None,
+    'tempo_inicio': 0,
+    'pagina_atual': 0,
+    'semente_simulado': None,
+    'revisao_simulado': None,
+    'pagina_revisao': 0,
+    'token_tentativa': None,
+    'modo_estudo': False,
+    'tela_estudo': False
+}
+for key, value in default_session_state.items():
+    if key not in st.session_state:
+        st.session_state[key] = value
+
+registrar_sessao()
+
+# Feedback sobre carregamento de questões (na sidebar)
+arquivo_banco = os.path.basename(banco.caminho or CAMINHO_PADRAO_BANCO)
+if banco.erro_carregamento:
+    st.sidebar.warning(f"⚠️ Falha ao carregar '{arquivo_banco}'. Usando questões de exemplo internas. Verifique o console do terminal para logs.")
+else:
+    origem_banco = "do banco compilado" if arquivo_banco.endswith(".bqpf") else "do JSON"
+    st.sidebar.success(f"✅ {len(banco)} questões carregadas {origem_banco} ('{arquivo_banco}')!")
+
+# Lógica principal de exibição de telas
+if st.session_state.simulado_iniciado and not st.session_state.simulado_finalizado:
+    # --- TELA: SIMULADO EM ANDAMENTO ---
+    if tempo_restante_simulado() <= 0:
+        encerrar_por_tempo()
+
+    if st.session_state.modo_estudo:
+        st.sidebar.header("📚 Modo Estudo")
+        st.sidebar.info(f"**Questões:** {num_questoes_simulado()} (sem limite de tempo)")
+    else:
+        with st.sidebar:
+            fragmento_cronometro()
+        st.sidebar.info(f"**Questões:** {TOTAL_QUESTOES_PROVA} (B1: {NUM_QUESTOES_BLOCO_1}, B2: {NUM_QUESTOES_BLOCO_2}, B3: {NUM_QUESTOES_BLOCO_3})")
+    st.sidebar.markdown("---")
+    if st.session_state.token_tentativa:
+        st.sidebar.caption(f"Código para retomar este simulado: `{st.session_state.token_tentativa}`")
+    if st.sidebar.button("🏳️ Abandonar Simulado", type="secondary", key="btn_abandonar"):
+        salvar_progresso(situacao=SITUACAO_ABANDONADO)
+        limpar_simulado()
+        st.toast("Simulado abandonado.", icon="🏳️")
+        st.rerun()
+    st.sidebar.caption("Boa prova!")
+    
+    st.subheader("Questões da Prova Objetiva")
+    st.caption(f"Instruções: Marque 'Certo', 'Errado' ou 'Branco'. Pontuação Cebraspe: +1 (Certa), -1 (Errada), 0 (Branca). Suas respostas são registradas ao mudar de página ou finalizar.")
+    st.caption(f"Critérios de Aprovação (Agente PF): Bloco I ≥ {MIN_PONTOS_BLOCO_1:.0f}, Bloco II ≥ {MIN_PONTOS_BLOCO_2:.0f}, Bloco III ≥ {MIN_PONTOS_BLOCO_3:.0f}, Total ≥ {MIN_PONTOS_TOTAL:.0f} pontos.")
+    st.markdown("---")
+
+    fragmento_questoes()
 
 elif st.session_state.simulado_finalizado:
     # --- TELA: RESULTADOS DO SIMULADO ---
-    st.balloons()
     st.header("🏁 Simulado Finalizado! 📊")
     
-    if not st.session_state.questoes_do_simulado:
+    if not num_questoes_simulado():
         st.error("Não há dados do simulado para exibir resultados. Tente iniciar um novo simulado.")
     else:
-        resultado = calcular_pontuacao(st.session_state.respostas_usuario, st.session_state.questoes_do_simulado)
+        # Correção feita uma única vez por tentativa; as próximas execuções reaproveitam o resultado
+        if st.session_state.revisao_simulado is None:
+            with metricas.medir("corrigir_tentativa"):
+                st.session_state.revisao_simulado = RevisaoSimulado(st.session_state.respostas_simulado, st.session_state.indices_simulado, st.session_state.banco_simulado)
+            st.balloons()
+        resultado = st.session_state.revisao_simulado.resultado
         
-        st.subheader(f"Resultado Geral: {resultado['status_geral']}")
+        if st.session_state.modo_estudo:
+            st.subheader("Resultado do Estudo")
+            cols_estudo = st.columns(3)
+            with cols_estudo[0]:
+                st.metric(label="Certas", value=sum(resultado[b]['corretas'] for b in ('B1', 'B2', 'B3')))
+            with cols_estudo[1]:
+                st.metric(label="Erradas", value=sum(resultado[b]['erradas'] for b in ('B1', 'B2', 'B3')))
+            with cols_estudo[2]:
+                st.metric(label="Em branco", value=sum(resultado[b]['brancas'] for b in ('B1', 'B2', 'B3')))
+            st.markdown("---")
+        else:
+            st.subheader(f"Resultado Geral: {resultado['status_geral']}")
 
-        if resultado['status_geral'] == "REPROVADO(A) ❌":
-            st.warning("Critérios não atingidos:")
-            for motivo in resultado['motivos_reprovacao']:
-                st.caption(f"- {motivo}")
+            if resultado['status_geral'] == "REPROVADO(A) ❌":
+                st.warning("Critérios não atingidos:")
+                for motivo in resultado['motivos_reprovacao']:
+                    st.caption(f"- {motivo}")
         
-        st.markdown("---")
-        st.subheader("Detalhes da Pontuação:")
-
-        cols_resultado = st.columns(3)
-        with cols_resultado[0]:
-            st.metric(label="Pontos Bloco I", value=f"{resultado['B1']['pontos']:.2f} / {NUM_QUESTOES_BLOCO_1}")
-            st.caption(f"C: {resultado['B1']['corretas']}, E: {resultado['B1']['erradas']}, B: {resultado['B1']['brancas']}")
-            st.write(f"Status Bloco I: {'Aprovado ✔️' if resultado['B1']['aprovado_no_bloco'] else 'Reprovado ✖️'}")
-        with cols_resultado[1]:
-            st.metric(label="Pontos Bloco II", value=f"{resultado['B2']['pontos']:.2f} / {NUM_QUESTOES_BLOCO_2}")
-            st.caption(f"C: {resultado['B2']['corretas']}, E: {resultado['B2']['erradas']}, B: {resultado['B2']['brancas']}")
-            st.write(f"Status Bloco II: {'Aprovado ✔️' if resultado['B2']['aprovado_no_bloco'] else 'Reprovado ✖️'}")
-        with cols_resultado[2]:
-            st.metric(label="Pontos Bloco III", value=f"{resultado['B3']['pontos']:.2f} / {NUM_QUESTOES_BLOCO_3}")
-            st.caption(f"C: {resultado['B3']['corretas']}, E: {resultado['B3']['erradas']}, B: {resultado['B3']['brancas']}")
-            st.write(f"Status Bloco III: {'Aprovado ✔️' if resultado['B3']['aprovado_no_bloco'] else 'Reprovado ✖️'}")
+            st.markdown("---")
+            st.subheader("Detalhes da Pontuação:")
+
+            cols_resultado = st.columns(3)
+            with cols_resultado[0]:
+                st.metric(label="Pontos Bloco I", value=f"{resultado['B1']['pontos']:.2f} / {NUM_QUESTOES_BLOCO_1}")
+                st.caption(f"C: {resultado['B1']['corretas']}, E: {resultado['B1']['erradas']}, B: {resultado['B1']['brancas']}")
+                st.write(f"Status Bloco I: {'Aprovado ✔️' if resultado['B1']['aprovado_no_bloco'] else 'Reprovado ✖️'}")
+            with cols_resultado[1]:
+                st.metric(label="Pontos Bloco II", value=f"{resultado['B2']['pontos']:.2f} / {NUM_QUESTOES_BLOCO_2}")
+                st.caption(f"C: {resultado['B2']['corretas']}, E: {resultado['B2']['erradas']}, B: {resultado['B2']['brancas']}")
+                st.write(f"Status Bloco II: {'Aprovado ✔️' if resultado['B2']['aprovado_no_bloco'] else 'Reprovado ✖️'}")
+            with cols_resultado[2]:
+                st.metric(label="Pontos Bloco III", value=f"{resultado['B3']['pontos']:.2f} / {NUM_QUESTOES_BLOCO_3}")
+                st.caption(f"C: {resultado['B3']['corretas']}, E: {resultado['B3']['erradas']}, B: {resultado['B3']['brancas']}")
+                st.write(f"Status Bloco III: {'Aprovado ✔️' if resultado['B3']['aprovado_no_bloco'] else 'Reprovado ✖️'}")
 
-        st.markdown("---")
-        st.metric(label="PONTUAÇÃO TOTAL OBJETIVA", value=f"{resultado['total_pontos']:.2f} / {TOTAL_QUESTOES_PROVA}")
-        st.write(f"Aprovado na pontuação total (critério isolado): {'Sim ✔️' if resultado['aprovado_na_pontuacao_total'] else 'Não ✖️'}")
+            st.markdown("---")
+            st.metric(label="PONTUAÇÃO TOTAL OBJETIVA", value=f"{resultado['total_pontos']:.2f} / {TOTAL_QUESTOES_PROVA}")
+            st.write(f"Aprovado na pontuação total (critério isolado): {'Sim ✔️' if resultado['aprovado_na_pontuacao_total'] else 'Não ✖️'}")
+            if st.session_state.semente_simulado is not None:
+                st.caption(f"Semente deste simulado: `{st.session_state.semente_simulado}` (informe-a na tela inicial para refazer a mesma prova).")
+            if st.session_state.token_tentativa:
+                st.caption(f"Código deste simulado: `{st.session_state.token_tentativa}` (use-o na tela inicial para rever este resultado).")
+            with st.expander("📈 Chance de aprovação mantendo este desempenho"):
+                st.caption("Mesmo número de questões respondidas e a mesma taxa de acerto, por disciplina, desta tentativa.")
+                fragmento_estimativa_revisao(st.session_state.revisao_simulado)
         
         if st.button("🔁 Realizar Novo Simulado", key="novo_simulado_resultados_btn_final", use_container_width=True):
             # Limpar o estado da sessão para um novo simulado
-            keys_to_clear = ['simulado_iniciado', 'simulado_finalizado', 'questoes_do_simulado', 
-                             'respostas_usuario', 'tempo_inicio', 'pagina_atual']
-            for key_to_reset in keys_to_clear:
-                if key_to_reset in st.session_state:
-                    del st.session_state[key_to_reset]
-            # 'todas_questoes_base' e 'json_load_error' são carregados no início, não precisam ser limpos aqui.
+            # (o banco de questões é compartilhado pelo processo e não fica na sessão)
+            limpar_simulado()
             st.rerun()
         
         st.markdown("---")
-        with st.expander("🔍 Ver Gabarito Detalhado e Suas Respostas"):
-            if not st.session_state.questoes_do_simulado:
-                 st.write("Nenhum gabarito para mostrar.")
-            else:
-                for q_idx, q_simulado in enumerate(st.session_state.questoes_do_simulado):
-                    q_id_gabarito = q_simulado.get('id', f'gabarito_id_fallback_{q_idx}')
-                    resp_usr_val = st.session_state.respostas_usuario.get(q_id_gabarito)
-                    resp_usr_display = resp_usr_val if resp_usr_val is not None else "Branco"
-
-                    cor_texto = "gray"
-                    if resp_usr_val is not None:
-                        cor_texto = "green" if resp_usr_val == q_simulado.get('gabarito') else "red"
-                    
-                    disciplina_gabarito = q_simulado.get('disciplina', 'N/A')
-                    bloco_gabarito = q_simulado.get('bloco','N/A')
-                    enunciado_gabarito = q_simulado.get('enunciado', 'Enunciado não disponível.')
-                    gabarito_oficial = q_simulado.get('gabarito','N/A')
-
-                    st.markdown(f"**Questão {q_idx + 1} (Bloco {bloco_gabarito} - {disciplina_gabarito} - ID: `{q_id_gabarito}` )**")
-                    st.markdown(enunciado_gabarito)
-                    st.markdown(f"Gabarito Oficial: **{gabarito_oficial}** | Sua Resposta: <span style='color:{cor_texto}; font-weight:bold;'>{resp_usr_display}</span>", unsafe_allow_html=True)
-                    if q_idx < len(st.session_state.questoes_do_simulado) - 1:
-                        st.markdown("---")
+        fragmento_revisao(st.session_state.revisao_simulado)
+elif st.session_state.tela_estudo:
+    # --- TELA: MODO ESTUDO (BUSCA POR TEMA) ---
+    st.subheader("📚 Modo Estudo: questões por tema")
+    st.caption("Busque por assunto (ex.: crase, inquérito policial, regência). A busca ignora acentos e maiúsculas. As questões encontradas podem ser respondidas sem limite de tempo, com gabarito ao final.")
+    if st.button("⬅️ Voltar ao início", key="btn_voltar_estudo"):
+        st.session_state.tela_estudo = False
+        st.rerun()
+    st.markdown("---")
+    fragmento_busca_estudo()
 else:
     # --- TELA INICIAL ---
     st.subheader("Bem-vindo(a) ao Simulador para Agente da Polícia Federal! 🎯")
@@ -389,7 +558,7 @@ else:
     """)
     st.markdown("---")
 
-    if not st.session_state.get('todas_questoes_base') or len(st.session_state.get('todas_questoes_base', [])) == 0:
+    if len(banco) == 0:
         st.error("⚠️ **ERRO CRÍTICO:** Nenhuma questão pôde ser carregada (nem do JSON, nem do fallback interno).")
         st.error("Por favor, verifique:")
         st.markdown("- Se o arquivo `questoes_pf_agente.json` existe na mesma pasta deste script.")
@@ -397,19 +566,47 @@ else:
         st.markdown("- O console do terminal (onde você rodou `streamlit run ...`) para mensagens de erro detalhadas durante o carregamento.")
         st.warning("O simulador não pode iniciar sem questões. Corrija o problema e atualize a página (F5 ou Ctrl+R).")
     else:
+        semente_informada = st.text_input("Semente do simulado (opcional — informe a semente de um simulado anterior para refazer a mesma prova):", key="semente_informada").strip()
         if st.button("🚀 Iniciar Novo Simulado!", key="iniciar_simulado_btn_principal", use_container_width=True, type="primary"):
-            st.session_state.questoes_do_simulado = selecionar_questoes_simulado(list(st.session_state.todas_questoes_base))
-            
-            # Validação robusta
-            if not st.session_state.questoes_do_simulado or \
-               len(st.session_state.questoes_do_simulado) != TOTAL_QUESTOES_PROVA or \
-               not all(isinstance(q, dict) and 'id' in q for q in st.session_state.questoes_do_simulado):
-                st.error("Falha crítica ao montar o conjunto de questões para o simulado. Verifique o banco de questões e a função 'selecionar_questoes_simulado'. Tente atualizar a página.")
+            pronto = None
+            if semente_informada.isdigit():
+                semente = int(semente_informada)
+            else:
+                if semente_informada:
+                    st.toast("Semente inválida (use apenas números). Uma nova semente foi gerada.", icon="⚠️")
+                pronto = reserva_simulados.retirar()  # Já sorteado e conferido; None se a reserva esvaziou
+                semente = pronto[0] if pronto else random.SystemRandom().randrange(2**32)
+            st.session_state.semente_simulado = semente
+            banco_simulado, indices = pronto[1:] if pronto else montar_simulado(banco, semente=semente)
+
+            # Validação robusta (os simulados da reserva já foram conferidos)
+            if not pronto and not simulado_valido(banco_simulado, indices):
+                st.error("Falha crítica ao montar o conjunto de questões para o simulado. Verifique o banco de questões e a função 'montar_simulado'. Tente atualizar a página.")
                 st.session_state.simulado_iniciado = False # Garante que não prossiga
             else:
-                st.session_state.respostas_usuario = {q['id']: None for q in st.session_state.questoes_do_simulado}
+                iniciar_tentativa(banco_simulado, indices)
+                st.session_state.tempo_inicio = time.time()
+                st.session_state.token_tentativa = obter_armazem().criar_tentativa([banco_simulado[i] for i in indices.tolist()], semente,
+                                                                                   banco_simulado.versao, inicio=st.session_state.tempo_inicio)
                 st.session_state.simulado_iniciado = True
                 st.session_state.simulado_finalizado = False
-                st.session_state.tempo_inicio = time.time()
                 st.session_state.pagina_atual = 0 
                 st.rerun()
+
+        if st.button("📚 Modo Estudo (buscar questões por tema)", key="modo_estudo_btn", use_container_width=True):
+            st.session_state.tela_estudo = True
+            st.rerun()
+
+        st.markdown("---")
+        st.markdown("**Retomar um simulado interrompido** (queda de conexão, página recarregada etc.):")
+        codigo_retomada = st.text_input("Código para retomar:", key="codigo_retomada").strip()
+        if st.button("↩️ Retomar Simulado", key="retomar_simulado_btn", use_container_width=True, disabled=not codigo_retomada):
+            if retomar_simulado(codigo_retomada):
+                st.rerun()
+            else:
+                st.error("Nenhum simulado em andamento ou finalizado foi encontrado com esse código.")
+
+        st.markdown("---")
+        with st.expander("📈 Calculadora de estratégia: qual a chance de aprovação?"):
+            st.caption("Ex.: responder 85 questões, deixar 35 em branco e acertar 80% das respondidas. Considera os mínimos por bloco e o desconto de 1 ponto por erro.")
+            fragmento_estrategia()
@@ -0,0 +1,93 @@
+import numpy as np
+
+from banco_questoes import BancoQuestoes
+from edital import MIN_PONTOS_BLOCO_1, MIN_PONTOS_BLOCO_2, MIN_PONTOS_BLOCO_3, MIN_PONTOS_TOTAL
+from pontuacao import (
+    CODIGO_BRANCO, CODIGO_CERTO, CODIGO_ERRADO, calcular_pontuacao, codificar, codificar_questoes, codificar_respostas,
+    pontuar_lote
+)
+
+# Regressão da correção Cebraspe: resposta da interface ("Certo"/"Errado") comparada com a
+# letra do gabarito ("C"/"E"), +1 por certa, -1 por errada, 0 por branca e mínimos por bloco.
+
+
+def _banco(gabaritos_por_bloco):
+    questoes = [{"id": f"B{bloco}_{i}", "bloco": bloco, "disciplina": "Teste", "enunciado": "Enunciado.", "gabarito": gabarito}
+                for bloco, gabaritos in gabaritos_por_bloco.items() for i, gabarito in enumerate(gabaritos)]
+    return BancoQuestoes(questoes, versao="teste")
+
+
+def test_respostas_da_interface_e_letras_do_gabarito_no_mesmo_codigo():
+    assert codificar("Certo") == codificar("C") == CODIGO_CERTO
+    assert codificar("Errado") == codificar("E") == CODIGO_ERRADO
+    assert codificar(None) == codificar("Branco") == codificar("") == CODIGO_BRANCO
+
+
+def test_certa_vale_mais_um_errada_menos_um_branca_zero():
+    questoes = [{"id": "q1", "bloco": 1, "gabarito": "C"}, {"id": "q2", "bloco": 1, "gabarito": "E"},
+                {"id": "q3", "bloco": 1, "gabarito": "C"}, {"id": "q4", "bloco": 1, "gabarito": "E"},
+                {"id": "q5", "bloco": 1, "gabarito": "C"}]
+    respostas = {"q1": "Certo", "q2": "Errado", "q3": "Errado", "q4": "Certo", "q5": None}
+    gabarito, blocos = codificar_questoes(questoes)
+    lote = pontuar_lote(codificar_respostas(respostas, questoes), gabarito, blocos)
+    assert lote["corretas"][0].tolist() == [2, 0, 0]
+    assert lote["erradas"][0].tolist() == [2, 0, 0]
+    assert lote["brancas"][0].tolist() == [1, 0, 0]
+    assert lote["pontos"][0].tolist() == [0.0, 0.0, 0.0]
+
+
+def test_calcular_pontuacao_com_respostas_da_interface():
+    banco = _banco({1: "CE" * 5, 2: "CE" * 3, 3: "CE" * 2})
+    # Todas respondidas de acordo com o gabarito, exceto uma errada e uma em branco no bloco 1
+    respostas = [codificar({"C": "Certo", "E": "Errado"}[q["gabarito"]]) for q in banco]
+    respostas[0] = codificar("Errado")
+    respostas[1] = codificar(None)
+    resultado = calcular_pontuacao(np.array(respostas, dtype=np.int8), np.arange(len(banco)), banco)
+    assert (resultado["B1"]["corretas"], resultado["B1"]["erradas"], resultado["B1"]["brancas"]) == (8, 1, 1)
+    assert resultado["B1"]["pontos"] == 7.0
+    assert resultado["B2"]["pontos"] == 6.0
+    assert resultado["B3"]["pontos"] == 4.0
+    assert resultado["total_pontos"] == 17.0
+
+
+def _resultado_com_pontos(pontos_por_bloco):
+    """Resultado de uma folha só com acertos, com `pontos_por_bloco` questões certas em cada bloco."""
+    banco = _banco({bloco: "C" * max(pontos, 0) + "E" * max(-pontos, 0) for bloco, pontos in zip((1, 2, 3), pontos_por_bloco)})
+    respostas = np.full(len(banco), CODIGO_CERTO, dtype=np.int8)
+    return calcular_pontuacao(respostas, np.arange(len(banco)), banco)
+
+
+def test_minimos_por_bloco_e_total():
+    minimos = (int(MIN_PONTOS_BLOCO_1), int(MIN_PONTOS_BLOCO_2), int(MIN_PONTOS_BLOCO_3))
+    folga_total = int(MIN_PONTOS_TOTAL) - sum(minimos)
+
+    exato = _resultado_com_pontos((minimos[0] + folga_total, minimos[1], minimos[2]))
+    assert exato["total_pontos"] == MIN_PONTOS_TOTAL
+    assert all(exato[f"B{b}"]["aprovado_no_bloco"] for b in (1, 2, 3))
+    assert exato["aprovado_na_pontuacao_total"]
+    assert exato["status_geral"].startswith("APROVADO")
+    assert exato["motivos_reprovacao"] == []
+
+    for bloco in (1, 2, 3):
+        # Bloco um ponto abaixo do mínimo e a folga em outro bloco: só o bloco reprova
+        pontos = list(minimos)
+        pontos[bloco - 1] -= 1
+        pontos[bloco % 3] += folga_total + 1
+        resultado = _resultado_com_pontos(tuple(pontos))
+        assert resultado["aprovado_na_pontuacao_total"]
+        assert not resultado[f"B{bloco}"]["aprovado_no_bloco"]
+        assert resultado["status_geral"].startswith("REPROVADO")
+        assert len(resultado["motivos_reprovacao"]) == 1
+
+    abaixo_do_total = _resultado_com_pontos((minimos[0] + folga_total - 1, minimos[1], minimos[2]))
+    assert all(abaixo_do_total[f"B{b}"]["aprovado_no_bloco"] for b in (1, 2, 3))
+    assert not abaixo_do_total["aprovado_na_pontuacao_total"]
+    assert abaixo_do_total["status_geral"].startswith("REPROVADO")
+
+
+def test_folha_toda_certa_na_prova_completa_aprova():
+    banco = _banco({1: "C" * 60, 2: "E" * 36, 3: "CE" * 12})
+    respostas = np.array([codificar({"C": "Certo", "E": "Errado"}[q["gabarito"]]) for q in banco], dtype=np.int8)
+    resultado = calcular_pontuacao(respostas, np.arange(len(banco)), banco)
+    assert resultado["total_pontos"] == 120.0
+    assert resultado["status_geral"].startswith("APROVADO")